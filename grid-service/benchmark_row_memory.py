@@ -0,0 +1,88 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the script measuring the memory of rows kept in the grid cache.
+'''
+
+import argparse
+import random
+import tracemalloc
+import uuid
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row, ReferenceRow
+
+class LegacyRow:
+    """
+    Row as kept in memory before compact rows: attributes in a dictionary, uuid as given,
+    display string computed once, and references as dictionaries built for each cell.
+    """
+    def __init__(self, grid, uuid, revision = 0, values = None):
+        self.uuid = uuid
+        self.revision = revision
+        self.values = values
+        self.displayString = ' | '.join([self.values[column.index] for column in grid.columns if column.display]) if values else ""
+
+def _get_grid():
+    grid = Grid(uuid.uuid4(), name = "Benchmark")
+    grid.columns.append(Column(uuid.uuid4(), 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+    grid.columns.append(Column(uuid.uuid4(), 1, 1, order = "1", name = "Status", typeUuid = SystemIds.TextColumnType, columnIndex = 1))
+    grid.columns.append(Column(uuid.uuid4(), 2, 2, order = "2", name = "Count", typeUuid = SystemIds.IntColumnType, columnIndex = 2))
+    grid.columns.append(Column(uuid.uuid4(), 3, 3, order = "3", name = "Owner", typeUuid = SystemIds.ReferenceColumnType, columnIndex = 3))
+    return grid
+
+def _get_items(numberOfRows, numberOfReferences):
+    """
+    Returns rows as read from the database, with strings as distinct objects:
+    uuid, revision, a unique name, a repeated status and a count,
+    and the uuids of referenced rows with their display value.
+    """
+    statuses = ["Draft", "Active", "Suspended", "Closed"]
+    references = [(uuid.uuid4(), f"Owner {i}") for i in range(numberOfReferences)]
+    return [(uuid.uuid4(), 1, f"Row name {i}", "".join(list(random.choice(statuses))), i, random.choice(references))
+            for i in range(numberOfRows)]
+
+def _measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    rows = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return rows, size
+
+def main(numberOfRows, numberOfReferences):
+    grid = _get_grid()
+    items = _get_items(numberOfRows, numberOfReferences)
+
+    def build_legacy():
+        return {str(item[0]): LegacyRow(grid, item[0], item[1], [item[2], item[3], item[4],
+                    [{"uuid": str(item[5][0]), "displayString": item[5][1]}]]) for item in items}
+
+    def build_compact():
+        referenceRows = {}
+        rows = {}
+        for item in items:
+            referenceRow = referenceRows.get(item[5][0])
+            if referenceRow is None:
+                referenceRow = referenceRows[item[5][0]] = ReferenceRow(None, item[5][0], [item[5][1]])
+            rows[str(item[0])] = Row(grid, item[0], item[1], [item[2], item[3], item[4], [referenceRow]])
+        return rows
+
+    legacyRows, legacySize = _measure(build_legacy)
+    compactRows, compactSize = _measure(build_compact)
+    for rowUuid, row in list(compactRows.items())[:100]:
+        legacy = legacyRows[rowUuid]
+        assert row.to_json()["values"] == legacy.values and row.displayString == legacy.displayString
+    print(f"{numberOfRows} rows, {numberOfReferences} referenced rows")
+    print(f"before: {legacySize / numberOfRows:.0f} bytes per row")
+    print(f"after:  {compactSize / numberOfRows:.0f} bytes per row ({100 * (1 - compactSize / legacySize):.0f}% less)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the memory of rows kept in the grid cache")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of rows")
+    parser.add_argument("--references", type=int, default=100, help="Number of distinct referenced rows")
+    args = parser.parse_args()
+    main(args.rows, args.references)
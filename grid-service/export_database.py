@@ -2,18 +2,23 @@
     clairgrid : data structuration, presentation and navigation.
     Copyright David Lambert 2025
 
-    This file contains the script to export the database to a JSON file.
+    This file contains the script to export the database to a JSON or NDJSON file, compressed or not.
 '''
 
 import argparse
+import logging
 from libs.database_manager import DatabaseManager
+from libs.utils.export_file import Compressions
+from libs.utils.log_configuration import configure_logging
 from libs.utils.report_exception import report_exception
 
-def main(db_name, file_name):
-    print(f"Starting export database {db_name} to {file_name}...", flush=True)
+logger = logging.getLogger(__name__)
+
+def main(db_name, file_name, format = None, compression = None, parallel = False):
+    logger.info("Starting export database %s to %s...", db_name, file_name)
     try:
         db_manager = DatabaseManager(db_name)
-        db_manager.export_database(file_name)
+        db_manager.export_database(file_name, format, compression, parallel)
         db_manager.close()
         
     except Exception as e:
@@ -23,5 +28,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Export database")
     parser.add_argument("db_name", help="Name of the database")
     parser.add_argument("file_name", help="Output file name")
+    parser.add_argument("--format", choices=["json", "ndjson"], help="Output format, one document or one record per line (default: from the file name)")
+    parser.add_argument("--compression", choices=Compressions, help="Output compression (default: from the file name, .gz or .zst)")
+    parser.add_argument("--parallel", action="store_true", help="Export tables concurrently over separate connections")
     args = parser.parse_args()
-    main(args.db_name, args.file_name)
+    log_listener = configure_logging()
+    main(args.db_name, args.file_name, args.format, args.compression, args.parallel)
+    log_listener.stop()
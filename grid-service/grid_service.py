@@ -4,11 +4,19 @@
 
     This file contains the Grid Service for the clairgrid application.
 '''
+import logging
 import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from libs.queue_listener import QueueListener
 from libs.database_manager import DatabaseManager
+from libs.grid_manager import GridManager
+from libs.metrics.prometheus_exporter import start_metrics_server
+from libs.utils.log_configuration import configure_logging
+from libs.utils.metrics_registry import metrics
+
+logger = logging.getLogger(__name__)
 
 def main():
     """
@@ -17,50 +25,83 @@ def main():
     Initializes the service, connects to the database, runs migrations,
     and enters a keep-alive loop.
     """
-    print("\nStarting Grid Service...", flush=True)
+    log_listener = configure_logging() # records are written by a background thread
+    logger.info("Starting Grid Service...")
     databases = os.getenv("DATABASES").split(",")
     
     listeners = []
     threads = []
+    grid_managers = []
 
-    def run_listener(listener, db_manager):
-        try:
-            listener.start()
-        finally:
-            db_manager.close()
+    # Databases are connected, migrated and seeded concurrently
+    seedData = os.getenv("ENABLE_GRID_SERVICE") == "true"
+    with ThreadPoolExecutor(max_workers = len(databases), thread_name_prefix = "init") as executor:
+        db_managers = list(executor.map(lambda database: DatabaseManager(database, seedData = seedData), databases))
+
+    for database, db_manager in zip(databases, db_managers):
+        grid_manager = GridManager(db_manager) # grids in memory are shared by all listeners of the database
+        grid_managers.append(grid_manager)
+        metrics.add_collector("grid_cache", {"db": database}, grid_manager.grid_cache.stats)
+        metrics.add_collector("change_writer", {"db": database}, grid_manager.change_writer.stats)
+
+    # Grids are loaded and code paths compiled before requests are consumed
+    warmedUp = [None] * len(grid_managers)
+    if os.getenv("ENABLE_GRID_SERVICE") == "true":
+        with ThreadPoolExecutor(max_workers = len(grid_managers), thread_name_prefix = "warm-up") as executor:
+            warmedUp = list(executor.map(lambda grid_manager: grid_manager.warm_up(), grid_managers))
 
-    for database in databases:
-        db_manager = DatabaseManager(database, seedData = os.getenv("ENABLE_GRID_SERVICE") == "true")
+    for db_manager, grid_manager, loaded in zip(db_managers, grid_managers, warmedUp):
+        grid_manager.change_writer.start()
+        grid_manager.start_notifications()
+        grid_manager.start_snapshots()
         if os.getenv("ENABLE_GRID_SERVICE") == "true":
-            listener = QueueListener(db_manager)
+            listener = QueueListener(db_manager, grid_manager=grid_manager)
             listeners.append(listener)
-            t = threading.Thread(target=run_listener, args=(listener, db_manager))
+            t = threading.Thread(target=listener.start, args=(loaded,))
             t.start()
         if os.getenv("ENABLE_AUTHENTICATION_SERVICE") == "true":
-            listenerAuthentication = QueueListener(db_manager, queueNamePrefix="authentication_service")
+            listenerAuthentication = QueueListener(db_manager, queueNamePrefix="authentication_service", grid_manager=grid_manager)
             listeners.append(listenerAuthentication)
-            t = threading.Thread(target=run_listener, args=(listenerAuthentication, db_manager))
+            t = threading.Thread(target=listenerAuthentication.start)
             t.start()
             threads.append(t)
         if os.getenv("ENABLE_LOCATE_SERVICE") == "true":
-            listenerLocate = QueueListener(db_manager, queueNamePrefix="locate_service")
+            listenerLocate = QueueListener(db_manager, queueNamePrefix="locate_service", grid_manager=grid_manager)
             listeners.append(listenerLocate)
-            t = threading.Thread(target=run_listener, args=(listenerLocate, db_manager))
+            t = threading.Thread(target=listenerLocate.start)
             t.start()
             threads.append(t)
         threads.append(t)
 
+    metrics_server = None
+    if os.getenv("METRICS_PORT"):
+        metrics_server = start_metrics_server(int(os.getenv("METRICS_PORT")), os.getenv("METRICS_ADDRESS", "127.0.0.1"))
+
     try:
+        for listener in listeners:
+            while not listener.ready.wait(1) and any(t.is_alive() for t in threads): pass
+        logger.info("✅ Grid Service ready.")
         for t in threads:
             t.join()
     except KeyboardInterrupt:
-        print("\n⚠️ Stopping Grid Service...", flush=True)
+        logger.warning("⚠️ Stopping Grid Service...")
         for listener in listeners:
             listener.stop()
         for t in threads:
             t.join()
+    finally:
+        # Changes queued are written, then grids in memory a last time, to be restored at the next start
+        for grid_manager in grid_managers:
+            grid_manager.change_writer.stop()
+            grid_manager.stop_notifications()
+            grid_manager.stop_snapshots()
+        # The connection pool of a database is shared by its listeners, close it once all of them stopped
+        for db_manager in db_managers:
+            db_manager.close()
+        if metrics_server: metrics_server.shutdown()
 
-    print("✅ Grid Service stopped.", flush=True)
+    logger.info("✅ Grid Service stopped.")
+    log_listener.stop()
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,15 +2,19 @@
     clairgrid : data structuration, presentation and navigation.
     Copyright David Lambert 2025
 
-    This file contains the script to import the database from a JSON file.
+    This file contains the script to import the database from a JSON or NDJSON file, compressed or not.
 '''
 
 import argparse
+import logging
 from libs.database_manager import DatabaseManager
+from libs.utils.log_configuration import configure_logging
 from libs.utils.report_exception import report_exception
 
+logger = logging.getLogger(__name__)
+
 def main(db_name, file_name):
-    print(f"Starting import database {db_name} from {file_name}...", flush=True)
+    logger.info("Starting import database %s from %s...", db_name, file_name)
     try:
         db_manager = DatabaseManager(db_name)
         db_manager.import_database(file_name)
@@ -24,5 +28,7 @@ if __name__ == "__main__":
     parser.add_argument("db_name", help="Name of the database")
     parser.add_argument("file_name", help="Input file name")
     args = parser.parse_args()
+    log_listener = configure_logging()
     main(args.db_name, args.file_name)
+    log_listener.stop()
 
@@ -10,7 +10,7 @@ import os
 import jwt
 import datetime
 from ..utils.configuration_mixin import ConfigurationMixin
-from ..utils.decorators import echo
+from ..utils.decorators import instrument
 from ..utils.report_exception import report_exception
 
 class AuthenticationManager(ConfigurationMixin):
@@ -38,7 +38,7 @@ class AuthenticationManager(ConfigurationMixin):
         }
         return jwt.encode(payload, self.jwt_secret, algorithm="HS512")
 
-    @echo
+    @instrument
     def handle_authentication(self, request):
         login_id = request.get('loginId')
         password = request.get('passwordHash')
@@ -52,7 +52,7 @@ class AuthenticationManager(ConfigurationMixin):
                         AND texts.partition = 0
                         AND texts.text0 = %s
                         AND texts.text3 = crypt(%s, texts.text3)
-                ''', (metadata.SystemIds.Users, login_id, password)
+                ''', (metadata.SystemIds.Users, login_id, password), explain=False # plans would show the password
             )
             if result:
                 try:
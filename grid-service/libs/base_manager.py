@@ -10,7 +10,7 @@ import jwt
 from datetime import datetime, timezone
 from . import metadata
 from .utils.configuration_mixin import ConfigurationMixin
-from .utils.decorators import echo
+from .utils.decorators import instrument
 from .utils.report_exception import report_exception
 
 class BaseManager(ConfigurationMixin):
@@ -22,7 +22,7 @@ class BaseManager(ConfigurationMixin):
         self.jwt_secret_file = os.getenv(f"JWT_SECRET_FILE_{self.db_manager.db_name}", "/run/secrets/jwt-secret")
         self.jwt_secret = self._read_password_file(self.jwt_secret_file, f"JWT_SECRET_{self.db_manager.db_name}")
 
-    @echo
+    @instrument
     def _handle_jwt_validation(self, request):
         token = request.get('jwt')
         if not token:
@@ -5,22 +5,40 @@
     This file contains the Database Manager for the clairgrid Grid Service.
 '''
 
+import hashlib
 import json
+import logging
 import os
+import re
+import shutil
+import threading
+import time
 import psycopg
 import datetime
+from psycopg import sql
+from concurrent.futures import ThreadPoolExecutor
+from psycopg_pool import ConnectionPool, PoolTimeout
 from decimal import Decimal
 from uuid import UUID
 from .metadata.migration_steps import get_migration_steps, get_deletion_steps
+from .utils import export_file
 from .utils.configuration_mixin import ConfigurationMixin
-from .utils.decorators import echo
+from .utils.decorators import instrument
 from . import metadata
 from .utils.report_exception import report_exception
+from .utils.statement_statistics import StatementStatistics
+from .utils.truncated import Truncated
+
+logger = logging.getLogger(__name__)
 
 class DatabaseManager(ConfigurationMixin):
     """
-    Manages database connection and migrations for the Grid Service.
+    Manages database connections and migrations for the Grid Service.
+    Requests are served through a bounded connection pool shared by all listeners,
+    while migrations, import and export use a dedicated connection.
+    Notifications of other instances are listened to on another dedicated connection.
     """
+    ExportTables = ["rows", "texts", "ints", "booleans", "relationships"]
 
     def __init__(self, db_name, seedData = False, purgeDatabase = False):
         """
@@ -31,13 +49,18 @@ class DatabaseManager(ConfigurationMixin):
             purge_database (bool): If True, purges the database before running migrations.
         """
         self.conn = None
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        self._listenStop = threading.Event()
+        self._listenThread = None
+        self.statement_statistics = StatementStatistics()
         self.db_name = db_name
         self.load_configuration()        
         self.connect()
         if purgeDatabase and self.db_name == "clairgrid_test": self.run_deletions() # purge the test database
         if seedData:
             self.run_migrations()
-            self.import_database(self.seed_data_file)
+            self.seed_database(self.seed_data_file)
 
     def load_configuration(self):
         """
@@ -53,6 +76,14 @@ class DatabaseManager(ConfigurationMixin):
         self.root_password_file = os.getenv(f"ROOT_PASSWORD_FILE_{self.db_name}", "/run/secrets/root-password")
         self.root_password = self._read_password_file(self.root_password_file, f"ROOT_PASSWORD_{self.db_name}")
         self.seed_data_file = os.getenv(f"SEED_DATA_FILE_{self.db_name}", "seed_data.yml")
+        self.pool_min_size = int(os.getenv(f"DB_POOL_MIN_SIZE_{self.db_name}", "1"))
+        self.pool_max_size = int(os.getenv(f"DB_POOL_MAX_SIZE_{self.db_name}", "10"))
+        self.pool_timeout_milliseconds = os.getenv(f"DB_POOL_TIMEOUT_MILLISECONDS_{self.db_name}", self.timeout_threshold_milliseconds)
+        self.streaming = os.getenv(f"DB_STREAMING_{self.db_name}", "false").lower() == "true"
+        self.streaming_itersize = int(os.getenv(f"DB_STREAMING_ITERSIZE_{self.db_name}", "1000"))
+        self.slow_query_threshold_milliseconds = int(os.getenv(f"SLOW_QUERY_THRESHOLD_MILLISECONDS_{self.db_name}", "1000"))
+        self.slow_query_explain = os.getenv(f"SLOW_QUERY_EXPLAIN_{self.db_name}", "false").lower() == "true"
+        self.listen_reconnect_milliseconds = int(os.getenv(f"DB_LISTEN_RECONNECT_MILLISECONDS_{self.db_name}", "1000"))
 
     def get_connection_string(self):
         """
@@ -79,18 +110,89 @@ class DatabaseManager(ConfigurationMixin):
             psycopg.Connection: The active database connection.
         """
         if self.conn is None or self.conn.closed:
-            print(f"Connecting to database {self.db_name}...", flush=True)
+            logger.info("Connecting to database %s...", self.db_name)
             self.conn = psycopg.connect(self.get_connection_string(), autocommit=True)
-            print(f"✅ Connected to database {self.db_name}.", flush=True)
+            logger.info("✅ Connected to database %s.", self.db_name)
         return self.conn
 
+    def get_pool(self):
+        """
+        Returns the connection pool used to serve requests, opening it on first use.
+        Connections are checked before being handed out and replaced when broken.
+
+        Returns:
+            psycopg_pool.ConnectionPool: The connection pool.
+        """
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    logger.info("Opening connection pool to database %s (%s-%s connections)...", self.db_name, self.pool_min_size, self.pool_max_size)
+                    self.pool = ConnectionPool(self.get_connection_string(),
+                                                name=f"clairgrid-{self.db_name}",
+                                                min_size=self.pool_min_size,
+                                                max_size=self.pool_max_size,
+                                                kwargs={"autocommit": True},
+                                                check=ConnectionPool.check_connection,
+                                                timeout=int(self.pool_timeout_milliseconds) / 1000,
+                                                reconnect_failed=self._on_reconnect_failed,
+                                                open=True)
+        return self.pool
+
+    def _on_reconnect_failed(self, pool):
+        logger.error("❌ Connection pool to database %s failed to reconnect.", self.db_name)
+
+    def start_listening(self, channel, callback):
+        """
+        Listens to the notifications of a channel on a dedicated connection, in the background, calling callback
+        with the payload of each notification. The connection is opened again when lost, then callback is called
+        with None, as notifications sent meanwhile are missed.
+        """
+        if self._listenThread is not None: return
+        self._listenStop.clear()
+        self._listenThread = threading.Thread(target=self._listen, args=(channel, callback), name=f"listen-{self.db_name}", daemon=True)
+        self._listenThread.start()
+
+    def stop_listening(self):
+        if self._listenThread is None: return
+        self._listenStop.set()
+        self._listenThread.join()
+        self._listenThread = None
+
+    def _listen(self, channel, callback):
+        missed = False
+        while not self._listenStop.is_set():
+            try:
+                with psycopg.connect(self.get_connection_string(), autocommit=True) as conn:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                    logger.info("✅ Listening to %s on database %s.", channel, self.db_name)
+                    if missed: self._notify(callback, None)
+                    missed = False
+                    while not self._listenStop.is_set():
+                        # Notifications are waited for a short time, so that stopping is not delayed
+                        for notify in conn.notifies(timeout=self.listen_reconnect_milliseconds / 1000):
+                            self._notify(callback, notify.payload)
+            except psycopg.Error as e:
+                report_exception(e, f"Error listening to {channel} on database {self.db_name}")
+                missed = True
+                self._listenStop.wait(self.listen_reconnect_milliseconds / 1000)
+
+    def _notify(self, callback, payload):
+        try:
+            callback(payload)
+        except Exception as e:
+            report_exception(e, f"Error handling notification of database {self.db_name}")
+
     def close(self):
         """
-        Closes the database connection if it exists.
+        Closes the connection pool and the database connection if they exist.
         """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+            logger.info("✅ Connection pool to %s closed.", self.db_name)
         if self.conn and not self.conn.closed:
             self.conn.close()
-            print(f"✅ Database connection to {self.db_name} closed.", flush=True)
+            logger.info("✅ Database connection to %s closed.", self.db_name)
 
     def _get_migration_table_exists(self):
         """
@@ -142,7 +244,7 @@ class DatabaseManager(ConfigurationMixin):
                 result = cur.fetchone()
                 if result and result[0] is not None:
                     latestMigrationSequence = result[0]
-                print(f"Latest migration sequence is {latestMigrationSequence}.")
+                logger.info("Latest migration sequence is %s.", latestMigrationSequence)
             except psycopg.Error as e:  
                 report_exception(e, "Error getting latest migration sequence")
 
@@ -152,36 +254,173 @@ class DatabaseManager(ConfigurationMixin):
     def _remove_double_spaces(statement):
         return '\n'.join(' '.join(line.split()) for line in statement.split('\n'))
 
-    @echo
-    def select_one(self, statement, params=None):
-        if self.conn is None or self.conn.closed:
-             raise Exception("Database connection not established. Call connect() first.")
+    def _should_retry(self, e, attempt):
+        """
+        Tells if a statement can be executed again after a failure: only once, and only
+        when the connection was lost, in which case the pool provides a new one.
+        """
+        if attempt > 0 or isinstance(e, PoolTimeout) or not isinstance(e, psycopg.OperationalError):
+            return False
+        report_exception(e, f"Connection to database {self.db_name} lost, retrying")
+        return True
 
-        with self.conn.cursor() as cur:
+    @staticmethod
+    def _get_result_size(pgresult):
+        """
+        Returns the number of rows and the estimated number of bytes of a result,
+        measured on its first rows so that large results are not scanned.
+        """
+        if pgresult is None or not pgresult.ntuples: return 0, 0
+        sample = min(pgresult.ntuples, 100)
+        size = sum(pgresult.get_length(row, column) for row in range(sample) for column in range(pgresult.nfields))
+        return pgresult.ntuples, size * pgresult.ntuples // sample
+
+    def _observe_statement(self, statement, params, seconds, rows, size, explain=True):
+        """
+        Records the execution of a statement, and logs it when slow, with its plan if enabled.
+        Statements changing data are not explained (explain=False): EXPLAIN ANALYZE would execute them again,
+        nor statements whose params are secret, as plans show them.
+        Slow statements are logged by fingerprint, with their params at debug level only.
+        """
+        fingerprint = self.statement_statistics.record(statement, seconds, rows, size)
+        if seconds * 1000 < self.slow_query_threshold_milliseconds: return
+        logger.warning("🐢 Slow statement %s on %s (%.1f ms, %s rows, %s bytes)", fingerprint, self.db_name, seconds * 1000, rows, size)
+        logger.debug("🐢 Slow statement %s: %s with params: %s", fingerprint, statement, Truncated(params))
+        if self.statement_statistics.record_slow(fingerprint) and self.slow_query_explain and explain:
+            self._explain(fingerprint, statement, params)
+
+    def _explain(self, fingerprint, statement, params):
+        """
+        Executes the statement again with EXPLAIN (ANALYZE, BUFFERS) and keeps its plan with its statistics.
+        """
+        try:
+            with self.get_pool().connection(timeout=int(self.pool_timeout_milliseconds) / 1000) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, params)
+                    plan = '\n'.join(row[0] for row in cur)
+            self.statement_statistics.set_plan(fingerprint, plan)
+            logger.warning("🔬 Plan of statement %s on %s:\n%s", fingerprint, self.db_name, plan)
+        except psycopg.Error as e:
+            report_exception(e, f"Error explaining statement {fingerprint}")
+
+    @instrument
+    def select_one(self, statement, params=None, prepare=None, explain=True):
+        """
+        Executes a statement on a pooled connection.
+        Statements prepared on the server (prepare=True) are sent as is: their text is expected
+        to be stable, so that Postgres parses and plans them once per connection.
+        Statements whose params are secret are not explained when slow (explain=False).
+        """
+        if not prepare: statement = self._remove_double_spaces(statement)
+        logger.debug("🔍 Executing statement: %s with params: %s", statement, Truncated(params))
+        attempt = 0
+        while True:
             try:
-                statement = self._remove_double_spaces(statement)
-                print(f"🔍 Executing statement: {statement} with params: {params}")
-                cur.execute(statement, params)
-                return cur.fetchone()
+                with self.get_pool().connection(timeout=int(self.pool_timeout_milliseconds) / 1000) as conn:
+                    with conn.cursor() as cur:
+                        start = time.perf_counter()
+                        cur.execute(statement, params, prepare=prepare)
+                        result = cur.fetchone()
+                        seconds = time.perf_counter() - start
+                        rows, size = self._get_result_size(cur.pgresult)
+                self._observe_statement(statement, params, seconds, rows, size, explain)
+                return result
             except psycopg.Error as e:
+                if self._should_retry(e, attempt):
+                    attempt += 1
+                    continue
                 report_exception(e, f"Error selecting from database {self.db_name} with statement {statement} and params {params}")
                 raise e
 
-    @echo
-    def select_all(self, statement, params=None):
-        if self.conn is None or self.conn.closed:
-             raise Exception("Database connection not established. Call connect() first.")
-
-        with self.conn.cursor() as cur:
+    @instrument
+    def select_all(self, statement, params=None, prepare=None):
+        """
+        Executes a statement on a pooled connection and returns the list of its rows.
+        Rows are fetched before the connection is given back to the pool, so that it is never held
+        while the caller processes them: large results are read with select_stream instead.
+        Statements prepared on the server (prepare=True) are sent as is: their text is expected
+        to be stable, so that Postgres parses and plans them once per connection.
+        """
+        if not prepare: statement = self._remove_double_spaces(statement)
+        logger.debug("Executing statement: %s with params: %s", statement, Truncated(params))
+        attempt = 0
+        while True:
             try:
-                statement = self._remove_double_spaces(statement)
-                print(f"Executing statement: {statement} with params: {params}")
-                cur.execute(statement, params)
-                for row in cur: yield row
+                with self.get_pool().connection(timeout=int(self.pool_timeout_milliseconds) / 1000) as conn:
+                    with conn.cursor() as cur:
+                        start = time.perf_counter()
+                        cur.execute(statement, params, prepare=prepare) # results are received entirely
+                        self._observe_statement(statement, params, time.perf_counter() - start, *self._get_result_size(cur.pgresult))
+                        return cur.fetchall()
             except psycopg.Error as e:
+                if self._should_retry(e, attempt):
+                    attempt += 1
+                    continue
                 report_exception(e, f"Error selecting from database {self.db_name} with statement {statement} and params {params}")
                 raise e
 
+    @instrument
+    def select_stream(self, statement, params=None, itersize=None):
+        """
+        Executes a statement with a server-side cursor on a pooled connection.
+        Results are fetched from the server by batches of itersize rows, so that large results
+        are never held in memory at once and can be processed before the statement completes.
+        The connection is held until the results are consumed or the generator is closed.
+        """
+        itersize = itersize or self.streaming_itersize
+        logger.debug("Streaming statement: %s with params: %s by %s rows", statement, Truncated(params), itersize)
+        seconds, rows, size = 0.0, 0, 0 # time spent waiting for the server, not processing results
+        try:
+            with self.get_pool().connection(timeout=int(self.pool_timeout_milliseconds) / 1000) as conn:
+                with conn.transaction(): # server-side cursors live in a transaction
+                    with conn.cursor(name="clairgrid_stream") as cur:
+                        cur.itersize = itersize
+                        start = time.perf_counter()
+                        cur.execute(statement, params)
+                        seconds += time.perf_counter() - start
+                        while True:
+                            start = time.perf_counter()
+                            batch = cur.fetchmany(itersize)
+                            seconds += time.perf_counter() - start
+                            if not batch: break
+                            rows += len(batch)
+                            size += self._get_result_size(cur.pgresult)[1]
+                            yield from batch
+            self._observe_statement(statement, params, seconds, rows, size)
+        except psycopg.Error as e:
+            report_exception(e, f"Error streaming from database {self.db_name} with statement {statement} and params {params}")
+            raise e
+
+    @instrument
+    def execute_all(self, statements, check=None):
+        """
+        Executes statements, given as a list of (statement, params), in one transaction on a pooled connection:
+        either all of them are committed, or none.
+        The check, if any, is called with the results of statements before the transaction is committed
+        (None for statements returning no rows), an exception raised by the check rolls the transaction back.
+        """
+        logger.debug("Executing %s statements in one transaction", len(statements))
+        attempt = 0
+        while True:
+            try:
+                with self.get_pool().connection(timeout=int(self.pool_timeout_milliseconds) / 1000) as conn:
+                    with conn.transaction():
+                        with conn.cursor() as cur:
+                            results = []
+                            for statement, params in statements:
+                                start = time.perf_counter()
+                                cur.execute(statement, params)
+                                self._observe_statement(statement, params, time.perf_counter() - start, cur.rowcount, 0, explain=False)
+                                results.append(cur.fetchall() if cur.description else None)
+                            if check is not None: check(results)
+                return
+            except psycopg.Error as e:
+                if self._should_retry(e, attempt):
+                    attempt += 1
+                    continue
+                report_exception(e, f"Error writing to database {self.db_name} with {len(statements)} statements")
+                raise e
+
     def _execute_migration_step(self, sequence, statement):
         """
         Executes a single migration step and records it.
@@ -191,6 +430,9 @@ class DatabaseManager(ConfigurationMixin):
             sequence (int): The migration sequence number.
             statement (str): The SQL statement to execute.
         """
+        if statement.startswith("CREATE INDEX CONCURRENTLY"):
+            self._execute_concurrent_index_step(sequence, statement)
+            return
         with self.conn.cursor() as cur:
             with self.conn.transaction():
                 cur.execute(statement)
@@ -198,6 +440,30 @@ class DatabaseManager(ConfigurationMixin):
                     "INSERT INTO migrations (sequence, statement) VALUES (%s, %s)",
                     (sequence, statement))
 
+    def _execute_concurrent_index_step(self, sequence, statement):
+        """
+        Builds an index concurrently, which cannot run inside a transaction, and records it.
+        An invalid index left by an interrupted build is dropped first, as IF NOT EXISTS would keep it.
+
+        Args:
+            sequence (int): The migration sequence number.
+            statement (str): The CREATE INDEX CONCURRENTLY statement to execute.
+        """
+        match = re.match(r"CREATE INDEX CONCURRENTLY IF NOT EXISTS (\w+)", statement)
+        with self.conn.cursor() as cur:
+            if match:
+                cur.execute(
+                    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                    "WHERE pg_class.relname = %s AND NOT pg_index.indisvalid",
+                    (match.group(1),))
+                if cur.fetchone():
+                    logger.warning("Drop invalid index %s of database %s", match.group(1), self.db_name)
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+            cur.execute(statement)
+            cur.execute(
+                "INSERT INTO migrations (sequence, statement) VALUES (%s, %s)",
+                (sequence, statement))
+
     def run_migrations(self):
         """
         Executes database migrations using the internal connection.
@@ -217,12 +483,36 @@ class DatabaseManager(ConfigurationMixin):
             try:
                 for sequence, statement in get_migration_steps(self.root_user_name, self.root_password).items():
                     if sequence > latestMigrationSequence:
-                        print(f"Update database {self.db_name} with migration step {sequence}")
+                        logger.info("Update database %s with migration step %s", self.db_name, sequence)
                         self._execute_migration_step(sequence, statement)
             except psycopg.Error as e:
                 report_exception(e, f"Error executing migration sequence {sequence}")
                 raise e
 
+    def seed_database(self, file_name):
+        """
+        Imports the seed file, unless the same file was already imported since the latest migration.
+        The hash of the file and the latest migration sequence are recorded once the import succeeded.
+
+        Args:
+            file_name (str): The name of the seed file.
+        """
+        with open(file_name, 'rb') as f:
+            fileHash = hashlib.file_digest(f, "sha256").hexdigest()
+        latestMigrationSequence = self._get_latest_migration_sequence()
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT hash, migrationSequence FROM seeds WHERE fileName = %s", (file_name,))
+            result = cur.fetchone()
+            if result == (fileHash, latestMigrationSequence):
+                logger.info("Database %s already seeded from %s.", self.db_name, file_name)
+                return
+            self.import_database(file_name)
+            cur.execute(
+                "INSERT INTO seeds (fileName, hash, migrationSequence) VALUES (%s, %s, %s) "
+                "ON CONFLICT (fileName) DO UPDATE SET hash = EXCLUDED.hash, "
+                "migrationSequence = EXCLUDED.migrationSequence, seededOn = now()",
+                (file_name, fileHash, latestMigrationSequence))
+
     def run_deletions(self):
         """
         Executes database deletions using the internal connection.
@@ -238,79 +528,166 @@ class DatabaseManager(ConfigurationMixin):
         for sequence, statement in get_deletion_steps().items():
             with self.conn.cursor() as cur:
                 try:
-                    print(f"Update database {self.db_name} with deletion step {sequence}", flush=True)
+                    logger.info("Update database %s with deletion step %s", self.db_name, sequence)
                     cur.execute(statement)
                 except psycopg.Error as e:
                     report_exception(e, f"Error executing deletion sequence {sequence}")
 
-    def export_database(self, file_name):
+    def export_database(self, file_name, format = None, compression = None, parallel = False):
         """
-        Exports the database to a JSON file.
+        Exports the database to a JSON file, streaming tables through server-side cursors
+        so that memory does not grow with the size of the database.
 
         Args:
             file_name (str): The name of the file to export to.
+            format (str): json, a single document, or ndjson, one record per line; taken from the file name if None.
+            compression (str): gzip, zstd or None; taken from the file name if None.
+            parallel (bool): If True, tables are exported concurrently over separate connections
+                             sharing the same snapshot, then concatenated into the file.
         """
-        print(f"Exporting database {self.db_name} to {file_name}...", flush=True)
-        
-        tables = ["rows", "texts", "ints", "relationships"]
-        export_data = {}
-
-        def json_serial(obj):
-            """JSON serializer for objects not serializable by default json code"""
-            if isinstance(obj, (datetime.datetime, datetime.date)):
-                return obj.isoformat()
-            if isinstance(obj, UUID):
-                return str(obj)
-            if isinstance(obj, Decimal):
-                return float(obj)
-            raise TypeError(f"Type {type(obj)} not serializable")
+        format = format or export_file.get_format(file_name)
+        compression = compression or export_file.get_compression(file_name)
+        logger.info("Exporting database %s to %s as %s (compression %s, parallel %s)...", self.db_name, file_name, format, compression, parallel)
 
         try:
-            with self.conn.cursor() as cur:
-                for table in tables:
-                    query = f"SELECT * FROM {table} WHERE uuid != '{metadata.SystemIds.RootUser}'" 
-                    cur.execute(query)                    
-                    columns = [desc[0] for desc in cur.description]                    
-                    rows = []
-                    for row in cur.fetchall():
-                        row_dict = dict(zip(columns, row))
-                        clean_row_dict = {}
-                        for k, v in row_dict.items():
-                            if v is None:
-                                continue
-                            if 'uuid' in k.lower():
-                                system_name = metadata.SystemIds.get_name(str(v))
-                                if system_name:
-                                    clean_row_dict[f"{k}_metadata"] = system_name
-                                else:
-                                    clean_row_dict[k] = v
-                            else:
-                                clean_row_dict[k] = v
-                        rows.append(clean_row_dict)
-                    
-                    export_data[table] = rows
-
-            with open(file_name, 'w') as f:
-                json.dump(export_data, f, default=json_serial, indent=4)
+            if parallel:
+                self._export_parallel(file_name, format, compression)
+            else:
+                with self.conn.transaction():
+                    self.conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    with export_file.open_export_file(file_name, 'w', compression) as f:
+                        f.write(DatabaseManager._get_export_header(format))
+                        for index, table in enumerate(DatabaseManager.ExportTables):
+                            if index: f.write(DatabaseManager._get_export_separator(format))
+                            self._export_table(self.conn, table, format, f)
+                        f.write(DatabaseManager._get_export_footer(format))
                 
-            print(f"Database {self.db_name} exported successfully to {file_name}.", flush=True)
+            logger.info("Database %s exported successfully to %s.", self.db_name, file_name)
 
         except Exception as e:
             report_exception(e, "Error exporting database")
             raise e
 
+    @staticmethod
+    def _get_export_header(format):
+        return "{\n" if format == "json" else ""
+
+    @staticmethod
+    def _get_export_separator(format):
+        return ",\n" if format == "json" else ""
+
+    @staticmethod
+    def _get_export_footer(format):
+        return "\n}" if format == "json" else ""
+
+    @staticmethod
+    def _json_serial(obj):
+        """JSON serializer for objects not serializable by default json code"""
+        if isinstance(obj, (datetime.datetime, datetime.date)):
+            return obj.isoformat()
+        if isinstance(obj, UUID):
+            return str(obj)
+        if isinstance(obj, Decimal):
+            return float(obj)
+        raise TypeError(f"Type {type(obj)} not serializable")
+
+    def _export_table(self, conn, table, format, f):
+        """
+        Writes the rows of a table read through a server-side cursor, without null values,
+        and with system ids replaced by their names in keys suffixed by '_metadata'.
+        """
+        with conn.cursor(name=f"clairgrid_export_{table}") as cur:
+            cur.itersize = self.streaming_itersize
+            cur.execute(f"SELECT * FROM {table} WHERE uuid != %s", (metadata.SystemIds.RootUser,))
+            columns = [desc[0] for desc in cur.description]
+            uuidColumns = ['uuid' in column.lower() for column in columns]
+            if format == "json": f.write(f'    "{table}": [')
+            count = 0
+            while True:
+                batch = cur.fetchmany(self.streaming_itersize)
+                if not batch: break
+                for row in batch:
+                    record = {}
+                    for column, isUuid, value in zip(columns, uuidColumns, row):
+                        if value is None:
+                            continue
+                        if isUuid:
+                            system_name = metadata.SystemIds.get_name(str(value))
+                            if system_name:
+                                record[f"{column}_metadata"] = system_name
+                                continue
+                        record[column] = value
+                    if format == "ndjson":
+                        f.write(json.dumps({"table": table, "row": record}, default=DatabaseManager._json_serial) + "\n")
+                    else:
+                        # Indented as a whole document dumped with an indent of 4
+                        f.write((",\n        " if count else "\n        ") +
+                                json.dumps(record, default=DatabaseManager._json_serial, indent=4).replace("\n", "\n        "))
+                    count += 1
+            if format == "json": f.write("\n    ]" if count else "]")
+        logger.info("Database %s exported with %s rows from %s", self.db_name, count, table)
+
+    def _export_table_part(self, table, part_name, format, compression, snapshot):
+        """
+        Exports a table into a part file over a new connection, reading from the snapshot of the export.
+        """
+        with psycopg.connect(self.get_connection_string(), autocommit=True) as conn:
+            with conn.transaction():
+                conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                conn.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+                with export_file.open_export_file(part_name, 'w', compression) as f:
+                    self._export_table(conn, table, format, f)
+
+    def _export_parallel(self, file_name, format, compression):
+        """
+        Exports tables concurrently into part files, then concatenates them into the export file.
+        Compressed parts are standalone members or frames, so that they are concatenated as they are.
+        """
+        partNames = [f"{file_name}.{table}.part" for table in DatabaseManager.ExportTables]
+        try:
+            with self.conn.cursor() as cur:
+                with self.conn.transaction(): # keeps the exported snapshot alive until parts are written
+                    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    cur.execute("SELECT pg_export_snapshot()")
+                    snapshot = cur.fetchone()[0]
+                    with ThreadPoolExecutor(max_workers = len(partNames), thread_name_prefix = "export") as executor:
+                        futures = [executor.submit(self._export_table_part, table, partName, format, compression, snapshot)
+                                   for table, partName in zip(DatabaseManager.ExportTables, partNames)]
+                        for future in futures: future.result()
+            with open(file_name, 'wb') as f:
+                header = DatabaseManager._get_export_header(format)
+                if header: f.write(export_file.compress(header, compression))
+                for index, partName in enumerate(partNames):
+                    if index and format == "json": f.write(export_file.compress(DatabaseManager._get_export_separator(format), compression))
+                    with open(partName, 'rb') as part:
+                        shutil.copyfileobj(part, f)
+                footer = DatabaseManager._get_export_footer(format)
+                if footer: f.write(export_file.compress(footer, compression))
+        finally:
+            for partName in partNames:
+                if os.path.exists(partName): os.remove(partName)
+
     def import_database(self, file_name):
         """
-        Imports the database from a JSON file.
+        Imports the database from a JSON or NDJSON file, compressed or not according to its extension.
+        Each table is copied into a temporary staging table with COPY, then merged into the table
+        with a single INSERT ... SELECT ... ON CONFLICT statement, all in one transaction.
 
         Args:
             file_name (str): The name of the file to import from.
         """
-        print(f"Importing database {self.db_name} from {file_name}...", flush=True)
+        logger.info("Importing database %s from %s...", self.db_name, file_name)
 
         try:
-            with open(file_name, 'r') as f:
-                import_data = json.load(f)
+            with export_file.open_export_file(file_name, 'r', export_file.get_compression(file_name)) as f:
+                if export_file.get_format(file_name) == "ndjson":
+                    import_data = {}
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            import_data.setdefault(record["table"], []).append(record["row"])
+                else:
+                    import_data = json.load(f)
 
             tables = ["rows", "texts", "ints", "booleans", "relationships"]
             pk_map = {
@@ -326,44 +703,63 @@ class DatabaseManager(ConfigurationMixin):
                     for table in tables:
                         if table in import_data:
                             rows = import_data[table]
-                            print(f"Importing database {self.db_name} with {len(rows)} rows into {table}...", flush=True)
-                            
-                            for row in rows:
-                                for key in list(row.keys()):
-                                    if key.endswith('_metadata'):
-                                        system_name = row.pop(key)
-                                        original_key = key[:-9]  # Remove '_metadata' suffix
-                                        row[original_key] = getattr(metadata.SystemIds, system_name)
-                                    
-                                columns = list(row.keys())
-                                values = [row[col] for col in columns]
-                                
-                                cols_str = ', '.join(columns)
-                                placeholders = ', '.join(['%s'] * len(columns))
-                                
-                                # Determine Conflict Target and Update Clause
-                                pk_cols = pk_map.get(table, [])
-                                conflict_target = ", ".join(pk_cols)
-                                update_cols = [c for c in columns if c not in pk_cols]
-
-                                if update_cols:
-                                    update_clause = ", ".join([f"{c} = EXCLUDED.{c}" for c in update_cols])
-                                    query = f"""
-                                        INSERT INTO {table} ({cols_str}) VALUES ({placeholders})
-                                        ON CONFLICT ({conflict_target})
-                                        DO UPDATE SET {update_clause}
-                                    """
-                                else:
-                                    query = f"""
-                                        INSERT INTO {table} ({cols_str}) VALUES ({placeholders})
-                                        ON CONFLICT ({conflict_target})
-                                        DO NOTHING
-                                    """
-                                
-                                cur.execute(query, values)
+                            logger.info("Importing database %s with %s rows into %s...", self.db_name, len(rows), table)
+                            for columns, values in self._get_import_groups(rows).items():
+                                self._import_rows(cur, table, pk_map[table], columns, values)
             
-            print(f"Database {self.db_name} imported successfully from {file_name}.", flush=True)
+            logger.info("Database %s imported successfully from %s.", self.db_name, file_name)
 
         except Exception as e:
             report_exception(e, f"Error importing database {self.db_name} from {file_name}")
             raise e
+
+    @staticmethod
+    def _get_import_groups(rows):
+        """
+        Groups imported rows by set of columns, as lists of values by column, once keys
+        suffixed by '_metadata' are resolved into system ids, column by column.
+        """
+        groups = {} # dictionary of lists of rows by tuple of keys
+        for row in rows:
+            groups.setdefault(tuple(row.keys()), []).append(row)
+        columnsByGroup = {}
+        for keys, groupRows in groups.items():
+            columns = []
+            values = []
+            for key in keys:
+                columnValues = [row[key] for row in groupRows]
+                if key.endswith('_metadata'):
+                    systemIds = {name: getattr(metadata.SystemIds, name) for name in set(columnValues)}
+                    columnValues = [systemIds[name] for name in columnValues]
+                    key = key[:-9]  # Remove '_metadata' suffix
+                columns.append(key)
+                values.append(columnValues)
+            columnsByGroup.setdefault(tuple(columns), []).extend(zip(*values))
+        return columnsByGroup
+
+    def _import_rows(self, cur, table, pk_cols, columns, values):
+        """
+        Merges rows sharing the same columns into a table through a staging table filled with COPY.
+        When a row is imported more than once, the last one wins.
+        """
+        cols_str = ', '.join(columns)
+        conflict_target = ", ".join(pk_cols)
+        update_cols = [c for c in columns if c not in pk_cols]
+        if update_cols:
+            conflict_clause = "DO UPDATE SET " + ", ".join([f"{c} = EXCLUDED.{c}" for c in update_cols])
+        else:
+            conflict_clause = "DO NOTHING"
+        cur.execute(f"CREATE TEMPORARY TABLE import_staging ON COMMIT DROP AS SELECT {cols_str} FROM {table} WITH NO DATA")
+        cur.execute("ALTER TABLE import_staging ADD COLUMN import_order bigint GENERATED ALWAYS AS IDENTITY")
+        with cur.copy(f"COPY import_staging ({cols_str}) FROM STDIN") as copy:
+            for row in values:
+                copy.write_row(row)
+        cur.execute(f"""
+            INSERT INTO {table} ({cols_str})
+            SELECT DISTINCT ON ({conflict_target}) {cols_str} FROM import_staging
+            ORDER BY {conflict_target}, import_order DESC
+            ON CONFLICT ({conflict_target})
+            {conflict_clause}
+        """)
+        logger.debug("%s rows merged into %s with columns %s", cur.rowcount, table, cols_str)
+        cur.execute("DROP TABLE import_staging")
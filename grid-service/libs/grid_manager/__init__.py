@@ -5,7 +5,13 @@
     This file contains the Grid Manager for the clairgrid Grid Service.
 '''
 
+import os
+import threading
+import uuid
 from ..base_manager import BaseManager
+from .change_writer import ChangeWriter
+from .grid_cache import GridCache
+from .grid_snapshot import GridSnapshot
 
 class GridManager(BaseManager):
     """
@@ -13,15 +19,47 @@ class GridManager(BaseManager):
     """
     def __init__(self, db_manager):
         BaseManager.__init__(self, db_manager)
-        self.allGrids = {} # dictionary of grids by uuid
-        self.allRows = {} # dictionary of rows by gridUuid and rowUuid
+        self.grid_cache_memory_budget = os.getenv(f"GRID_CACHE_MEMORY_BUDGET_MB_{self.db_manager.db_name}", "512")
+        self.grid_cache = GridCache(int(self.grid_cache_memory_budget) * 1024 * 1024) # grids and rows by uuid
+        self.load_max_limit = int(os.getenv(f"GRID_LOAD_MAX_LIMIT_{self.db_manager.db_name}", "1000")) # maximum number of rows in a window
+        self.snapshot_file = os.getenv(f"GRID_SNAPSHOT_FILE_{self.db_manager.db_name}", "")
+        self.snapshot_interval_seconds = int(os.getenv(f"GRID_SNAPSHOT_INTERVAL_SECONDS_{self.db_manager.db_name}", "300"))
+        self.grid_snapshot = GridSnapshot(self.snapshot_file) if self.snapshot_file else None # grids restored lazily at startup
+        if self.grid_snapshot: self.grid_snapshot.open()
+        self.access_log_file = os.getenv(f"GRID_ACCESS_LOG_FILE_{self.db_manager.db_name}", "")
+        self.hot_grids = [gridUuid.strip() for gridUuid in os.getenv(f"HOT_GRIDS_{self.db_manager.db_name}", "").split(",") if gridUuid.strip()]
+        self.warm_up_top_grids = int(os.getenv(f"WARM_UP_TOP_GRIDS_{self.db_manager.db_name}", "10")) # grids accessed the most loaded at startup
+        self.warm_up_iterations = int(os.getenv("WARM_UP_ITERATIONS", "100")) # runs of code paths for the JIT compiler, 0 to disable
+        self.warm_up_rows = int(os.getenv("WARM_UP_ROWS", "1000")) # rows of each grid converted to JSON in each run
+        self._access_log = self._read_access_log()
+        self.write_flush_interval_milliseconds = int(os.getenv(f"GRID_WRITE_FLUSH_INTERVAL_MILLISECONDS_{self.db_manager.db_name}", "50"))
+        self.write_batch_max_operations = int(os.getenv(f"GRID_WRITE_BATCH_MAX_OPERATIONS_{self.db_manager.db_name}", "10000"))
+        self.write_ack = os.getenv(f"GRID_WRITE_ACK_{self.db_manager.db_name}", "durable") # durable: replies once changes are written, enqueue: once queued
+        self.write_retry_timeout_milliseconds = int(os.getenv(f"GRID_WRITE_RETRY_TIMEOUT_MILLISECONDS_{self.db_manager.db_name}", "60000"))
+        self.write_ack_timeout_milliseconds = int(os.getenv(f"GRID_WRITE_ACK_TIMEOUT_MILLISECONDS_{self.db_manager.db_name}", "10000"))
+        self.validation_interval_milliseconds = int(os.getenv(f"GRID_VALIDATION_INTERVAL_MILLISECONDS_{self.db_manager.db_name}", "1000")) # 0 to disable
+        self.notify = os.getenv(f"GRID_NOTIFY_{self.db_manager.db_name}", "true").lower() == "true" # rows written notified to other instances
+        self.instance_uuid = str(uuid.uuid4()) # tells notifications of this instance from those of others
+        self.change_writer = ChangeWriter(self.db_manager, self.write_flush_interval_milliseconds, self.write_batch_max_operations,
+                                          self.instance_uuid if self.notify else None,
+                                          self.write_retry_timeout_milliseconds, self._on_stamps) # changes written behind memory
+        self._snapshotStop = threading.Event()
+        self._snapshotThread = None
 
     from ._load_grid import _load_grid
     from ._load_columns import _load_columns
-    from ._load_rows import _load_rows
+    from ._load_rows import _load_rows, _iter_rows, _load_rows_by_uuid
+    from ._load_references import _load_references
+    from ._get_window import _get_window
+    from ._query_rows import _query_rows
+    from ._snapshot import _get_stamps, _load_snapshot, write_snapshot, start_snapshots, stop_snapshots
+    from ._validate import _validate_grid, _on_stamps
+    from ._notifications import start_notifications, stop_notifications, _on_notification
+    from ._warm_up import _read_access_log, write_access_log, warm_up
     from .handle_load import handle_load
     from .handle_change import handle_change
     from ._get_grid_column_row import _get_grid_column_row
+    from ._apply_batch import _apply_batch
     from ._add_row import _add_row
     from ._update_row import _update_row
     from ._add_relationship import _add_relationship
@@ -1,12 +1,17 @@
+import logging
 from .. import metadata
 from ..metadata import SystemIds
 from ..model.column import Column
 from ..model.row import ReferenceRow
+from ..utils.truncated import Truncated
+from .change_writer import OperationAddRelationship, OperationSetRevision
 
-def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid, row, changeValue):
-    print(f"✏️ Add relationship for row {row} in grid {grid} for column {column} with value '{changeValue}'")
+logger = logging.getLogger(__name__)
+
+def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid, row, changeValue, operations):
+    logger.info("✏️ Add relationship for row %s in grid %s for column %s with value '%s'", row, grid, column, Truncated(changeValue))
     if not gridUuid or not grid:
-        print(f"❌ No grid provided")
+        logger.warning("❌ No grid provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No grid provided for update",
@@ -15,7 +20,7 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
         }                
 
     if not columnUuid or not column:
-        print(f"❌ No column provided")
+        logger.warning("❌ No column provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No column provided for update",
@@ -24,7 +29,7 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
         }
 
     if str(column.typeUuid) != SystemIds.ReferenceColumnType:
-        print(f"❌ Column {column} is not a reference column, not supported for update")
+        logger.warning("❌ Column %s is not a reference column, not supported for update", column)
         return {
             "status": metadata.FailedStatus,
             "message": "Column is not a reference column, not supported for update",
@@ -33,7 +38,7 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
         }
 
     if not rowUuid or not row:
-        print(f"❌ No row provided")
+        logger.warning("❌ No row provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No row provided for update",
@@ -42,7 +47,7 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
         }
 
     if not changeValue:
-        print(f"❌ No change value provided")
+        logger.warning("❌ No change value provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No change value provided for update",
@@ -52,7 +57,7 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
 
     referenceUuid = changeValue.get('uuid')
     if not referenceUuid:
-        print(f"❌ No reference UUID provided")
+        logger.warning("❌ No reference UUID provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No reference UUID provided for update",
@@ -62,7 +67,7 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
 
     referenceValues = changeValue.get('values')
     if not referenceValues:
-        print(f"❌ No reference values provided")
+        logger.warning("❌ No reference values provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No reference values provided for update",
@@ -71,16 +76,19 @@ def _add_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid
         }
 
     referenceRow = ReferenceRow(column.referenceGrid, uuid = referenceUuid, values = referenceValues)
-    row.values[column.index] += [referenceRow.to_json()]
-    print(f"✅ Relationship added: {row}")
+    row.values[column.index] += [referenceRow]
+    row.revision += 1
+    operations.append((OperationAddRelationship, column.partition, column.dbColumn, str(rowUuid), str(referenceUuid)))
+    operations.append((OperationSetRevision, str(gridUuid), str(rowUuid), row.revision - 1, row.revision))
+    logger.debug("✅ Relationship added: %s", row)
 
     if gridUuid == SystemIds.Grids and columnUuid == SystemIds.GridColumnColumns:
-        print(f"Updating columns usage for grid {grid}")
+        logger.debug("Updating columns usage for grid %s", grid)
         (relatedGrid, relatedColumn, relatedRow) = self._get_grid_column_row(rowUuid)
         (relatedColumnGrid, relatedColumnColumn, relatedColumnRow) = self._get_grid_column_row(SystemIds.Columns, None, referenceUuid)
         if relatedGrid and relatedColumnRow:
             columnType = relatedColumnRow.values[2]
-            typeUuid = columnType[0].get('uuid')
+            typeUuid = columnType[0].uuid
             column = Column(referenceUuid,
                     index = 0,
                     fieldIndex = 0,
@@ -1,12 +1,16 @@
+import logging
 from .. import metadata
 from ..metadata import SystemIds
 from ..model.grid import Grid
 from ..model.row import Row
+from .change_writer import OperationInsertRow
 
-def _add_row(self, request, gridUuid, grid, rowUuid):
-    print(f"✏️ Add row {rowUuid} in grid {grid}")
+logger = logging.getLogger(__name__)
+
+def _add_row(self, request, gridUuid, grid, rowUuid, operations):
+    logger.info("✏️ Add row %s in grid %s", rowUuid, grid)
     if not gridUuid or not grid:
-        print(f"❌ No grid provided for update")
+        logger.warning("❌ No grid provided for update")
         return {
             "status": metadata.FailedStatus,
             "message": "No grid provided for update",
@@ -15,7 +19,7 @@ def _add_row(self, request, gridUuid, grid, rowUuid):
         } 
 
     if not rowUuid:
-        print(f"❌ No row UUID provided")
+        logger.warning("❌ No row UUID provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No row UUID provided for update",
@@ -33,15 +37,14 @@ def _add_row(self, request, gridUuid, grid, rowUuid):
             newItem.append("")
 
     row = Row(grid, uuid = rowUuid, revision = 1, values = newItem)
-    print(f"self.allRows: {self.allRows[gridUuid]}")
-    self.allRows[str(gridUuid)][str(rowUuid)] = row
-    print(f"self.allRows: {self.allRows[gridUuid]}")
-    print(f"✅ {row} added to grid {grid}")
+    self.grid_cache.add_row(gridUuid, row)
+    operations.append((OperationInsertRow, str(gridUuid), str(rowUuid), row.revision))
+    logger.debug("✅ %s added to grid %s", row, grid)
 
     if gridUuid == SystemIds.Grids:
-        print(f"Creating new grid in memory with uuid {rowUuid}")
+        logger.debug("Creating new grid in memory with uuid %s", rowUuid)
         grid = Grid(rowUuid, name = "", description = "", revision = 1)
-        self.allGrids[rowUuid] = grid
-        self.allRows[rowUuid] = { }
-        print(f"✅ New grid added to memory: {grid}")
+        self.grid_cache.put_grid(grid)
+        self.grid_cache.put_rows(rowUuid, { })
+        logger.debug("✅ New grid added to memory: %s", grid)
 
@@ -0,0 +1,129 @@
+import logging
+from .. import metadata
+from ..metadata import SystemIds
+from .handle_load import _get_grid_and_rows
+from ..utils.report_exception import report_exception
+from ._revisions import _get_revision_conflict, _get_conflict_reply
+
+logger = logging.getLogger(__name__)
+
+def _get_change_error(change, grid, column, row, addedRowUuids):
+    """
+    Returns why a change of an atomic batch can't be applied, or None, without applying it.
+    Rows added by earlier changes of the batch can be changed.
+    """
+    changeType = change.get('changeType')
+    gridUuid, columnUuid, rowUuid = change.get('gridUuid'), change.get('columnUuid'), change.get('rowUuid')
+    if changeType not in (metadata.ChangeAdd, metadata.ChangeUpdate, metadata.ChangeAddRelationship, metadata.ChangeRemoveRelationship):
+        return f"Change {changeType} not supported in atomic batches"
+    if not gridUuid or not grid: return "No grid provided for update"
+    if changeType == metadata.ChangeAdd:
+        if not rowUuid: return "No row UUID provided for update"
+        if row or (str(gridUuid), str(rowUuid)) in addedRowUuids: return f"Row {rowUuid} already exists"
+        return None
+    if not columnUuid or not column: return "No column provided for update"
+    isReference = str(column.typeUuid) == SystemIds.ReferenceColumnType
+    if changeType == metadata.ChangeUpdate and isReference: return "Column is a reference column, not supported for update"
+    if changeType != metadata.ChangeUpdate and not isReference: return "Column is not a reference column, not supported for update"
+    if not rowUuid or not (row or (str(gridUuid), str(rowUuid)) in addedRowUuids): return "No row provided for update"
+    if changeType == metadata.ChangeUpdate: return None
+    changeValue = change.get('changeValue')
+    if not changeValue or not isinstance(changeValue, dict): return "No change value provided for update"
+    if not changeValue.get('uuid'): return "No reference UUID provided for update"
+    if changeType == metadata.ChangeAddRelationship and not changeValue.get('values'): return "No reference values provided for update"
+    return None
+
+def _resolve_changes(self, changes):
+    """
+    Returns the grid, column and row of each change, looking up each grid once for the whole batch.
+    """
+    grids = {} # (grid, rows) by grid uuid
+    resolved = []
+    for change in changes:
+        gridUuid, columnUuid, rowUuid = change.get('gridUuid'), change.get('columnUuid'), change.get('rowUuid')
+        grid, rows, column, row = None, None, None, None
+        if gridUuid:
+            if str(gridUuid) not in grids: grids[str(gridUuid)] = _get_grid_and_rows(self, gridUuid)
+            grid, rows = grids[str(gridUuid)]
+            if grid and columnUuid: column = grid.get_column_by_uuid(columnUuid)
+            if grid and rowUuid and rows: row = rows.get(rowUuid)
+        resolved.append((grid, rows, column, row))
+    return resolved
+
+def _get_batch_reply(request, status, results, message = None):
+    reply = {
+        "status": status,
+        "results": results,
+        "userUuid": request.get('userUuid'),
+        "user": request.get('user')
+    }
+    if message: reply["message"] = message
+    return reply
+
+def _apply_batch(self, request, operations, gridUuids):
+    """
+    Applies the changes of a request all together or not at all: every change is validated before
+    any is applied, and the grids changed are dropped from memory, to be loaded again, if one fails
+    while applied. Changes are written in one transaction.
+
+    Returns:
+        dict: The reply, with the result of each change.
+    """
+    changes = request.get('changes', [])
+    try:
+        resolved = _resolve_changes(self, changes)
+    except Exception as e:
+        report_exception(e, f"Error resolving changes")
+        return _get_batch_reply(request, metadata.FailedStatus, [], "Error handling change: " + str(e))
+
+    results, addedRowUuids, conflicts, startRevisions = [], set(), [], {}
+    for index, (change, (grid, rows, column, row)) in enumerate(zip(changes, resolved)):
+        error = _get_change_error(change, grid, column, row, addedRowUuids)
+        if change.get('changeType') == metadata.ChangeAdd and not error:
+            addedRowUuids.add((str(change.get('gridUuid')), str(change.get('rowUuid'))))
+        conflict = None if error else _get_revision_conflict(change, row, startRevisions)
+        if error:
+            results.append({"index": index, "status": metadata.FailedStatus, "message": error})
+        elif conflict:
+            conflicts.append(conflict)
+            results.append({"index": index, "status": metadata.ConflictStatus, "message": f"Row {conflict['rowUuid']} changed meanwhile"})
+        else:
+            results.append({"index": index, "status": metadata.SuccessStatus})
+    failed = sum(1 for result in results if result["status"] == metadata.FailedStatus)
+    if conflicts and not failed:
+        logger.warning("⚠️ Atomic batch rejected: %s rows changed meanwhile", len(conflicts))
+        for result in results:
+            if result["status"] == metadata.SuccessStatus: result["status"] = metadata.SkippedStatus
+        return _get_conflict_reply(request, conflicts, results)
+    if failed:
+        logger.warning("❌ Atomic batch rejected: %s of %s changes invalid", failed, len(changes))
+        for result in results:
+            if result["status"] == metadata.SuccessStatus: result["status"] = metadata.SkippedStatus
+        return _get_batch_reply(request, metadata.FailedStatus, results, f"{failed} of {len(changes)} changes invalid, no change applied")
+
+    for index, (change, (grid, rows, column, row)) in enumerate(zip(changes, resolved)):
+        changeType = change.get('changeType')
+        gridUuid, columnUuid, rowUuid = change.get('gridUuid'), change.get('columnUuid'), change.get('rowUuid')
+        if row is None and rows is not None: row = rows.get(rowUuid) # added by an earlier change of the batch
+        try:
+            if changeType == metadata.ChangeAdd:
+                error = self._add_row(request, gridUuid, grid, rowUuid, operations)
+            elif changeType == metadata.ChangeUpdate:
+                error = self._update_row(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'), operations)
+            elif changeType == metadata.ChangeAddRelationship:
+                error = self._add_relationship(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'), operations)
+            else:
+                error = self._remove_relationship(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'), operations)
+            if error: raise ValueError(error.get('message'))
+        except Exception as e:
+            report_exception(e, f"Error applying change {index} of atomic batch")
+            # Changes applied so far are forgotten: grids are loaded again from the database
+            operations.clear()
+            for gridUuid in gridUuids:
+                self.grid_cache.remove(gridUuid)
+            results[index] = {"index": index, "status": metadata.FailedStatus, "message": str(e)}
+            for result in results:
+                if result["status"] == metadata.SuccessStatus: result["status"] = metadata.SkippedStatus
+            return _get_batch_reply(request, metadata.FailedStatus, results, "Error handling change: " + str(e))
+    logger.info("✅ Atomic batch of %s changes applied", len(changes))
+    return _get_batch_reply(request, metadata.SuccessStatus, results)
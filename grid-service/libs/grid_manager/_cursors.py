@@ -0,0 +1,26 @@
+import base64
+import binascii
+import json
+
+def _encode_cursor(sortColumnUuid, descending, **position):
+    """
+    Returns the cursor of the next window of rows: its position, as an offset among matching rows for queries
+    or as the sort key and uuid of the last row for windows, with the sort it was returned with.
+    """
+    cursor = {"sortColumnUuid": sortColumnUuid or None, "descending": descending, **position}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+def _decode_cursor(cursor, sortColumnUuid, descending, kind):
+    """
+    Returns the position of kind ("offset" or "after") given by a cursor, rejecting cursors returned with
+    another sort or by another kind of load: windows and queries of rows do not share positions.
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+    if not isinstance(decoded, dict) or kind not in decoded:
+        raise ValueError(f"Invalid cursor {cursor}")
+    if decoded.get("sortColumnUuid") != (sortColumnUuid or None) or decoded.get("descending") != descending:
+        raise ValueError(f"Invalid cursor {cursor}, returned with another sort")
+    return decoded[kind]
@@ -0,0 +1,51 @@
+import bisect
+from ..metadata import SystemIds
+from ._cursors import _encode_cursor, _decode_cursor
+
+def _get_sort_key(row, column):
+    """
+    Returns the key sorting a row by a column, rows without value being last.
+    Reference columns are sorted by the display values of referenced rows.
+    """
+    if column is None: return ()
+    value = row.values[column.index] if row.values else None
+    if str(column.typeUuid) == SystemIds.ReferenceColumnType:
+        value = ' | '.join(reference.displayString for reference in value) if value else None
+    return (value is None, value)
+
+def _decode_after(cursor, sortColumnUuid):
+    after = _decode_cursor(cursor, sortColumnUuid, False, "after")
+    try:
+        sortKey, rowUuid = after
+        return (tuple(sortKey), str(rowUuid))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+
+def _get_window(self, grid, rows, limit = None, cursor = None, sortColumnUuid = None):
+    """
+    Returns a window of at most limit rows sorted by a column (by uuid otherwise), starting after
+    the row designated by the cursor, and the cursor of the next window if any.
+    Sorted rows are kept in the grid cache until rows of the grid change.
+    Cursors of windows are valid for windows with the same sort only, and are not cursors of queries.
+    """
+    column = None
+    if sortColumnUuid:
+        column = grid.get_column_by_uuid(sortColumnUuid)
+        if column is None: raise ValueError(f"Sort column {sortColumnUuid} not found")
+    index = self.grid_cache.get_sorted_index(grid.uuid, sortColumnUuid)
+    if index is None:
+        index = sorted((_get_sort_key(row, column), rowUuid) for rowUuid, row in rows.items())
+        self.grid_cache.put_sorted_index(grid.uuid, sortColumnUuid, index)
+    start = 0
+    if cursor:
+        after = _decode_after(cursor, sortColumnUuid)
+        if len(after[0]) != (0 if column is None else 2):
+            raise ValueError(f"Invalid cursor {cursor}") # cursor of another sort column
+        try:
+            start = bisect.bisect_right(index, after)
+        except TypeError as e: # cursor of another sort column
+            raise ValueError(f"Invalid cursor {cursor}") from e
+    end = len(index) if limit is None else start + limit
+    window = index[start:end]
+    nextCursor = _encode_cursor(sortColumnUuid, False, after = [list(window[-1][0]), window[-1][1]]) if window and end < len(index) else None
+    return [rows[rowUuid] for _, rowUuid in window], nextCursor
@@ -1,9 +1,12 @@
+import logging
 from .. import metadata
 from ..model.column import Column
-from ..utils.decorators import echo
+from ..utils.decorators import instrument
 from ..utils.report_exception import report_exception
 
-@echo
+logger = logging.getLogger(__name__)
+
+@instrument
 def _load_columns(self, grid, loadReferenceGrid = True):
     try:
         result = self.db_manager.select_all('''
@@ -17,7 +20,7 @@ def _load_columns(self, grid, loadReferenceGrid = True):
                     booleans.bool0 -- display flag
             FROM relationships rel1
             -- Join rows to get column uuid
-            LEFT OUTER JOIN rows ON rows.gridUuid = ''' + f"'{metadata.SystemIds.Columns}' -- Columns" + '''
+            LEFT OUTER JOIN rows ON rows.gridUuid = %s -- Columns
             AND rows.uuid = rel1.toUuid0 AND rows.enabled = true
             -- Join texts to get order and name
             LEFT OUTER JOIN texts ON texts.uuid = rows.uuid AND texts.partition = 0
@@ -28,10 +31,10 @@ def _load_columns(self, grid, loadReferenceGrid = True):
             -- Join booleans to get display flag
             LEFT OUTER JOIN booleans ON booleans.uuid = rows.uuid AND booleans.partition = 0
             -- Filter by grid uuid and enabled
-            WHERE rel1.fromUuid = ''' + f"'{grid.uuid}' -- {grid.name}" + '''
+            WHERE rel1.fromUuid = %s
             AND rel1.partition = 0
             ORDER BY texts.text0
-        '''
+        ''', (metadata.SystemIds.Columns, str(grid.uuid)), prepare=True
         )
         index = 0
         fieldIndex = 0
@@ -50,7 +53,7 @@ def _load_columns(self, grid, loadReferenceGrid = True):
                             display = item[6])
             index += 1
             fieldIndex += column.numberOfFields
-            print(f"New column: {column}")
+            logger.debug("New column: %s", column)
             grid.columns.append(column)
     except Exception as e:
         report_exception(e, f"Error loading columns for grid {grid.uuid}")
@@ -58,16 +61,15 @@ def _load_columns(self, grid, loadReferenceGrid = True):
 
 def _get_reference_grid(self, referenceGridUuid, loadReferenceGrid):
     if referenceGridUuid and loadReferenceGrid:
-        print(f"Loading reference grid: {referenceGridUuid}")
-        referenceGrid = self.allGrids.get(referenceGridUuid)
+        logger.debug("Loading reference grid: %s", referenceGridUuid)
+        referenceGrid = self.grid_cache.get_grid(referenceGridUuid)
         if not referenceGrid:
-            print(f"Reference grid not found in memory, loading from database")
+            logger.debug("Reference grid not found in memory, loading from database")
             referenceGrid = self._load_grid(referenceGridUuid, loadReferenceGrid = False)
             if referenceGrid:
-                self.allGrids[referenceGridUuid] = referenceGrid
-                print(f"Reference grid loaded: {referenceGridUuid}")
+                logger.debug("Reference grid loaded: %s", referenceGridUuid)
             else:
-                print(f"❌ Error loading reference grid {referenceGridUuid}")
+                logger.error("❌ Error loading reference grid %s", referenceGridUuid)
                 raise Exception(f"Error loading reference grid {referenceGridUuid}")
         return referenceGrid
     else:
@@ -1,9 +1,12 @@
+import logging
 from .. import metadata
 from ..model.grid import Grid
-from ..utils.decorators import echo
+from ..utils.decorators import instrument
 from ..utils.report_exception import report_exception
 
-@echo
+logger = logging.getLogger(__name__)
+
+@instrument
 def _load_grid(self, gridUuid, loadReferenceGrid = True):
     try:
         result = self.db_manager.select_one('''
@@ -15,16 +18,16 @@ def _load_grid(self, gridUuid, loadReferenceGrid = True):
             -- Join texts to get name and description
             LEFT OUTER JOIN texts ON rows.uuid = texts.uuid AND texts.partition = 0
             -- Filter by grid uuid and enabled
-            WHERE rows.gridUuid = ''' + f"'{metadata.SystemIds.Grids}' -- Grids" + '''
-            AND rows.uuid = ''' + f"'{gridUuid}'" + '''
+            WHERE rows.gridUuid = %s -- Grids
+            AND rows.uuid = %s
             AND rows.enabled = true
-        '''
+        ''', (metadata.SystemIds.Grids, str(gridUuid)), prepare=True
         )
         if result:
             grid = Grid(gridUuid, name = result[0], description = result[1], revision = result[2])
-            self.allGrids[gridUuid] = grid
+            self.grid_cache.put_grid(grid)
             self._load_columns(grid, loadReferenceGrid)
-            print(f"New grid: {grid}")
+            logger.debug("New grid: %s", grid)
             return grid
     except Exception as e:
         report_exception(e, f"Error loading grid {gridUuid}")
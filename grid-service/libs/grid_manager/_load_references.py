@@ -0,0 +1,79 @@
+import logging
+from ..model.row import ReferenceRow, get_display_string
+from ..utils.decorators import instrument
+from ..utils.report_exception import report_exception
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_BATCH_SIZE = 1000 # number of row uuids sent in one statement
+
+def _batches(items):
+    for start in range(0, len(items), REFERENCE_BATCH_SIZE):
+        yield items[start:start + REFERENCE_BATCH_SIZE]
+
+@instrument
+def _load_references(self, grid, plan, rows, referenceRows = None):
+    """
+    Fills the reference columns of rows: relationships of rows are loaded by batches,
+    then referenced rows are resolved with the display values of their grid.
+    A referenced row is a single reference row shared by all cells referencing it,
+    kept in referenceRows by (reference grid uuid, row uuid) when given, across chunks of rows.
+    """
+    if not plan.referenceStatements or not rows: return
+    try:
+        rowUuids = list(rows.keys())
+        references = [] # (row, column, referenced row uuid)
+        referencedUuids = {} # referenced row uuids by reference grid uuid
+        for statement, columns in plan.referenceStatements:
+            for batch in _batches(rowUuids):
+                for item in self.db_manager.select_all(statement, {"rowUuids": batch}, prepare=True):
+                    row = rows.get(str(item[0]))
+                    if row is None: continue
+                    for position, column in enumerate(columns, 1):
+                        if item[position] and column.referenceGrid:
+                            referenceUuid = str(item[position])
+                            references.append((row, column, referenceUuid))
+                            referencedUuids.setdefault(str(column.referenceGrid.uuid), set()).add(referenceUuid)
+
+        displays = {}
+        for column in grid.columns:
+            referenceGridUuid = str(column.referenceGrid.uuid) if column.referenceGrid else None
+            if referenceGridUuid in referencedUuids and referenceGridUuid not in displays:
+                displays[referenceGridUuid] = _get_reference_displays(self, column.referenceGrid, referencedUuids[referenceGridUuid])
+
+        if referenceRows is None: referenceRows = {}
+        cellUuids = {} # uuids of rows referenced in each cell, by row and column
+        for row, column, referenceUuid in references:
+            referenceGridUuid = str(column.referenceGrid.uuid)
+            display = displays[referenceGridUuid].get(referenceUuid)
+            if display is None: continue # referenced row disabled or missing
+            cell = row.values[column.index]
+            uuids = cellUuids.get((id(row), column.index))
+            if uuids is None: uuids = cellUuids[(id(row), column.index)] = {reference.uuid for reference in cell}
+            if referenceUuid in uuids: continue
+            uuids.add(referenceUuid)
+            referenceRow = referenceRows.get((referenceGridUuid, referenceUuid))
+            if referenceRow is None:
+                referenceRow = referenceRows[(referenceGridUuid, referenceUuid)] = ReferenceRow(column.referenceGrid, uuid = referenceUuid, values = [display])
+            cell.append(referenceRow)
+        logger.debug("References loaded: %s", len(references))
+    except Exception as e:
+        report_exception(e, f"Error loading references for grid {str(grid.uuid)}")
+        raise e
+
+def _get_reference_displays(self, referenceGrid, referenceUuids):
+    """
+    Returns the display values of referenced rows by uuid, loading from the database
+    only those not known in memory.
+    """
+    displays = self.grid_cache.get_displays(referenceGrid.uuid, referenceUuids)
+    missing = [referenceUuid for referenceUuid in referenceUuids if referenceUuid not in displays]
+    if missing:
+        plan = referenceGrid.get_display_plan()
+        loaded = {}
+        for batch in _batches(missing):
+            for item in self.db_manager.select_all(plan.statement, {"gridUuid": str(referenceGrid.uuid), "rowUuids": batch}, prepare=True):
+                loaded[str(item[0])] = get_display_string(item[1:])
+        self.grid_cache.put_displays(referenceGrid.uuid, loaded)
+        displays.update(loaded)
+    return displays
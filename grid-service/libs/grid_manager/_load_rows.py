@@ -1,50 +1,75 @@
-from typing import LiteralString
-
-from ..model.row import Row, ReferenceRow
-from ..utils.decorators import echo
-from ..metadata import SystemIds
+import logging
+from ..model.row import Row
+from ._load_references import _batches
+from ..utils.decorators import instrument
 from ..utils.report_exception import report_exception
 
-@echo
+logger = logging.getLogger(__name__)
+
+@instrument
 def _load_rows(self, grid):
-    print(f"Loading rows for grid {grid.uuid}")
-    self.allRows[str(grid.uuid)] = { } # dictionary of rows by uuid
-    dbSelectClauses = [column.dbSelectClause for column in grid.columns]
-    dbSelectColumns = (',\n' if len(dbSelectClauses) > 0 else '') + ',\n'.join(dbSelectClauses)
-    dbGroupClauses = [column.dbSelectClause for column in grid.columns if column.typeUuid and str(column.typeUuid) != SystemIds.ReferenceColumnType]
-    dbGroupColumns = (',\n' if len(dbGroupClauses) > 0 else '') + ',\n'.join(dbGroupClauses)
-    dbJoinClauses = ''.join(list[LiteralString](dict.fromkeys([column.dbJoinClause for column in grid.columns])))
+    logger.debug("Loading rows for grid %s", grid.uuid)
+    rows = { } # dictionary of rows by uuid
     try:
-        result = self.db_manager.select_all(
-            '''-- Load rows
-            SELECT rows.uuid, rows.revision''' + dbSelectColumns + '''
-            FROM rows''' +  dbJoinClauses + '''
-            -- Filter by grid uuid and enabled
-            WHERE rows.gridUuid = ''' + f"'{grid.uuid}' -- {grid.name}" + '''
-            AND rows.enabled = true
-            GROUP BY rows.uuid, rows.revision''' + dbGroupColumns
-        )
-        indexData = 2
-        for item in result:
-            uuid, revision = item[0], item[1]
-            newItem = []
-            for column in grid.columns:
-                if column.typeUuid and str(column.typeUuid) == SystemIds.ReferenceColumnType:
-                    references = []
-                    if column.referenceGrid and item[indexData+column.fieldIndex]:
-                        referenceUuid = item[indexData+column.fieldIndex]
-                        referenceValues = item[indexData+column.fieldIndex+1]
-                        for (refUuid, value) in zip(referenceUuid.split('||||'), referenceValues.split('||||')):
-                            referenceRow = ReferenceRow(column.referenceGrid, uuid =refUuid, values = [value])
-                            references += [referenceRow.to_json()]
-                    newItem.append(references)
-                else:
-                    newItem.append(item[indexData+column.fieldIndex])
-            row = Row(grid, uuid = uuid, revision = revision, values = newItem)
-            self.allRows[str(grid.uuid)][str(uuid)] = row
-            print(f"New row: {row}")
-        print(f"Rows loaded: {len(self.allRows[str(grid.uuid)])}")
+        # Read before rows, so that rows changed meanwhile are found by the next validation
+        stamp = self._get_stamps([str(grid.uuid)])[str(grid.uuid)]
+        for chunk in self._iter_rows(grid):
+            rows.update(chunk)
+        self.grid_cache.put_rows(grid.uuid, rows)
+        self.grid_cache.put_validation(grid.uuid, stamp)
+        logger.info("Rows loaded: %s", len(rows))
+        return rows
     except Exception as e:
         report_exception(e, f"Error loading rows for grid {str(grid.uuid)}")
         raise e
 
+def _iter_rows(self, grid):
+    """
+    Yields the rows of a grid by chunks, as dictionaries of rows by uuid with their references loaded.
+    In streaming mode, rows are read through a server-side cursor, so that a chunk is
+    available before the full grid has been read and memory is bounded by the chunk size.
+    """
+    plan = grid.get_load_plan()
+    chunkSize = self.db_manager.streaming_itersize
+    if self.db_manager.streaming:
+        result = self.db_manager.select_stream(plan.statement, plan.params, itersize = chunkSize)
+    else:
+        result = self.db_manager.select_all(plan.statement, plan.params, prepare=True)
+    chunk = { }
+    referenceRows = { } # reference rows shared by all chunks
+    for item in result:
+        chunk[str(item[0])] = _new_row(grid, plan, item)
+        if len(chunk) >= chunkSize:
+            self._load_references(grid, plan, chunk, referenceRows)
+            yield chunk
+            chunk = { }
+    if chunk:
+        self._load_references(grid, plan, chunk, referenceRows)
+        yield chunk
+
+def _new_row(grid, plan, item):
+    newItem = []
+    for position in plan.positions:
+        if position is None:
+            newItem.append([]) # references are loaded once the chunk is complete
+        else:
+            newItem.append(item[position])
+    return Row(grid, uuid = item[0], revision = item[1], values = newItem)
+
+@instrument
+def _load_rows_by_uuid(self, grid, rowUuids):
+    """
+    Returns the given rows of a grid, with their references loaded, as a dictionary of rows by uuid.
+    Rows disabled or missing are not returned.
+    """
+    plan = grid.get_load_plan()
+    rows = { }
+    try:
+        for batch in _batches(list(rowUuids)):
+            for item in self.db_manager.select_all(plan.rowsStatement, dict(plan.params, rowUuids = batch), prepare=True):
+                rows[str(item[0])] = _new_row(grid, plan, item)
+        self._load_references(grid, plan, rows)
+        return rows
+    except Exception as e:
+        report_exception(e, f"Error loading rows by uuid for grid {str(grid.uuid)}")
+        raise e
@@ -0,0 +1,101 @@
+import json
+import logging
+from ..metadata import SystemIds
+from ..utils.decorators import instrument
+from .change_writer import NOTIFY_CHANNEL
+from ._load_references import _get_reference_displays
+from ._validate import _drop_changed_grids, _refresh_references, _refresh_rows
+
+logger = logging.getLogger(__name__)
+
+def start_notifications(self):
+    """
+    Starts listening to the rows written by other instances of the service, to keep grids in memory up to date.
+    """
+    if not self.notify: return
+    self.db_manager.start_listening(NOTIFY_CHANNEL, self._on_notification)
+
+def stop_notifications(self):
+    self.db_manager.stop_listening()
+
+@instrument
+def _on_notification(self, payload):
+    """
+    Patches the grids in memory with the rows written by another instance of the service: rows whose revision
+    in memory is older than the revision notified are loaded again, and so are the display values referencing them.
+    When notifications were missed, grids in memory are validated against the database at their next use,
+    or dropped from memory when grids are not validated.
+    """
+    if payload is None:
+        if self.validation_interval_milliseconds > 0:
+            logger.warning("⚠️ Notifications of database %s missed, grids in memory to be validated", self.db_manager.db_name)
+            self.grid_cache.expire_validations()
+        else:
+            logger.warning("⚠️ Notifications of database %s missed, grids in memory dropped", self.db_manager.db_name)
+            _drop_grids(self)
+        return
+    notification = json.loads(payload)
+    if notification.get("instance") == self.instance_uuid: return # rows written by this instance
+    revisions = {} # revisions by row uuid, by grid uuid
+    for gridUuid, rowUuid, revision in notification.get("rows", []):
+        revisions.setdefault(str(gridUuid), {})[str(rowUuid)] = int(revision)
+    for gridUuid, gridRevisions in revisions.items():
+        _patch_rows(self, gridUuid, gridRevisions)
+
+def _drop_grids(self):
+    """
+    Drops the grids in memory, to be loaded again at their next use. Pinned grids are kept in memory,
+    their rows changed in the database are loaded again once changes of this instance are written.
+    """
+    for grid, _ in self.grid_cache.get_loaded():
+        gridUuid = str(grid.uuid)
+        with self.grid_cache.lock(gridUuid).write():
+            if gridUuid not in self.grid_cache.pinnedGridUuids:
+                self.grid_cache.remove(gridUuid)
+                continue
+            validation = self.grid_cache.get_validation(gridUuid)
+            if validation is None: continue
+            if not self.change_writer.is_idle():
+                logger.warning("⚠️ Grid %s %s not refreshed, changes are being written", gridUuid, grid.name)
+                continue
+            _refresh_rows(self, validation[0], validation[1])
+
+def _patch_rows(self, gridUuid, revisions):
+    changedRows, removedRowUuids = {}, []
+    if self.grid_cache.get_validation(gridUuid) is None:
+        # Rows not in memory, display values of rows referenced by other grids may be
+        self.grid_cache.forget_displays(gridUuid, revisions.keys())
+        changedRowUuids = list(revisions.keys())
+    else:
+        with self.grid_cache.lock(gridUuid).write():
+            validation = self.grid_cache.get_validation(gridUuid)
+            if validation is None: return
+            grid, rows, _, _ = validation
+            staleRowUuids = [rowUuid for rowUuid, revision in revisions.items() if rowUuid not in rows or rows[rowUuid].revision < revision]
+            if not staleRowUuids: return
+            previous = {rowUuid: rows[rowUuid].revision for rowUuid in staleRowUuids if rowUuid in rows}
+            changedRows = self._load_rows_by_uuid(grid, staleRowUuids)
+            removedRowUuids = [rowUuid for rowUuid in previous if rowUuid not in changedRows] # disabled meanwhile
+            # The stamp of the grid is left as is: rows are compared with the database at the next validation
+            self.grid_cache.replace_rows(gridUuid, changedRows, removedRowUuids)
+        logger.info("🔔 Grid %s %s patched: %s rows changed, %s rows removed", gridUuid, grid.name, len(changedRows), len(removedRowUuids))
+        changedRowUuids = list(changedRows.keys())
+    if gridUuid in (SystemIds.Grids, SystemIds.Columns):
+        _drop_changed_grids(self, gridUuid, changedRows, removedRowUuids)
+        return
+    _patch_references(self, gridUuid, changedRowUuids, removedRowUuids)
+
+def _patch_references(self, referenceGridUuid, changedRowUuids, removedRowUuids):
+    """
+    Updates the display values of rows of grids in memory referencing rows changed in a reference grid.
+    """
+    for grid, _ in self.grid_cache.get_loaded():
+        columns = [column for column in grid.columns if column.referenceGridUuid and str(column.referenceGridUuid) == referenceGridUuid]
+        if not columns or str(grid.uuid) == referenceGridUuid: continue
+        referenceGrid = columns[0].referenceGrid
+        displays = _get_reference_displays(self, referenceGrid, changedRowUuids) if changedRowUuids and referenceGrid else {}
+        with self.grid_cache.lock(grid.uuid).write():
+            rows = self.grid_cache.get_rows(grid.uuid)
+            if rows is None: continue
+            _refresh_references(grid, rows, referenceGridUuid, displays, removedRowUuids)
+            self.grid_cache.invalidate_sorted_indexes(grid.uuid)
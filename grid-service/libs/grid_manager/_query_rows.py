@@ -0,0 +1,41 @@
+from ._cursors import _encode_cursor, _decode_cursor
+from .column_store import ColumnStore
+
+def _decode_offset(cursor, sortColumnUuid, descending):
+    offset = _decode_cursor(cursor, sortColumnUuid, descending, "offset")
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Invalid cursor {cursor}")
+    return offset
+
+def _get_column_store(self, grid, rows):
+    """
+    Returns the rows of a grid by column, kept in the grid cache until rows of the grid change.
+    """
+    columnStore = self.grid_cache.get_column_store(grid.uuid)
+    if columnStore is None:
+        columnStore = ColumnStore(grid, rows)
+        self.grid_cache.put_column_store(grid.uuid, columnStore)
+    return columnStore
+
+def _query_rows(self, grid, rows, filters = None, sortColumnUuid = None, descending = False, aggregates = None, limit = None, cursor = None):
+    """
+    Returns a window of at most limit rows matching filters, sorted by a column (by uuid otherwise),
+    starting at the position given by the cursor, with the number of matching rows, the results of aggregates
+    of matching rows, and the cursor of the next window if any.
+    Cursors of queries are positions among matching rows: rows changed between windows may shift them.
+    They are valid for queries with the same sort only, and are not cursors of windows.
+    """
+    if filters is not None and not isinstance(filters, list): raise ValueError(f"Invalid filters {filters}")
+    if aggregates is not None and not isinstance(aggregates, list): raise ValueError(f"Invalid aggregates {aggregates}")
+    if not isinstance(descending, bool): raise ValueError(f"Invalid descending {descending}")
+    if sortColumnUuid and grid.get_column_by_uuid(sortColumnUuid) is None:
+        raise ValueError(f"Sort column {sortColumnUuid} not found")
+    columnStore = _get_column_store(self, grid, rows)
+    mask = columnStore.filter(filters)
+    results = columnStore.aggregate(mask, aggregates)
+    positions = columnStore.sort(mask, sortColumnUuid, descending)
+    start = _decode_offset(cursor, sortColumnUuid, descending) if cursor else 0
+    end = len(positions) if limit is None else start + limit
+    window = [rows[columnStore.uuids[position]] for position in positions[start:end]]
+    nextCursor = _encode_cursor(sortColumnUuid, descending, offset = end) if end < len(positions) else None
+    return window, len(positions), results, nextCursor
@@ -1,10 +1,15 @@
+import logging
 from .. import metadata
 from ..metadata import SystemIds
+from ..utils.truncated import Truncated
+from .change_writer import OperationRemoveRelationship, OperationSetRevision
 
-def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid, row, changeValue):  
-    print(f"✏️ Remove relationship for row {row} in grid {grid} for column {column} with value '{changeValue}'")
+logger = logging.getLogger(__name__)
+
+def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowUuid, row, changeValue, operations):  
+    logger.info("✏️ Remove relationship for row %s in grid %s for column %s with value '%s'", row, grid, column, Truncated(changeValue))
     if not gridUuid or not grid:
-        print(f"❌ No grid provided")
+        logger.warning("❌ No grid provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No grid provided for update",
@@ -13,7 +18,7 @@ def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowU
         }                
 
     if not columnUuid or not column:
-        print(f"❌ No column provided")
+        logger.warning("❌ No column provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No column provided for update",
@@ -22,7 +27,7 @@ def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowU
         }
 
     if str(column.typeUuid) != SystemIds.ReferenceColumnType:
-        print(f"❌ Column {column} is not a reference column, not supported for update")
+        logger.warning("❌ Column %s is not a reference column, not supported for update", column)
         return {
             "status": metadata.FailedStatus,
             "message": "Column is not a reference column, not supported for update",
@@ -31,7 +36,7 @@ def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowU
         }
 
     if not rowUuid or not row:
-        print(f"❌ No row provided")
+        logger.warning("❌ No row provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No row provided for update",
@@ -40,7 +45,7 @@ def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowU
         }
 
     if not changeValue:
-        print(f"❌ No change value provided")
+        logger.warning("❌ No change value provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No change value provided for update",
@@ -50,7 +55,7 @@ def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowU
 
     referenceUuid = changeValue.get('uuid')
     if not referenceUuid:
-        print(f"❌ No reference UUID provided")
+        logger.warning("❌ No reference UUID provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No reference UUID provided for update",
@@ -60,8 +65,11 @@ def _remove_relationship(self, request, gridUuid, grid, columnUuid, column, rowU
 
     values = row.values[column.index]
     for value in values:
-        if value.get('uuid') == referenceUuid:
+        if value.uuid == referenceUuid:
             values.remove(value)
+            row.revision += 1
+            operations.append((OperationRemoveRelationship, column.partition, column.dbColumn, str(rowUuid), str(referenceUuid)))
+            operations.append((OperationSetRevision, str(gridUuid), str(rowUuid), row.revision - 1, row.revision))
             break
-    print(f"✅ Relationship removed for uuid={referenceUuid}: {row}")
+    logger.debug("✅ Relationship removed for uuid=%s: %s", referenceUuid, row)
 
@@ -0,0 +1,65 @@
+from .. import metadata
+from .change_writer import OperationInsertRow, OperationSetRevision
+
+def _get_revision_conflict(change, row, startRevisions):
+    """
+    Returns the conflict of a change expecting another revision of its row than the revision the row had
+    when the request started, or None. Rows are compared to the revisions their changes were made from,
+    so that a request can change a row several times.
+    """
+    if row is None: return None
+    revision = startRevisions.setdefault(str(row.uuid), row.revision)
+    expectedRevision = change.get('expectedRevision')
+    if expectedRevision is None or expectedRevision == revision: return None
+    return {
+        "gridUuid": change.get('gridUuid'),
+        "rowUuid": str(row.uuid),
+        "columnUuid": change.get('columnUuid'),
+        "expectedRevision": expectedRevision,
+        "revision": row.revision,
+        "row": row.to_json()
+    }
+
+def _get_conflict_reply(request, conflicts, results = None):
+    reply = {
+        "status": metadata.ConflictStatus,
+        "message": f"{len(conflicts)} rows changed meanwhile, no change applied" if results is not None else f"{len(conflicts)} rows changed meanwhile",
+        "conflicts": conflicts,
+        "userUuid": request.get('userUuid'),
+        "user": request.get('user')
+    }
+    if results is not None: reply["results"] = results
+    return reply
+
+def _get_revised_rows(operations):
+    """
+    Returns the revisions of rows changed by operations, by row uuid.
+    """
+    revisions = {}
+    for operation in operations:
+        if operation[0] == OperationInsertRow:
+            revisions[operation[2]] = operation[3]
+        elif operation[0] == OperationSetRevision:
+            revisions[operation[2]] = operation[4]
+    return revisions
+
+def _get_current_conflicts(self, request, rowUuids):
+    """
+    Returns the conflicts of rows changed meanwhile in the database, with their current revision and values,
+    once their grids are loaded again.
+    """
+    conflicts = []
+    for change in request.get('changes', []):
+        gridUuid, rowUuid = change.get('gridUuid'), change.get('rowUuid')
+        if not gridUuid or str(rowUuid) not in rowUuids: continue
+        rowUuids = rowUuids - {str(rowUuid)} # one conflict by row
+        with self.grid_cache.lock(gridUuid).read():
+            _, _, row = self._get_grid_column_row(gridUuid, None, str(rowUuid))
+        conflicts.append({
+            "gridUuid": gridUuid,
+            "rowUuid": str(rowUuid),
+            "expectedRevision": change.get('expectedRevision'),
+            "revision": row.revision if row else None,
+            "row": row.to_json() if row else None
+        })
+    return conflicts
@@ -0,0 +1,122 @@
+import logging
+import pickle
+import threading
+from ..metadata import SystemIds
+from ..utils.decorators import instrument
+from ..utils.report_exception import report_exception
+
+logger = logging.getLogger(__name__)
+
+def _get_stamped_grid_uuids(grid):
+    """
+    Returns the grids whose rows a grid in memory depends on: the grid, the grids it references
+    for display values, and the grids describing grids and columns.
+    """
+    gridUuids = {str(grid.uuid), SystemIds.Grids, SystemIds.Columns}
+    for column in grid.columns:
+        if column.referenceGridUuid: gridUuids.add(str(column.referenceGridUuid))
+    return sorted(gridUuids)
+
+def _get_stamps(self, gridUuids):
+    """
+    Returns the revision stamps of grids: the revisions of grids, increased by every row of the grid inserted,
+    updated or deleted in the database, 0 for grids never changed.
+    """
+    result = self.db_manager.select_all('''
+        -- Stamp grids
+        SELECT gridRevisions.gridUuid, gridRevisions.revision
+        FROM gridRevisions
+        WHERE gridRevisions.gridUuid = ANY(%s::uuid[])
+    ''', (list(gridUuids),), prepare=True
+    )
+    stamps = {gridUuid: 0 for gridUuid in gridUuids}
+    for item in result:
+        stamps[str(item[0])] = int(item[1])
+    return stamps
+
+def _load_snapshot(self, gridUuid):
+    """
+    Puts in memory a grid and its rows from the snapshot, if the rows it depends on did not change since.
+    Stale grids are discarded from the snapshot, to be loaded from the database.
+    """
+    if self.grid_snapshot is None: return None, None
+    stamps = self.grid_snapshot.get_stamps(gridUuid)
+    if stamps is None: return None, None
+    try:
+        if self._get_stamps(stamps.keys()) != stamps:
+            logger.info("📸 Grid %s is stale in snapshot", gridUuid)
+            self.grid_snapshot.discard(gridUuid)
+            return None, None
+        grid, rows = self.grid_snapshot.read(gridUuid)
+    except Exception as e:
+        report_exception(e, f"Error reading grid {gridUuid} from snapshot")
+        self.grid_snapshot.discard(gridUuid)
+        return None, None
+    self.grid_cache.put_grid(grid)
+    self.grid_cache.put_rows(gridUuid, rows)
+    self.grid_cache.put_validation(gridUuid, stamps[str(gridUuid)])
+    logger.info("📸 Grid %s %s with %s rows restored from snapshot", gridUuid, grid.name, len(rows))
+    return grid, rows
+
+def _get_cached_stamps(self, grid):
+    """
+    Returns the stamps the rows in memory of a grid, and of the grids it depends on, were validated at,
+    or None if one of them is not known or rows are ahead of the database while changes are written.
+    """
+    gridUuids = _get_stamped_grid_uuids(grid)
+    if not self.change_writer.is_idle(gridUuids): return None
+    stamps = {}
+    for gridUuid in gridUuids:
+        validation = self.grid_cache.get_validation(gridUuid)
+        if validation is None or validation[2] is None: return None
+        stamps[gridUuid] = validation[2]
+    return stamps
+
+def _get_snapshot_records(self):
+    for grid, _ in self.grid_cache.get_loaded():
+        gridUuid = str(grid.uuid)
+        with self.grid_cache.lock(gridUuid).read(): # rows do not change while stamped and serialized
+            validation = self.grid_cache.get_validation(gridUuid)
+            stamps = _get_cached_stamps(self, grid) if validation is not None else None
+            if stamps is None:
+                logger.debug("📸 Grid %s not written to snapshot, its rows are not validated", gridUuid)
+                continue
+            payload = pickle.dumps((validation[0], validation[1]), protocol = pickle.HIGHEST_PROTOCOL)
+        yield gridUuid, stamps, payload
+
+@instrument
+def write_snapshot(self):
+    """
+    Writes the grids in memory, with their rows, to the snapshot file.
+    """
+    if self.grid_snapshot is None: return
+    try:
+        count = self.grid_snapshot.write(_get_snapshot_records(self))
+        logger.info("📸 Grid snapshot %s written with %s grids", self.grid_snapshot.fileName, count)
+    except Exception as e:
+        report_exception(e, f"Error writing grid snapshot {self.grid_snapshot.fileName}")
+
+def start_snapshots(self):
+    """
+    Starts writing the snapshot and the access log periodically in the background.
+    """
+    if (self.grid_snapshot is None and not self.access_log_file) or self._snapshotThread is not None: return
+    self._snapshotStop.clear()
+    self._snapshotThread = threading.Thread(target = _write_snapshots, args = (self,), name = "snapshot", daemon = True)
+    self._snapshotThread.start()
+
+def stop_snapshots(self):
+    """
+    Stops writing the snapshot and the access log periodically, and writes them a last time.
+    """
+    if self._snapshotThread is None: return
+    self._snapshotStop.set()
+    self._snapshotThread.join()
+    self._snapshotThread = None
+    self.write_snapshot()
+    self.write_access_log()
+
+def _write_snapshots(self):
+    while not self._snapshotStop.wait(self.snapshot_interval_seconds):
+        self.write_snapshot()
+        self.write_access_log()
@@ -1,10 +1,15 @@
+import logging
 from .. import metadata
 from ..metadata import SystemIds
+from ..utils.truncated import Truncated
+from .change_writer import OperationSetValue, OperationSetRevision
 
-def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row, changeValue):
-    print(f"✏️ Update row {row} in grid {grid} for column {column} with value '{changeValue}'")
+logger = logging.getLogger(__name__)
+
+def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row, changeValue, operations):
+    logger.info("✏️ Update row %s in grid %s for column %s with value '%s'", row, grid, column, Truncated(changeValue))
     if not gridUuid or not grid:
-        print(f"❌ No grid provided")
+        logger.warning("❌ No grid provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No grid provided for update",
@@ -13,7 +18,7 @@ def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row,
         }                
 
     if not columnUuid or not column:
-        print(f"❌ No column provided")
+        logger.warning("❌ No column provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No column provided for update",
@@ -22,7 +27,7 @@ def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row,
         }
 
     if str(column.typeUuid) == SystemIds.ReferenceColumnType:
-        print(f"❌ Column {column} is a reference column, not supported for update")
+        logger.warning("❌ Column %s is a reference column, not supported for update", column)
         return {
             "status": metadata.FailedStatus,
             "message": "Column is a reference column, not supported for update",
@@ -31,7 +36,7 @@ def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row,
         }
 
     if not rowUuid or not row:
-        print(f"❌ No row provided")
+        logger.warning("❌ No row provided")
         return {
             "status": metadata.FailedStatus,
             "message": "No row provided for update",
@@ -41,7 +46,11 @@ def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row,
 
     row.values[column.index] = changeValue
     row._set_display_string(grid)
-    print(f"✅ Row updated: {row}")
+    row.revision += 1
+    operations.append((OperationSetValue, column.dbTable, column.partition, column.dbColumn, str(rowUuid), changeValue))
+    operations.append((OperationSetRevision, str(gridUuid), str(rowUuid), row.revision - 1, row.revision))
+    self.grid_cache.set_display(gridUuid, rowUuid, row.displayString)
+    logger.debug("✅ Row updated: %s", row)
 
     if gridUuid == SystemIds.Grids:
         (relatedGrid, relatedColumn, relatedRow) = self._get_grid_column_row(rowUuid)
@@ -49,5 +58,5 @@ def _update_row(self, request, gridUuid, grid, columnUuid, column, rowUuid, row,
             relatedGrid.name = changeValue
         elif columnUuid == SystemIds.GridColumnDesc:
             relatedGrid.description = changeValue
-        print(f"✅ Grid updated: {grid}")
+        logger.debug("✅ Grid updated: %s", grid)
 
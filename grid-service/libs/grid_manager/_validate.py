@@ -0,0 +1,139 @@
+import logging
+import time
+from contextlib import ExitStack
+from ..metadata import SystemIds
+from ..utils.decorators import instrument
+from ..utils.report_exception import report_exception
+from ._snapshot import _get_stamped_grid_uuids
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_OVERDUE_INTERVALS = 10 # intervals without validation after which locks are waited for
+
+def _select_grid_revisions(self, gridUuid):
+    result = self.db_manager.select_all('''
+        -- Revisions of rows
+        SELECT rows.uuid, rows.revision
+        FROM rows
+        WHERE rows.gridUuid = %s
+        AND rows.enabled = true
+    ''', (str(gridUuid),), prepare=True
+    )
+    return {str(item[0]): int(item[1]) for item in result}
+
+def _refresh_rows(self, grid, rows):
+    """
+    Loads again the rows of a grid whose revision in the database is not the revision in memory,
+    and forgets rows disabled or removed from the database.
+
+    Returns:
+        tuple: The rows loaded again by uuid, and the uuids of rows forgotten.
+    """
+    revisions = _select_grid_revisions(self, grid.uuid)
+    changedRowUuids = [rowUuid for rowUuid, revision in revisions.items() if rowUuid not in rows or rows[rowUuid].revision != revision]
+    removedRowUuids = [rowUuid for rowUuid in rows if rowUuid not in revisions]
+    changedRows = self._load_rows_by_uuid(grid, changedRowUuids) if changedRowUuids else {}
+    self.grid_cache.replace_rows(grid.uuid, changedRows, removedRowUuids)
+    return changedRows, removedRowUuids
+
+def _refresh_references(grid, rows, referenceGridUuid, displays, removedRowUuids):
+    """
+    Updates the display values, given by row uuid, of rows of a grid referencing rows changed in a reference grid.
+    """
+    columns = [column for column in grid.columns if column.referenceGridUuid and str(column.referenceGridUuid) == referenceGridUuid]
+    if not columns: return
+    removed = set(removedRowUuids)
+    for row in rows.values():
+        for column in columns:
+            cell = row.values[column.index]
+            if not cell: continue
+            for reference in cell:
+                display = displays.get(reference.uuid)
+                if display is not None: reference.displayString = display
+            if removed: cell[:] = [reference for reference in cell if reference.uuid not in removed]
+
+@instrument
+def _validate_grid(self, gridUuid):
+    """
+    Refreshes the rows in memory of a grid, and of the grids it depends on, changed in the database by other
+    instances of the service or other programs, at most once per validation interval. Grids are compared
+    to the database by their revisions, read in one query, then only rows whose
+    revision changed are loaded again. Grids whose definition changed are dropped from memory, to be loaded again.
+    Rows in memory ahead of the database, while changes of the grids are written, are validated later.
+    Locked grids are validated later too, unless validation is overdue: locks are then waited for,
+    at most one interval.
+    """
+    if self.validation_interval_milliseconds <= 0: return
+    interval = self.validation_interval_milliseconds / 1000
+    validation = self.grid_cache.get_validation(gridUuid)
+    if validation is None: return
+    elapsed = time.monotonic() - validation[3]
+    if elapsed < interval: return
+    overdue = elapsed >= interval * VALIDATION_OVERDUE_INTERVALS
+    log = logger.info if overdue else logger.debug
+    try:
+        # Reference grids are refreshed before the grid, so that display values are up to date
+        gridUuids = [uuid for uuid in _get_stamped_grid_uuids(validation[0]) if uuid != str(gridUuid)] + [str(gridUuid)]
+        gridUuids = [uuid for uuid in gridUuids if self.grid_cache.get_validation(uuid) is not None]
+        stamps = self._get_stamps(gridUuids)
+        staleGridUuids = []
+        for uuid in gridUuids:
+            validation = self.grid_cache.get_validation(uuid)
+            if validation is None: continue
+            stamp = validation[2]
+            if stamp is not None and stamp == stamps[uuid]:
+                self.grid_cache.put_validation(uuid, stamp)
+            else:
+                staleGridUuids.append(uuid)
+        if not staleGridUuids: return
+        lockedGridUuids = sorted(set(staleGridUuids) | {str(gridUuid)})
+        with ExitStack() as locks:
+            # Locks are not waited for until validation is overdue, so that requests holding locks seldom wait for a validation
+            for uuid in lockedGridUuids:
+                lock = self.grid_cache.lock(uuid)
+                if not lock.acquire_write(blocking = overdue, timeout = interval):
+                    log("Grid %s not validated for %.1f seconds, grid %s is locked", gridUuid, elapsed, uuid)
+                    return
+                locks.callback(lock.release_write)
+            if not self.change_writer.is_idle(lockedGridUuids):
+                log("Grid %s not validated for %.1f seconds, changes are being written", gridUuid, elapsed)
+                return
+            for uuid in staleGridUuids:
+                validation = self.grid_cache.get_validation(uuid)
+                if validation is None: continue
+                grid, rows, _, _ = validation
+                changedRows, removedRowUuids = _refresh_rows(self, grid, rows)
+                self.grid_cache.put_validation(uuid, stamps[uuid])
+                if not changedRows and not removedRowUuids: continue
+                logger.info("🔄 Grid %s %s refreshed: %s rows changed, %s rows removed", uuid, grid.name, len(changedRows), len(removedRowUuids))
+                if uuid in (SystemIds.Grids, SystemIds.Columns):
+                    _drop_changed_grids(self, uuid, changedRows, removedRowUuids)
+                elif uuid != str(gridUuid):
+                    referencing = self.grid_cache.get_validation(gridUuid)
+                    if referencing is not None:
+                        displays = {rowUuid: row.displayString for rowUuid, row in changedRows.items()}
+                        _refresh_references(referencing[0], referencing[1], uuid, displays, removedRowUuids)
+                        self.grid_cache.invalidate_sorted_indexes(gridUuid)
+    except Exception as e:
+        report_exception(e, f"Error validating grid {gridUuid}")
+
+def _on_stamps(self, stamps):
+    """
+    Records the revisions of grids after changes of this instance are written, so that they are not refreshed
+    for them.
+    """
+    for gridUuid, (before, after) in stamps.items():
+        self.grid_cache.advance_stamp(gridUuid, before, after)
+
+def _drop_changed_grids(self, systemGridUuid, changedRows, removedRowUuids):
+    """
+    Drops from memory the grids whose definition changed: grids whose row changed in the Grids grid,
+    or all grids but system grids when columns changed.
+    """
+    if systemGridUuid == SystemIds.Grids:
+        gridUuids = list(changedRows.keys()) + list(removedRowUuids)
+    else:
+        gridUuids = [str(grid.uuid) for grid, _ in self.grid_cache.get_loaded()]
+    for uuid in gridUuids:
+        if uuid not in self.grid_cache.pinnedGridUuids:
+            self.grid_cache.remove(uuid)
@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+import time
+from collections import Counter
+from .grid_cache import GridCache
+from .handle_load import _get_grid_and_rows
+from ..utils.report_exception import report_exception
+
+logger = logging.getLogger(__name__)
+
+ACCESS_LOG_MAX_GRIDS = 100 # number of grids kept in the access log
+
+def _read_access_log(self):
+    """
+    Returns the number of accesses by grid uuid recorded in the access log, empty if there is none.
+    """
+    if not self.access_log_file: return Counter()
+    try:
+        with open(self.access_log_file) as f:
+            return Counter(json.load(f))
+    except FileNotFoundError:
+        return Counter()
+    except Exception as e:
+        report_exception(e, f"Error reading access log {self.access_log_file}")
+        return Counter()
+
+def write_access_log(self):
+    """
+    Writes the grids accessed the most, counting accesses recorded before the service started.
+    """
+    if not self.access_log_file: return
+    try:
+        accesses = self._access_log + self.grid_cache.get_accesses()
+        temporaryFileName = self.access_log_file + ".tmp"
+        with open(temporaryFileName, 'w') as f:
+            json.dump(dict(accesses.most_common(ACCESS_LOG_MAX_GRIDS)), f)
+        os.replace(temporaryFileName, self.access_log_file)
+    except Exception as e:
+        report_exception(e, f"Error writing access log {self.access_log_file}")
+
+def _get_warm_up_grid_uuids(self):
+    """
+    Returns the grids loaded before requests are served: system grids, hot grids of the configuration,
+    then the grids accessed the most according to the access log.
+    """
+    gridUuids = list(GridCache.pinnedGridUuids) + self.hot_grids
+    gridUuids += [gridUuid for gridUuid, _ in self._access_log.most_common(self.warm_up_top_grids)]
+    return list(dict.fromkeys(gridUuids))
+
+def warm_up(self):
+    """
+    Loads grids in memory before requests are served, then runs the code paths of loads often enough
+    for the JIT compiler to compile them: loading rows, and rows converted to JSON.
+
+    Returns:
+        list: The grids warmed up, with their rows, as (grid, rows).
+    """
+    start = time.perf_counter()
+    loaded = []
+    for gridUuid in _get_warm_up_grid_uuids(self):
+        try:
+            with self.grid_cache.lock(gridUuid).read():
+                grid, rows = _get_grid_and_rows(self, gridUuid)
+            if grid: loaded.append((grid, rows))
+        except Exception as e:
+            report_exception(e, f"Error warming up grid {gridUuid}")
+    for iteration in range(self.warm_up_iterations):
+        for grid, rows in loaded:
+            grid.to_json()
+            for index, row in enumerate(rows.values()):
+                if index >= self.warm_up_rows: break
+                row.to_json()
+    if self.warm_up_iterations and loaded:
+        # Rows of the smallest grid are read again to compile loads, without replacing rows in memory
+        grid, rows = min(loaded, key = lambda item: len(item[1]))
+        for iteration in range(min(self.warm_up_iterations, 10)):
+            for chunk in self._iter_rows(grid): pass
+    logger.info("🔥 Grids warmed up for database %s: %s grids in %.3f seconds", self.db_manager.db_name, len(loaded), time.perf_counter() - start)
+    return loaded
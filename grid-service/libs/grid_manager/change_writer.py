@@ -0,0 +1,415 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Change Writer for the clairgrid Grid Service.
+'''
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from ..utils.report_exception import report_exception
+
+logger = logging.getLogger(__name__)
+
+OperationInsertRow = "insertRow"
+OperationSetValue = "setValue"
+OperationAddRelationship = "addRelationship"
+OperationRemoveRelationship = "removeRelationship"
+OperationSetRevision = "setRevision"
+
+class RevisionConflict(Exception):
+    """
+    Rows whose revision in the database is not the revision changes were applied to: they were changed meanwhile
+    by another instance of the service or another program.
+    """
+    def __init__(self, rowUuids):
+        Exception.__init__(self, f"Rows changed meanwhile: {', '.join(sorted(rowUuids))}")
+        self.rowUuids = rowUuids
+
+WRITE_BACKOFF_MIN_SECONDS = 0.05 # wait before the first retry of changes failing, doubled at each retry
+WRITE_BACKOFF_MAX_SECONDS = 5
+STATEMENT_MAX_ROWS = 1000 # rows of values in one multi-row statement
+NOTIFY_CHANNEL = "grid_changes" # channel of notifications of rows written
+NOTIFY_MAX_ROWS = 60 # rows in one notification, whose payload is limited to 8000 bytes
+
+DbTypes = {"texts": "text", "ints": "integer", "booleans": "boolean"}
+
+def _chunks(items):
+    for start in range(0, len(items), STATEMENT_MAX_ROWS):
+        yield items[start:start + STATEMENT_MAX_ROWS]
+
+def _values_clause(count, row):
+    return ", ".join([row] * count)
+
+def get_statements(operations):
+    """
+    Returns the statements writing operations, as a list of (statement, params), in the order of foreign keys:
+    rows first, then values, relationships and revisions.
+    Revisions are compared and set: the statement setting them returns the rows whose revision was the revision
+    changes were applied to, and rows missing from its result were changed meanwhile.
+    Values of a cell written several times are written once, with the last value, by multi-row upserts
+    grouped by table, partition and column. Relationships are added and removed in the order of operations.
+    """
+    rows = {} # (grid uuid, revision) by row uuid
+    values = {} # values by row uuid, by (table, partition, column)
+    relationships = [] # (operation, partition, column, [(row uuid, reference uuid)]) of consecutive operations
+    revisions = {} # [revision changes were applied to, last revision] by row uuid
+    for operation in operations:
+        kind = operation[0]
+        if kind == OperationInsertRow:
+            _, gridUuid, rowUuid, revision = operation
+            rows[rowUuid] = (gridUuid, revision)
+        elif kind == OperationSetValue:
+            _, table, partition, column, rowUuid, value = operation
+            values.setdefault((table, partition, column), {})[rowUuid] = value
+        elif kind in (OperationAddRelationship, OperationRemoveRelationship):
+            _, partition, column, rowUuid, referenceUuid = operation
+            if not relationships or relationships[-1][:3] != (kind, partition, column):
+                relationships.append((kind, partition, column, []))
+            relationships[-1][3].append((rowUuid, referenceUuid))
+        elif kind == OperationSetRevision:
+            _, _, rowUuid, previousRevision, revision = operation
+            revisions.setdefault(rowUuid, [previousRevision, revision])[1] = revision
+        else:
+            raise ValueError(f"Unknown operation {kind}")
+
+    statements = []
+    for chunk in _chunks(list(rows.items())):
+        statements.append((
+            "INSERT INTO rows (gridUuid, uuid, enabled, revision) VALUES " +
+            _values_clause(len(chunk), "(%s::uuid, %s::uuid, true, %s)") +
+            " ON CONFLICT DO NOTHING",
+            [param for rowUuid, (gridUuid, revision) in chunk for param in (gridUuid, rowUuid, revision)]
+        ))
+    for (table, partition, column), cells in values.items():
+        for chunk in _chunks(list(cells.items())):
+            statements.append((
+                f"INSERT INTO {table} (uuid, partition, {column}) VALUES " +
+                _values_clause(len(chunk), f"(%s::uuid, {int(partition)}, %s::{DbTypes[table]})") +
+                f" ON CONFLICT (uuid, partition) DO UPDATE SET {column} = excluded.{column}",
+                [param for item in chunk for param in item]
+            ))
+    for kind, partition, column, pairs in relationships:
+        for chunk in _chunks(pairs):
+            params = [param for pair in chunk for param in pair]
+            if kind == OperationAddRelationship:
+                statements.append((
+                    f"INSERT INTO relationships (uuid, partition, fromUuid, {column}) VALUES " +
+                    _values_clause(len(chunk), f"(gen_random_uuid(), {int(partition)}, %s::uuid, %s::uuid)"),
+                    params
+                ))
+            else:
+                statements.append((
+                    f"UPDATE relationships SET {column} = NULL WHERE partition = {int(partition)} " +
+                    f"AND (fromUuid, {column}) IN (VALUES " + _values_clause(len(chunk), "(%s::uuid, %s::uuid)") + ")",
+                    params
+                ))
+                statements.append((
+                    f"DELETE FROM relationships WHERE partition = {int(partition)} AND fromUuid = ANY(%s::uuid[]) AND " +
+                    " AND ".join(f"toUuid{index} IS NULL" for index in range(10)),
+                    [list({rowUuid for rowUuid, _ in chunk})]
+                ))
+    for chunk in _chunks(list(revisions.items())):
+        statements.append((
+            "UPDATE rows SET revision = changes.revision FROM (VALUES " +
+            _values_clause(len(chunk), "(%s::uuid, %s::integer, %s::integer)") +
+            ") AS changes (uuid, previousRevision, revision) " +
+            "WHERE rows.uuid = changes.uuid AND rows.revision = changes.previousRevision RETURNING rows.uuid",
+            [param for rowUuid, (previousRevision, revision) in chunk for param in (rowUuid, previousRevision, revision)]
+        ))
+    return statements
+
+def get_stamp_statements(gridUuids):
+    """
+    Returns the statements locking the revisions of grids, counted in the database for every row changed,
+    and reading them, as a list of (statement, params): the statements reading them, before and after changes,
+    are the second and the last. Locked first, revisions are changed by changes written only.
+    """
+    gridUuids = sorted(gridUuids)
+    select = ("SELECT gridUuid, revision FROM gridRevisions WHERE gridUuid = ANY(%s::uuid[]) ORDER BY gridUuid FOR UPDATE", [gridUuids])
+    return [
+        ("INSERT INTO gridRevisions (gridUuid, revision) SELECT gridUuid, 0 FROM unnest(%s::uuid[]) AS gridUuid " +
+         "ON CONFLICT DO NOTHING", [gridUuids]),
+        select
+    ], [select]
+
+def get_notify_statements(operations, instanceUuid):
+    """
+    Returns the statements notifying other instances of the service of rows written, with their last revision,
+    as a list of (statement, params). Notifications are sent once the transaction is committed, not if rolled back.
+    The payload is the JSON of {"instance": instance uuid, "rows": [[grid uuid, row uuid, revision]]}.
+    """
+    revisions = {} # (grid uuid, revision) by row uuid
+    for operation in operations:
+        if operation[0] == OperationInsertRow:
+            _, gridUuid, rowUuid, revision = operation
+            revisions[rowUuid] = (gridUuid, revision)
+        elif operation[0] == OperationSetRevision:
+            _, gridUuid, rowUuid, _, revision = operation
+            revisions[rowUuid] = (gridUuid, revision)
+    items = [[gridUuid, rowUuid, revision] for rowUuid, (gridUuid, revision) in revisions.items()]
+    return [
+        ("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, json.dumps({"instance": instanceUuid, "rows": items[start:start + NOTIFY_MAX_ROWS]})])
+        for start in range(0, len(items), NOTIFY_MAX_ROWS)
+    ]
+
+class WriteTicket:
+    """
+    Changes of one request queued for writing, done once written or given up.
+    """
+    __slots__ = ('operations', 'gridUuids', 'attempts', 'failedOn', 'retryOn', 'error', '_onError', '_done')
+
+    def __init__(self, operations, onError = None):
+        self.operations = operations
+        # Every row changed has its revision set or is inserted, both give the grid of the row
+        self.gridUuids = frozenset(operation[1] for operation in operations if operation[0] in (OperationInsertRow, OperationSetRevision))
+        self.attempts = 0
+        self.failedOn = None # when writing first failed
+        self.retryOn = 0 # when writing can be retried
+        self.error = None
+        self._onError = onError # called with the error when changes are given up
+        self._done = threading.Event()
+
+    def set_done(self, error = None):
+        self.error = error
+        if error is not None and self._onError is not None:
+            try:
+                self._onError(error)
+            except Exception as e:
+                report_exception(e, "Error handling changes given up")
+        self._done.set()
+
+    def wait(self, timeout = None):
+        """
+        Waits until changes are written, returns False if they are not done in time.
+        """
+        return self._done.wait(timeout)
+
+class ChangeWriter:
+    """
+    Writes changes of rows to the database behind their application in memory.
+    Changes queued during a flush interval are written together in one transaction, so that a burst
+    of changes costs one commit. A batch is flushed early once it reaches its maximum number of operations.
+    Changes of a request are always written in the same transaction: when a batch fails, its requests are written
+    again one by one, and those failing are retried with an exponential backoff, then given up once failing
+    for longer than the retry timeout. Changes of grids whose changes failed wait for them, so that changes
+    of a grid are always written in order, and are given up with them.
+    Rows written are notified to other instances of the service in the same transaction, given an instance uuid.
+    Revisions of grids written are given to onStamps, if any, as {grid uuid: (revision before, revision after)}:
+    grids in memory are as in the database after changes if they were before them.
+    """
+    def __init__(self, db_manager, flushIntervalMilliseconds = 50, batchMaxOperations = 10000, instanceUuid = None,
+                 retryTimeoutMilliseconds = 60000, onStamps = None):
+        self.db_manager = db_manager
+        self.onStamps = onStamps
+        self.instanceUuid = instanceUuid # instance notified of rows written, None not to notify
+        self.flushInterval = flushIntervalMilliseconds / 1000
+        self.retryTimeout = retryTimeoutMilliseconds / 1000
+        self.batchMaxOperations = batchMaxOperations
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+        self._condition = threading.Condition()
+        self._pending = [] # tickets by order of submission
+        self._pendingOperations = 0
+        self._unwritten = 0 # tickets submitted, neither written nor given up yet
+        self._unwrittenGrids = Counter() # tickets neither written nor given up yet by grid uuid
+        self._stopping = False
+        self._thread = None
+
+    def submit(self, operations, onError = None):
+        """
+        Queues the operations of a request. They are written at once when the writer is not started.
+        onError, if any, is called with the error if the operations are given up.
+
+        Returns:
+            WriteTicket: The ticket telling when operations are written.
+        """
+        ticket = WriteTicket(operations, onError)
+        with self._condition:
+            self._unwritten += 1
+            self._unwrittenGrids.update(ticket.gridUuids)
+        if self._thread is None:
+            self._flush([ticket])
+            return ticket
+        with self._condition:
+            self._pending.append(ticket)
+            self._pendingOperations += len(operations)
+            self._condition.notify()
+        return ticket
+
+    def is_idle(self, gridUuids = None):
+        """
+        Returns True when all changes submitted, of the given grids if any, are written or given up:
+        rows in memory are not ahead of the database.
+        """
+        with self._condition:
+            if gridUuids is None: return self._unwritten == 0
+            return not any(self._unwrittenGrids[str(gridUuid)] for gridUuid in gridUuids)
+
+    def _set_done(self, ticket, error = None):
+        with self._condition:
+            self._unwritten -= 1
+            self._unwrittenGrids.subtract(ticket.gridUuids)
+            for gridUuid in ticket.gridUuids:
+                if not self._unwrittenGrids[gridUuid]: del self._unwrittenGrids[gridUuid]
+        ticket.set_done(error)
+
+    def start(self):
+        if self._thread is not None: return
+        self._stopping = False
+        self._thread = threading.Thread(target = self._run, name = f"writer-{self.db_manager.db_name}", daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the writer once changes queued are written.
+        """
+        if self._thread is None: return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending: return
+                # Changes queued meanwhile are written with the first ones
+                self._condition.wait_for(lambda: self._stopping or self._pendingOperations >= self.batchMaxOperations, self.flushInterval)
+                batch = self._take_ready()
+                if not batch:
+                    # Changes left wait for the retry of failed changes
+                    self._condition.wait(max(0, min(ticket.retryOn for ticket in self._pending) - time.monotonic()))
+                    continue
+            self._flush(batch)
+
+    def _take_ready(self):
+        """
+        Takes the pending tickets that can be written, leaving in order the tickets waiting for a retry
+        and the tickets of the same grids queued after them.
+        """
+        now = time.monotonic()
+        batch, waiting, waitingGridUuids = [], [], set()
+        for ticket in self._pending:
+            if ticket.retryOn > now or not ticket.gridUuids.isdisjoint(waitingGridUuids):
+                waiting.append(ticket)
+                waitingGridUuids.update(ticket.gridUuids)
+            else:
+                batch.append(ticket)
+        self._pending = waiting
+        self._pendingOperations = sum(len(ticket.operations) for ticket in waiting)
+        return batch
+
+    def _flush(self, batch):
+        retried, givenUp = self._write(batch)
+        if retried:
+            with self._condition:
+                # Tickets retried are queued first, in order, before tickets submitted meanwhile
+                self._pending[:0] = retried
+                self._pendingOperations += sum(len(ticket.operations) for ticket in retried)
+        if givenUp:
+            self._give_up_waiting(givenUp)
+
+    def _give_up_waiting(self, givenUp):
+        """
+        Gives up the pending tickets of grids whose changes were given up: they were applied in memory after them,
+        and are forgotten with them.
+        """
+        gridUuids = set()
+        for ticket in givenUp:
+            gridUuids.update(ticket.gridUuids)
+        with self._condition:
+            dropped = [ticket for ticket in self._pending if not ticket.gridUuids.isdisjoint(gridUuids)]
+            if not dropped: return
+            self._pending = [ticket for ticket in self._pending if ticket.gridUuids.isdisjoint(gridUuids)]
+            self._pendingOperations = sum(len(ticket.operations) for ticket in self._pending)
+        logger.error("❌ %s requests given up after changes of the same grids were given up", len(dropped))
+        for ticket in dropped:
+            self._set_done(ticket, givenUp[0].error)
+
+    def _write(self, batch):
+        """
+        Writes the operations of tickets in one transaction.
+
+        Returns:
+            tuple: The tickets to write again, in order, and the tickets given up.
+        """
+        operations = [operation for ticket in batch for operation in ticket.operations]
+        start = time.perf_counter()
+        revisedRowUuids = {operation[2] for operation in operations if operation[0] == OperationSetRevision}
+        gridUuids = {gridUuid for ticket in batch for gridUuid in ticket.gridUuids}
+        stamps = {} # (revision before, revision after) by grid uuid
+        try:
+            changes = get_statements(operations)
+            lockStatements, afterStatements = get_stamp_statements(gridUuids) if gridUuids else ([], [])
+            statements = lockStatements + changes + afterStatements
+            revisionIndexes = [len(lockStatements) + index for index, (statement, _) in enumerate(changes)
+                               if statement.startswith("UPDATE rows SET revision")]
+            def check(results):
+                missing = revisedRowUuids - {str(item[0]) for index in revisionIndexes for item in results[index]}
+                if missing: raise RevisionConflict(missing) # the transaction is rolled back
+                if gridUuids:
+                    before = {str(item[0]): int(item[1]) for item in results[1]}
+                    for item in results[len(lockStatements) + len(changes)]:
+                        stamps[str(item[0])] = (before[str(item[0])], int(item[1]))
+            if self.instanceUuid: statements += get_notify_statements(operations, self.instanceUuid)
+            self.db_manager.execute_all(statements, check)
+        except Exception as e:
+            self.failures += 1
+            if len(batch) > 1:
+                return self._write_one_by_one(batch)
+            ticket = batch[0]
+            ticket.attempts += 1
+            now = time.monotonic()
+            if ticket.failedOn is None: ticket.failedOn = now
+            if now - ticket.failedOn < self.retryTimeout and self._thread is not None and not isinstance(e, RevisionConflict):
+                ticket.retryOn = now + min(WRITE_BACKOFF_MIN_SECONDS * 2 ** (ticket.attempts - 1), WRITE_BACKOFF_MAX_SECONDS)
+                logger.warning("⚠️ Error writing %s changes to database %s, retried in %.2f s: %s",
+                               len(ticket.operations), self.db_manager.db_name, ticket.retryOn - now, e)
+                return [ticket], []
+            report_exception(e, f"Error writing {len(ticket.operations)} changes to database {self.db_manager.db_name}, changes given up")
+            self._set_done(ticket, e)
+            return [], [ticket]
+        self.flushes += 1
+        self.written += len(operations)
+        if stamps and self.onStamps is not None:
+            try:
+                self.onStamps(stamps)
+            except Exception as e:
+                report_exception(e, "Error recording revisions of grids written")
+        for ticket in batch:
+            self._set_done(ticket)
+        logger.debug("💾 %s changes of %s requests written to database %s in %.1f ms",
+                     len(operations), len(batch), self.db_manager.db_name, (time.perf_counter() - start) * 1000)
+        return [], []
+
+    def _write_one_by_one(self, batch):
+        """
+        Writes again the requests of a failed batch one by one, so that changes of one request do not fail others.
+        Requests of grids whose changes failed are not written before them.
+        """
+        retried, givenUp, failedGridUuids = [], [], set()
+        for ticket in batch:
+            if not ticket.gridUuids.isdisjoint(failedGridUuids):
+                retried.append(ticket)
+                continue
+            ticketRetried, ticketGivenUp = self._write([ticket])
+            retried += ticketRetried
+            givenUp += ticketGivenUp
+            if ticketRetried or ticketGivenUp: failedGridUuids.update(ticket.gridUuids)
+        return retried, givenUp
+
+    def stats(self):
+        with self._condition:
+            return {
+                "pending": self._pendingOperations,
+                "flushes": self.flushes,
+                "written": self.written,
+                "failures": self.failures
+            }
@@ -0,0 +1,280 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Column Store for the clairgrid Grid Service.
+'''
+
+import operator
+import sys
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, compress, repeat
+from .. import metadata
+from ..metadata import SystemIds
+
+# Masks have one byte per position, 0 or 1, so that they are combined and applied by builtins
+_BYTES_FROM_DIGITS = bytes.maketrans(b"01", b"\x00\x01")
+_DIGITS_FROM_BYTES = bytes.maketrans(b"\x00\x01", b"01")
+_NOT = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+
+Comparisons = {
+    metadata.FilterEqual: operator.eq,
+    metadata.FilterNotEqual: operator.ne,
+    metadata.FilterLess: operator.lt,
+    metadata.FilterLessOrEqual: operator.le,
+    metadata.FilterGreater: operator.gt,
+    metadata.FilterGreaterOrEqual: operator.ge
+}
+
+def _to_mask(bits, count):
+    """
+    Returns a bitmap as a mask of count positions.
+    """
+    if count == 0: return b""
+    return format(bits, "b").zfill(count)[::-1].encode().translate(_BYTES_FROM_DIGITS)
+
+def _to_bits(mask):
+    """
+    Returns a mask as a bitmap, the bit of a position being set when the position is.
+    """
+    return int(mask[::-1].translate(_DIGITS_FROM_BYTES) or b"0", 2)
+
+def _and(mask, other):
+    return (int.from_bytes(mask, 'little') & int.from_bytes(other, 'little')).to_bytes(len(mask), 'little')
+
+def _not(mask):
+    return mask.translate(_NOT)
+
+def _get_nulls(cells):
+    return _to_bits(bytes(map(operator.is_, cells, repeat(None))))
+
+def _to_int(value):
+    """
+    Returns a value of an int column as a 64-bit integer, None when it is not one:
+    values changed in memory are kept as given, the database converting them when written.
+    """
+    if value is None: return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if -2 ** 63 <= value < 2 ** 63 else None
+
+class IntColumn:
+    """
+    Values of an int column as an array of 64-bit integers, and a bitmap of rows without value.
+    """
+    __slots__ = ('values', 'nulls')
+    aggregates = frozenset([metadata.AggregateCount, metadata.AggregateSum, metadata.AggregateMin, metadata.AggregateMax])
+
+    def __init__(self, cells):
+        cells = list(map(_to_int, cells))
+        self.nulls = _get_nulls(cells)
+        self.values = array('q', [0 if value is None else value for value in cells])
+
+    def filter(self, comparison, value, count):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"Invalid filter value {value}")
+        return _and(bytes(map(Comparisons[comparison], self.values, repeat(value))), _not(_to_mask(self.nulls, count)))
+
+    def get_sort_key(self, count):
+        return self.values.__getitem__
+
+    def get_values(self, mask):
+        return compress(self.values, mask)
+
+    def get_size(self):
+        return sys.getsizeof(self.values) + sys.getsizeof(self.nulls)
+
+class BooleanColumn:
+    """
+    Values of a boolean column as a bitmap of true values, and a bitmap of rows without value.
+    """
+    __slots__ = ('values', 'nulls')
+    aggregates = frozenset([metadata.AggregateCount])
+
+    def __init__(self, cells):
+        self.nulls = _get_nulls(cells)
+        self.values = _to_bits(bytes(map(operator.is_, cells, repeat(True))))
+
+    def filter(self, comparison, value, count):
+        if not isinstance(value, bool) or comparison not in (metadata.FilterEqual, metadata.FilterNotEqual):
+            raise ValueError(f"Invalid filter {comparison} {value} on a boolean column")
+        values = self.values if value == (comparison == metadata.FilterEqual) else ~self.values
+        return _to_mask(values & ~self.nulls & ((1 << count) - 1), count)
+
+    def get_sort_key(self, count):
+        return _to_mask(self.values, count).__getitem__
+
+    def get_size(self):
+        return sys.getsizeof(self.values) + sys.getsizeof(self.nulls)
+
+class TextColumn:
+    """
+    Values of a text column as one buffer of UTF-8 encoded values, the offsets of values in the buffer,
+    and a bitmap of rows without value. UTF-8 bytes sort as the values they encode.
+    Values which are not text, as changed in memory, are stored as their text.
+    """
+    __slots__ = ('buffer', 'offsets', 'nulls')
+    aggregates = frozenset([metadata.AggregateCount, metadata.AggregateMin, metadata.AggregateMax])
+
+    def __init__(self, cells):
+        self.nulls = _get_nulls(cells)
+        encoded = [b"" if value is None else value.encode() if isinstance(value, str) else str(value).encode() for value in cells]
+        self.buffer = b"".join(encoded)
+        self.offsets = array('q', accumulate(map(len, encoded), initial = 0))
+
+    def _get(self, position):
+        return self.buffer[self.offsets[position]:self.offsets[position + 1]]
+
+    def _find(self, needle, count, atStart):
+        """
+        Returns the mask of values containing a non-empty needle, or equal to it, found by searches
+        of the buffer: only values where the needle is found are visited.
+        """
+        mask = bytearray(count)
+        start = 0
+        while (found := self.buffer.find(needle, start)) >= 0:
+            position = bisect_right(self.offsets, found) - 1
+            end = self.offsets[position + 1]
+            if atStart:
+                if found == self.offsets[position] and found + len(needle) == end: mask[position] = 1
+                start = end # values equal to the needle start at an offset
+            elif found + len(needle) <= end:
+                mask[position] = 1
+                start = end
+            else: # found across values
+                start = found + 1
+        return bytes(mask)
+
+    def filter(self, comparison, value, count):
+        if not isinstance(value, str):
+            raise ValueError(f"Invalid filter value {value}")
+        needle = value.encode()
+        notNulls = _not(_to_mask(self.nulls, count))
+        if comparison == metadata.FilterContains:
+            return self._find(needle, count, False) if needle else notNulls
+        if comparison in (metadata.FilterEqual, metadata.FilterNotEqual):
+            if needle:
+                mask = self._find(needle, count, True)
+            else:
+                mask = bytes(map(operator.eq, map(operator.sub, self.offsets[1:], self.offsets[:-1]), repeat(0)))
+            if comparison == metadata.FilterNotEqual: mask = _not(mask)
+            return _and(mask, notNulls)
+        return _and(bytes(map(Comparisons[comparison], map(self._get, range(count)), repeat(needle))), notNulls)
+
+    def get_sort_key(self, count):
+        return self._get
+
+    def get_values(self, mask):
+        return map(self._get, compress(range(len(mask)), mask))
+
+    def get_size(self):
+        return sys.getsizeof(self.buffer) + sys.getsizeof(self.offsets) + sys.getsizeof(self.nulls)
+
+def _get_display(references):
+    """
+    Returns the value of a reference cell as stored in columns: the display values of referenced rows.
+    """
+    return ' | '.join(reference.displayString for reference in references) if references else None
+
+class ColumnStore:
+    """
+    Rows of a grid kept by column: one typed array per column, and the positions of rows by uuid.
+    Rows are filtered, sorted and aggregated with masks of positions and builtins applied to whole columns,
+    rather than with a loop over rows in Python.
+    The store is built from the rows of a grid when first queried, and dropped when rows change.
+    Password columns are not stored, they can't be queried.
+    """
+    def __init__(self, grid, rows):
+        self.uuids = list(rows.keys())
+        self.positions = dict(zip(self.uuids, range(len(self.uuids))))
+        self.count = len(self.uuids)
+        self.byUuid = sorted(range(self.count), key = self.uuids.__getitem__) # positions sorted by row uuid
+        self.columns = {}
+        values = [row.values for row in rows.values()]
+        for column in grid.columns:
+            typeUuid = str(column.typeUuid)
+            if typeUuid == SystemIds.PasswordColumnType: continue
+            cells = [rowValues[column.index] if rowValues else None for rowValues in values]
+            if typeUuid == SystemIds.ReferenceColumnType: cells = [_get_display(references) for references in cells]
+            if typeUuid == SystemIds.IntColumnType:
+                self.columns[str(column.uuid)] = IntColumn(cells)
+            elif typeUuid == SystemIds.BooleanColumnType:
+                self.columns[str(column.uuid)] = BooleanColumn(cells)
+            else:
+                self.columns[str(column.uuid)] = TextColumn(cells)
+
+    def _get_column(self, columnUuid):
+        column = self.columns.get(str(columnUuid))
+        if column is None: raise ValueError(f"Column {columnUuid} not found")
+        return column
+
+    def filter(self, filters):
+        """
+        Returns the mask of rows matching all filters, given as dictionaries of columnUuid, operator and value.
+        """
+        mask = b"\x01" * self.count
+        for item in filters or []:
+            if not isinstance(item, dict): raise ValueError(f"Invalid filter {item}")
+            column = self._get_column(item.get('columnUuid'))
+            comparison = item.get('operator')
+            if comparison == metadata.FilterIsNull:
+                other = _to_mask(column.nulls, self.count)
+            elif comparison == metadata.FilterIsNotNull:
+                other = _not(_to_mask(column.nulls, self.count))
+            elif comparison in Comparisons or comparison == metadata.FilterContains:
+                if comparison == metadata.FilterContains and not isinstance(column, TextColumn):
+                    raise ValueError(f"Invalid filter {comparison} on column {item.get('columnUuid')}")
+                other = column.filter(comparison, item.get('value'), self.count)
+            else:
+                raise ValueError(f"Invalid filter operator {comparison}")
+            mask = _and(mask, other)
+        return mask
+
+    def sort(self, mask, columnUuid = None, descending = False):
+        """
+        Returns the positions of the rows of a mask sorted by a column, rows without value being last,
+        and by row uuid for equal values.
+        """
+        positions = list(compress(self.byUuid, map(mask.__getitem__, self.byUuid)))
+        if columnUuid is None:
+            if descending: positions.reverse()
+            return positions
+        column = self._get_column(columnUuid)
+        nulls = _to_mask(column.nulls, self.count)
+        withValues = list(compress(positions, map(_not(nulls).__getitem__, positions)))
+        withValues.sort(key = column.get_sort_key(self.count), reverse = descending) # stable, equal values stay sorted by uuid
+        return withValues + list(compress(positions, map(nulls.__getitem__, positions)))
+
+    def aggregate(self, mask, aggregates):
+        """
+        Returns the results of aggregates of the rows of a mask, given as dictionaries of function and columnUuid.
+        Counting without a column counts rows, counting a column counts rows with a value.
+        """
+        results = []
+        for item in aggregates or []:
+            if not isinstance(item, dict): raise ValueError(f"Invalid aggregate {item}")
+            function, columnUuid = item.get('function'), item.get('columnUuid')
+            if function == metadata.AggregateCount and not columnUuid:
+                value = mask.count(1)
+            else:
+                column = self._get_column(columnUuid)
+                if function not in column.aggregates: raise ValueError(f"Invalid aggregate {function} on column {columnUuid}")
+                withValues = _and(mask, _not(_to_mask(column.nulls, self.count)))
+                if function == metadata.AggregateCount:
+                    value = withValues.count(1)
+                elif function == metadata.AggregateSum:
+                    value = sum(column.get_values(withValues))
+                elif function == metadata.AggregateMin:
+                    value = min(column.get_values(withValues), default = None)
+                else:
+                    value = max(column.get_values(withValues), default = None)
+                if isinstance(value, bytes): value = value.decode()
+            results.append({"function": function, "columnUuid": columnUuid, "value": value})
+        return results
+
+    def get_size(self):
+        return sys.getsizeof(self.uuids) + sys.getsizeof(self.positions) + sys.getsizeof(self.byUuid) + \
+            sum(column.get_size() for column in self.columns.values())
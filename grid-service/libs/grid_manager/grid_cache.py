@@ -0,0 +1,457 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Grid Cache for the clairgrid Grid Service.
+'''
+
+import logging
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from ..metadata import SystemIds
+from ..model.row import INTERNED_STRING_MAX_LENGTH
+from ..utils.read_write_lock import ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+ACCESSES_MAX_GRIDS = 10000 # grids whose accesses are counted, those accessed the least are forgotten beyond
+
+class GridCacheEntry:
+    """
+    Grid kept in memory, with its rows once loaded, the display values of its rows
+    referenced by other grids, and the estimated size of all of them.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.rows = None # dictionary of rows by uuid, None until rows are loaded
+        self.displays = {} # dictionary of display values by row uuid
+        self.sortedIndexes = {} # sorted lists of (sort key, row uuid) by sort column uuid
+        self.columnStore = None # rows by column, built when rows are first queried
+        self.stamp = None # revision of the grid in the database matching rows in memory, None if not known
+        self.validatedOn = time.monotonic() # when rows were last loaded or validated against the database
+        self.size = GridCache.estimate_grid_size(grid)
+
+class GridLock:
+    """
+    Read write lock of a grid, taken from the grid cache when acquired and given back when released,
+    so that the cache keeps the locks of grids in use only.
+    """
+    __slots__ = ('_cache', '_gridUuid')
+
+    def __init__(self, cache, gridUuid):
+        self._cache = cache
+        self._gridUuid = gridUuid
+
+    def acquire_read(self):
+        self._cache._take_lock(self._gridUuid).acquire_read()
+
+    def release_read(self):
+        self._cache._get_lock(self._gridUuid).release_read()
+        self._cache._give_back_lock(self._gridUuid)
+
+    def acquire_write(self, blocking = True, timeout = None):
+        """
+        Acquires the write lock, returns False without waiting if it is not free and blocking is False,
+        or after waiting timeout seconds if it is given and the lock is still not free.
+        """
+        if self._cache._take_lock(self._gridUuid).acquire_write(blocking, timeout): return True
+        self._cache._give_back_lock(self._gridUuid)
+        return False
+
+    def release_write(self):
+        self._cache._get_lock(self._gridUuid).release_write()
+        self._cache._give_back_lock(self._gridUuid)
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+class GridCache:
+    """
+    Cache of grids and rows, bounded by a memory budget, shared by all listeners of a database.
+    Least recently used grids are evicted first, system grids are never evicted.
+    Each grid has a read write lock protecting its rows, and a lock making sure it is loaded once.
+    """
+    pinnedGridUuids = frozenset([SystemIds.Grids, SystemIds.Columns, SystemIds.ColumnTypes, SystemIds.Users])
+
+    def __init__(self, memoryBudget):
+        self.memoryBudget = memoryBudget # in bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._accesses = Counter() # number of accesses by grid uuid, recorded for the warm-up of the next start
+        self._entries = OrderedDict() # entries by grid uuid, least recently used first
+        self._lock = threading.RLock()
+        self._gridLocks = {} # [read write lock, acquisitions not released] by grid uuid, while acquired
+        self._loadLocks = {} # [load lock, threads holding or waiting for it] by grid uuid, while held
+
+    @staticmethod
+    def estimate_grid_size(grid):
+        return sys.getsizeof(grid) + 1000 * len(grid.columns)
+
+    @staticmethod
+    def estimate_row_size(row):
+        """
+        Estimates the memory of a row, without interned values and reference rows, which are shared.
+        """
+        size = sys.getsizeof(row) + sys.getsizeof(row._uuid)
+        if row.values:
+            size += sys.getsizeof(row.values)
+            for value in row.values:
+                if isinstance(value, list):
+                    size += sys.getsizeof(value)
+                elif not (isinstance(value, str) and len(value) <= INTERNED_STRING_MAX_LENGTH):
+                    size += sys.getsizeof(value)
+        return size
+
+    def lock(self, gridUuid):
+        """
+        Returns the read write lock of a grid: readers serialize rows, writers change them.
+        """
+        return GridLock(self, str(gridUuid))
+
+    def _take_lock(self, gridUuid):
+        with self._lock:
+            item = self._gridLocks.get(gridUuid)
+            if item is None:
+                item = self._gridLocks[gridUuid] = [ReadWriteLock(), 0]
+            item[1] += 1
+            return item[0]
+
+    def _get_lock(self, gridUuid):
+        with self._lock:
+            return self._gridLocks[gridUuid][0]
+
+    def _give_back_lock(self, gridUuid):
+        with self._lock:
+            item = self._gridLocks[gridUuid]
+            item[1] -= 1
+            if not item[1]: del self._gridLocks[gridUuid] # neither held nor waited for
+
+    @contextmanager
+    def load_lock(self, gridUuid):
+        """
+        Holds the lock of a grid while it is loaded from the database.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            item = self._loadLocks.get(gridUuid)
+            if item is None:
+                item = self._loadLocks[gridUuid] = [threading.Lock(), 0]
+            item[1] += 1
+        try:
+            with item[0]:
+                yield
+        finally:
+            with self._lock:
+                item[1] -= 1
+                if not item[1]: del self._loadLocks[gridUuid]
+
+    def get(self, gridUuid):
+        """
+        Returns the grid and its rows if in memory, marking the grid as recently used.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            self._accesses[gridUuid] += 1
+            if len(self._accesses) > ACCESSES_MAX_GRIDS:
+                # Half of the grids accessed the least are forgotten, once in a while
+                self._accesses = Counter(dict(self._accesses.most_common(ACCESSES_MAX_GRIDS // 2)))
+            entry = self._entries.get(gridUuid)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            self._entries.move_to_end(gridUuid)
+            return entry.grid, entry.rows
+
+    def get_accesses(self):
+        """
+        Returns the number of accesses by grid uuid.
+        """
+        with self._lock:
+            return Counter(self._accesses)
+
+    def get_grid(self, gridUuid):
+        """
+        Returns the grid if in memory, marking it as recently used.
+        """
+        return self.get(gridUuid)[0]
+
+    def get_rows(self, gridUuid):
+        """
+        Returns the dictionary of rows by uuid of the grid, or None if rows are not loaded.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            return entry.rows if entry else None
+
+    def put_grid(self, grid):
+        """
+        Adds or replaces a grid, without rows.
+        """
+        gridUuid = str(grid.uuid)
+        with self._lock:
+            self._remove_entry(gridUuid)
+            entry = GridCacheEntry(grid)
+            self._entries[gridUuid] = entry
+            self.size += entry.size
+            self._evict(gridUuid)
+
+    def put_rows(self, gridUuid, rows):
+        """
+        Sets the rows of a grid already in memory.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            entry = self._entries.get(gridUuid)
+            if entry is None: return
+            size = GridCache.estimate_grid_size(entry.grid) + sum(GridCache.estimate_row_size(row) for row in rows.values())
+            self.size += size - entry.size
+            entry.size = size
+            entry.rows = rows
+            entry.displays = {} # display values are taken from rows from now on
+            entry.sortedIndexes = {}
+            entry.columnStore = None
+            entry.stamp = None
+            entry.validatedOn = time.monotonic()
+            self._entries.move_to_end(gridUuid)
+            self._evict(gridUuid)
+
+    def replace_rows(self, gridUuid, changedRows, removedRowUuids):
+        """
+        Replaces or adds some rows of a grid whose rows are in memory, and removes others.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            entry = self._entries.get(gridUuid)
+            if entry is None or entry.rows is None: return
+            size = 0
+            for rowUuid in removedRowUuids:
+                row = entry.rows.pop(str(rowUuid), None)
+                if row is not None: size -= GridCache.estimate_row_size(row)
+            for rowUuid, row in changedRows.items():
+                previous = entry.rows.get(str(rowUuid))
+                if previous is not None: size -= GridCache.estimate_row_size(previous)
+                entry.rows[str(rowUuid)] = row
+                size += GridCache.estimate_row_size(row)
+            entry.size += size
+            self.size += size
+            self._clear_sorted_indexes(entry)
+            self._evict(gridUuid)
+
+    def get_validation(self, gridUuid):
+        """
+        Returns the grid, its rows, their stamp and when they were last validated, if rows are in memory.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is None or entry.rows is None: return None
+            return entry.grid, entry.rows, entry.stamp, entry.validatedOn
+
+    def put_validation(self, gridUuid, stamp):
+        """
+        Records the stamp of the rows of a grid in the database, when they match the rows in memory.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is None: return
+            entry.stamp = stamp
+            entry.validatedOn = time.monotonic()
+
+    def expire_validations(self):
+        """
+        Makes grids in memory validated against the database at their next use.
+        """
+        with self._lock:
+            for entry in self._entries.values():
+                entry.validatedOn = 0
+
+    def forget_displays(self, gridUuid, rowUuids):
+        """
+        Forgets the display values of rows of a grid, to be loaded again from the database.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is None: return
+            for rowUuid in rowUuids:
+                entry.displays.pop(str(rowUuid), None)
+
+    def advance_stamp(self, gridUuid, previousStamp, stamp):
+        """
+        Records the stamp of a grid once changes of rows in memory are written, if nothing else changed the grid
+        since its previous stamp.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is not None and entry.stamp is not None and entry.stamp == previousStamp:
+                entry.stamp = stamp
+
+    def add_row(self, gridUuid, row):
+        """
+        Adds a row to a grid whose rows are in memory.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            entry = self._entries.get(gridUuid)
+            if entry is None or entry.rows is None: return
+            size = GridCache.estimate_row_size(row)
+            entry.rows[str(row.uuid)] = row
+            entry.size += size
+            self.size += size
+            self._clear_sorted_indexes(entry)
+            self._evict(gridUuid)
+
+    def get_loaded(self):
+        """
+        Returns the grids whose rows are in memory, as a list of (grid, rows).
+        """
+        with self._lock:
+            return [(entry.grid, entry.rows) for entry in self._entries.values() if entry.rows is not None]
+
+    def get_displays(self, gridUuid, rowUuids):
+        """
+        Returns the display values known for the given rows of a grid, from its rows when loaded.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is None: return {}
+            if entry.rows is not None:
+                return {rowUuid: entry.rows[rowUuid].displayString for rowUuid in rowUuids if rowUuid in entry.rows}
+            return {rowUuid: entry.displays[rowUuid] for rowUuid in rowUuids if rowUuid in entry.displays}
+
+    def put_displays(self, gridUuid, displays):
+        """
+        Keeps the display values of rows of a grid referenced by other grids.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            entry = self._entries.get(gridUuid)
+            if entry is None: return
+            size = sum(sys.getsizeof(rowUuid) + sys.getsizeof(display) + 100 for rowUuid, display in displays.items())
+            entry.displays.update(displays)
+            entry.size += size
+            self.size += size
+            self._evict(gridUuid)
+
+    def set_display(self, gridUuid, rowUuid, display):
+        """
+        Updates the display value of a row, if known.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is not None and str(rowUuid) in entry.displays:
+                entry.displays[str(rowUuid)] = display
+
+    def get_sorted_index(self, gridUuid, sortColumnUuid):
+        """
+        Returns the rows of a grid sorted by a column, as a list of (sort key, row uuid), if known.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            return entry.sortedIndexes.get(str(sortColumnUuid)) if entry else None
+
+    def put_sorted_index(self, gridUuid, sortColumnUuid, index):
+        """
+        Keeps the rows of a grid sorted by a column, until rows of the grid change.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            entry = self._entries.get(gridUuid)
+            if entry is None: return
+            size = sys.getsizeof(index) + 100 * len(index)
+            previous = entry.sortedIndexes.get(str(sortColumnUuid))
+            if previous is not None: size -= sys.getsizeof(previous) + 100 * len(previous)
+            entry.sortedIndexes[str(sortColumnUuid)] = index
+            entry.size += size
+            self.size += size
+            self._evict(gridUuid)
+
+    def get_column_store(self, gridUuid):
+        """
+        Returns the rows of a grid kept by column, if known.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            return entry.columnStore if entry else None
+
+    def put_column_store(self, gridUuid, columnStore):
+        """
+        Keeps the rows of a grid by column, until rows of the grid change.
+        """
+        gridUuid = str(gridUuid)
+        with self._lock:
+            entry = self._entries.get(gridUuid)
+            if entry is None: return
+            size = columnStore.get_size()
+            if entry.columnStore is not None: size -= entry.columnStore.get_size()
+            entry.columnStore = columnStore
+            entry.size += size
+            self.size += size
+            self._evict(gridUuid)
+
+    def invalidate_sorted_indexes(self, gridUuid):
+        """
+        Forgets the sorted rows and the rows by column of a grid, once its rows changed.
+        """
+        with self._lock:
+            entry = self._entries.get(str(gridUuid))
+            if entry is not None: self._clear_sorted_indexes(entry)
+
+    def _clear_sorted_indexes(self, entry):
+        size = sum(sys.getsizeof(index) + 100 * len(index) for index in entry.sortedIndexes.values())
+        entry.sortedIndexes = {}
+        if entry.columnStore is not None:
+            size += entry.columnStore.get_size()
+            entry.columnStore = None
+        entry.size -= size
+        self.size -= size
+
+    def remove(self, gridUuid):
+        with self._lock:
+            self._remove_entry(str(gridUuid))
+
+    def _remove_entry(self, gridUuid):
+        entry = self._entries.pop(gridUuid, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def _evict(self, keptGridUuid):
+        """
+        Evicts least recently used grids until the cache fits in its budget.
+        """
+        if self.size <= self.memoryBudget: return
+        for gridUuid in list(self._entries.keys()):
+            if self.size <= self.memoryBudget: break
+            if gridUuid == keptGridUuid or gridUuid in GridCache.pinnedGridUuids: continue
+            self._remove_entry(gridUuid)
+            self.evictions += 1
+            logger.info("♻️ Grid %s evicted from memory", gridUuid)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "grids": len(self._entries),
+                "rows": sum(len(entry.rows) for entry in self._entries.values() if entry.rows),
+                "size": self.size,
+                "memoryBudget": self.memoryBudget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
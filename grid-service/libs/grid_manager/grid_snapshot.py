@@ -0,0 +1,120 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Grid Snapshot for the clairgrid Grid Service.
+'''
+
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+class GridSnapshot:
+    """
+    Binary file of grids and their rows, written periodically and memory-mapped at startup.
+    The file starts with one pickled record of a grid and its rows per grid, followed by the pickled
+    index of records, giving their offset, length and revision stamps, and ends with the offset of the index.
+    Only the index is read when the file is opened, a record is unpickled when its grid is first needed.
+    """
+    magic = b"CLAIRGRID-SNAPSHOT-2\n"
+    trailer = struct.Struct("<Q")
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self._lock = threading.Lock()
+        self._map = None
+        self._index = {} # (offset, length, stamps) by grid uuid, for records not read yet
+
+    def open(self):
+        """
+        Maps the snapshot file in memory and reads its index, returns False if there is no valid snapshot.
+        """
+        try:
+            with open(self.fileName, 'rb') as f:
+                snapshotMap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError): # ValueError for an empty file
+            logger.info("No grid snapshot %s", self.fileName)
+            return False
+        try:
+            if snapshotMap[:len(GridSnapshot.magic)] != GridSnapshot.magic:
+                raise ValueError("not a grid snapshot")
+            indexOffset, = GridSnapshot.trailer.unpack(snapshotMap[-GridSnapshot.trailer.size:])
+            index = pickle.loads(snapshotMap[indexOffset:-GridSnapshot.trailer.size])
+        except Exception as e:
+            logger.warning("⚠️ Invalid grid snapshot %s: %s", self.fileName, e)
+            snapshotMap.close()
+            return False
+        with self._lock:
+            self._map = snapshotMap
+            self._index = index
+        logger.info("📸 Grid snapshot %s opened with %s grids", self.fileName, len(index))
+        return True
+
+    def close(self):
+        with self._lock:
+            if self._map is not None: self._map.close()
+            self._map = None
+            self._index = {}
+
+    def __contains__(self, gridUuid):
+        with self._lock:
+            return str(gridUuid) in self._index
+
+    def get_stamps(self, gridUuid):
+        """
+        Returns the revision stamps recorded with a grid, or None if the grid is not in the snapshot.
+        """
+        with self._lock:
+            record = self._index.get(str(gridUuid))
+            return record[2] if record else None
+
+    def read(self, gridUuid):
+        """
+        Returns the grid and rows recorded in the snapshot, which are read only once.
+        """
+        with self._lock:
+            record = self._index.pop(str(gridUuid), None)
+            if record is None: return None, None
+            offset, length, _ = record
+            payload = self._map[offset:offset + length]
+        return pickle.loads(payload)
+
+    def discard(self, gridUuid):
+        """
+        Forgets a grid whose record is stale.
+        """
+        with self._lock:
+            self._index.pop(str(gridUuid), None)
+
+    def write(self, records):
+        """
+        Writes a new snapshot from records of (grid uuid, stamps, payload), replacing the file atomically.
+        Records of the current snapshot not read yet, nor replaced, are kept as they are.
+
+        Returns:
+            int: The number of grids written.
+        """
+        temporaryFileName = self.fileName + ".tmp"
+        index = {}
+        with open(temporaryFileName, 'wb') as f:
+            f.write(GridSnapshot.magic)
+            for gridUuid, stamps, payload in records:
+                index[gridUuid] = (f.tell(), len(payload), stamps)
+                f.write(payload)
+            with self._lock:
+                for gridUuid, (offset, length, stamps) in self._index.items():
+                    if gridUuid not in index:
+                        index[gridUuid] = (f.tell(), length, stamps)
+                        f.write(self._map[offset:offset + length])
+            indexOffset = f.tell()
+            f.write(pickle.dumps(index, protocol = pickle.HIGHEST_PROTOCOL))
+            f.write(GridSnapshot.trailer.pack(indexOffset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporaryFileName, self.fileName) # the current map still reads the replaced file
+        return len(index)
@@ -1,28 +1,100 @@
+from contextlib import ExitStack
 from .. import metadata
 from ..metadata import SystemIds
-from ..utils.decorators import echo
+from ..utils.decorators import instrument
 from ..authentication.jwt_decorator import validate_jwt
 from ..utils.report_exception import report_exception
+from .change_writer import RevisionConflict
+from ._revisions import _get_revision_conflict, _get_conflict_reply, _get_revised_rows, _get_current_conflicts
 
-@echo
+def _get_changed_grid_uuids(request):
+    """
+    Returns the uuids of the grids changed by the request, sorted so that locks are always acquired in the same order.
+    Changing a row of the Grids grid changes the grid described by the row too.
+    """
+    gridUuids = set()
+    for change in request.get('changes', []):
+        gridUuid, rowUuid = change.get('gridUuid'), change.get('rowUuid')
+        if gridUuid:
+            gridUuids.add(str(gridUuid))
+            if str(gridUuid) == SystemIds.Grids and rowUuid: gridUuids.add(str(rowUuid))
+    return sorted(gridUuids)
+
+@instrument
 @validate_jwt
 def handle_change(self, request):
+    operations = [] # changes applied in memory, to be written to the database
+    gridUuids = _get_changed_grid_uuids(request)
+    for gridUuid in gridUuids:
+        self._validate_grid(gridUuid)
+    with ExitStack() as locks:
+        for gridUuid in gridUuids:
+            locks.enter_context(self.grid_cache.lock(gridUuid).write())
+        try:
+            if request.get('atomic'):
+                reply = self._apply_batch(request, operations, gridUuids)
+            else:
+                reply = _apply_changes(self, request, operations)
+        finally:
+            for gridUuid in gridUuids:
+                self.grid_cache.invalidate_sorted_indexes(gridUuid)
+            # Changes are queued in the order they are applied, while grids are locked.
+            # Changes given up are forgotten in memory too: grids are loaded again from the database
+            ticket = self.change_writer.submit(operations, lambda error: _remove_grids(self, gridUuids)) if operations else None
+    if ticket is None or reply.get('status') != metadata.SuccessStatus:
+        return reply
+    reply["revisions"] = _get_revised_rows(operations)
+    if self.write_ack != "durable":
+        return reply
+    # Other changes are applied meanwhile, and written in the same transaction
+    if not ticket.wait(self.write_ack_timeout_milliseconds / 1000):
+        return {
+            "status": metadata.FailedStatus,
+            "message": "Changes not written to the database in time",
+            "userUuid": request.get('userUuid'),
+            "user": request.get('user')
+        }
+    if isinstance(ticket.error, RevisionConflict):
+        return _get_conflict_reply(request, _get_current_conflicts(self, request, ticket.error.rowUuids), reply.get('results'))
+    if ticket.error is not None:
+        return {
+            "status": metadata.FailedStatus,
+            "message": "Error writing changes: " + str(ticket.error),
+            "userUuid": request.get('userUuid'),
+            "user": request.get('user')
+        }
+    return reply
+
+def _remove_grids(self, gridUuids):
+    """
+    Drops grids from memory once no request reads or changes them, gridUuids being sorted like locks are acquired.
+    """
+    with ExitStack() as locks:
+        for gridUuid in gridUuids:
+            locks.enter_context(self.grid_cache.lock(gridUuid).write())
+        for gridUuid in gridUuids:
+            self.grid_cache.remove(gridUuid)
+
+def _apply_changes(self, request, operations):
+    startRevisions = {} # revisions of rows when the request started, by row uuid
     try:
         for change in request.get('changes', []):
             changeType = change.get('changeType')
             gridUuid, columnUuid, rowUuid = change.get('gridUuid'), change.get('columnUuid'), change.get('rowUuid')
             (grid, column, row) = self._get_grid_column_row(gridUuid, columnUuid, rowUuid)
+            conflict = _get_revision_conflict(change, row, startRevisions)
+            if conflict: return _get_conflict_reply(request, [conflict])
             if changeType == metadata.ChangeAdd:
-                error = self._add_row(request, gridUuid, grid, rowUuid)
+                error = self._add_row(request, gridUuid, grid, rowUuid, operations)
                 if error: return error
             elif changeType == metadata.ChangeUpdate:
-                error = self._update_row(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'))
+                error = self._update_row(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'), operations)
                 if error: return error
             elif changeType == metadata.ChangeAddRelationship:
-                error = self._add_relationship(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'))
+                error = self._add_relationship(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'), operations)
                 if error: return error
             elif changeType == metadata.ChangeRemoveRelationship:
-                error = self._remove_relationship(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'))
+                error = self._remove_relationship(request, gridUuid, grid, columnUuid, column, rowUuid, row, change.get('changeValue'), operations)
                 if error: return error
             elif changeType == metadata.ChangeLoad:
                 return self.handle_load({
@@ -1,25 +1,38 @@
+import logging
 from .. import metadata
-from ..utils.decorators import echo
+from ..utils.decorators import instrument
 from ..authentication.jwt_decorator import validate_jwt
 from ..utils.report_exception import report_exception
 from ..utils.report_memory_resource import report_memory_resource
 
-def _get_grid(self, gridUuid):
-    grid = self.allGrids.get(gridUuid)
-    if not grid:
+logger = logging.getLogger(__name__)
+
+def _get_grid_and_rows(self, gridUuid):
+    grid, rows = self.grid_cache.get(gridUuid)
+    if grid and rows is not None:
+        logger.debug("👍🏻 %s found in memory", grid)
+        return grid, rows
+
+    with self.grid_cache.load_lock(gridUuid):
+        grid, rows = self.grid_cache.get(gridUuid)
+        if grid and rows is not None: # loaded by another thread meanwhile
+            return grid, rows
+        grid, rows = self._load_snapshot(gridUuid)
+        if grid:
+            return grid, rows
+        # Grids loaded as reference grids have neither rows nor reference grids, load them entirely
         grid = self._load_grid(gridUuid)
         if not grid:
-            print(f"⚠️ Grid {gridUuid} not found")
-            return None
-        self.allGrids[gridUuid] = grid
-        print(f"Grid added to memory: {gridUuid} {grid.name}")
-        self._load_rows(grid)
-    else:
-        print(f"👍🏻 {grid} found in memory")
+            logger.warning("⚠️ Grid %s not found", gridUuid)
+            return None, None
+        logger.info("Grid added to memory: %s %s", gridUuid, grid.name)
+        rows = self._load_rows(grid)
+    return grid, rows
 
-    return grid
+def _get_grid(self, gridUuid):
+    return _get_grid_and_rows(self, gridUuid)[0]
 
-@echo
+@instrument
 @validate_jwt
 def handle_load(self, request):
     gridUuid = request.get('gridUuid')
@@ -32,9 +45,27 @@ def handle_load(self, request):
             "user": request.get('user')
         }
 
-    grid = None
+    limit = request.get('limit')
+    if limit is not None:
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+            return {
+                "status": metadata.FailedStatus,
+                "message": f"Invalid limit {limit}",
+                "userUuid": request.get('userUuid'),
+                "user": request.get('user')
+            }
+        limit = min(limit, self.load_max_limit)
+
+    self._validate_grid(gridUuid)
+    with self.grid_cache.lock(gridUuid).read():
+        return _load_data_set(self, request, gridUuid, rowUuid, limit, request.get('cursor'), request.get('sortColumnUuid'),
+                              request.get('filters'), request.get('descending', False), request.get('aggregates'))
+
+def _load_data_set(self, request, gridUuid, rowUuid, limit = None, cursor = None, sortColumnUuid = None,
+                   filters = None, descending = False, aggregates = None):
+    grid, rows = None, None
     try:
-        grid = _get_grid(self, gridUuid)
+        grid, rows = _get_grid_and_rows(self, gridUuid)
     except Exception as e:
         report_exception(e, f"Error loading grid {gridUuid}")
         return {
@@ -57,16 +88,43 @@ def handle_load(self, request):
         "grid": grid.to_json()
     }
     try:
-        rows = self.allRows[gridUuid]
         if rowUuid:
             dataSet["rowUuid"] = rowUuid
             if rows:
-                dataSet["rows"] = [row.to_json() for row in rows.values() if str(row.uuid) == str(rowUuid)]
+                row = rows.get(str(rowUuid))
+                dataSet["rows"] = [row.to_json()] if row else []
                 dataSet["countRows"] = 1
+        elif filters or aggregates or descending:
+            # Query of rows by column: filters, sort and aggregates do not loop over rows in Python
+            windowRows, countFilteredRows, results, nextCursor = self._query_rows(grid, rows or {}, filters, sortColumnUuid,
+                                                                                  descending, aggregates, limit, cursor)
+            dataSet["rows"] = [row.to_json() for row in windowRows]
+            dataSet["countRows"] = len(rows or {})
+            dataSet["countFilteredRows"] = countFilteredRows
+            if limit: dataSet["limit"] = limit
+            if sortColumnUuid: dataSet["sortColumnUuid"] = sortColumnUuid
+            if descending: dataSet["descending"] = descending
+            if results: dataSet["aggregates"] = results
+            if nextCursor: dataSet["nextCursor"] = nextCursor
+        elif limit or cursor or sortColumnUuid:
+            # Window of rows: serialization does not depend on the number of rows of the grid
+            windowRows, nextCursor = self._get_window(grid, rows or {}, limit, cursor, sortColumnUuid)
+            dataSet["rows"] = [row.to_json() for row in windowRows]
+            dataSet["countRows"] = len(rows or {})
+            if limit: dataSet["limit"] = limit
+            if sortColumnUuid: dataSet["sortColumnUuid"] = sortColumnUuid
+            if nextCursor: dataSet["nextCursor"] = nextCursor
         else:
             if rows:
                 dataSet["rows"] = [row.to_json() for row in rows.values()]
                 dataSet["countRows"] = len(dataSet["rows"])
+    except ValueError as e:
+        return {
+            "status": metadata.FailedStatus,
+            "message": str(e),
+            "userUuid": request.get('userUuid'),
+            "user": request.get('user')
+        }
     except Exception as e:
         report_exception(e, f"Error loading rows for grid {gridUuid}")
         return {
@@ -75,6 +133,8 @@ def handle_load(self, request):
         }
 
     report_memory_resource()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("ℹ Grid cache: %s", self.grid_cache.stats())
     return {
         "status": metadata.SuccessStatus,
         "message": f"'{grid.name}' loaded",
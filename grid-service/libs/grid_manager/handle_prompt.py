@@ -1,8 +1,8 @@
 from .. import metadata
-from ..utils.decorators import echo
+from ..utils.decorators import instrument
 from ..authentication.jwt_decorator import validate_jwt
 
-@echo
+@instrument
 @validate_jwt
 def handle_prompt(self, request):
     return { "status": metadata.FailedStatus, "message": "Not implemented" }
@@ -68,6 +68,8 @@ ActionLoad = "load"
 ActionChange = "change"
 ActionLocate = "locate"
 ActionPrompt = "prompt"
+ActionMetrics = "metrics"
+ActionTopStatements = "topStatements"
 
 ChangeAdd = "add"
 ChangeUpdate = "update"
@@ -75,5 +77,26 @@ ChangeAddRelationship = "addRelationship"
 ChangeRemoveRelationship = "removeRelationship"
 ChangeLoad = "load"
 
+FilterEqual = "eq"
+FilterNotEqual = "ne"
+FilterLess = "lt"
+FilterLessOrEqual = "le"
+FilterGreater = "gt"
+FilterGreaterOrEqual = "ge"
+FilterContains = "contains"
+FilterIsNull = "isNull"
+FilterIsNotNull = "isNotNull"
+
+AggregateCount = "count"
+AggregateSum = "sum"
+AggregateMin = "min"
+AggregateMax = "max"
+
 SuccessStatus = "success"
 FailedStatus = "failed"
+SkippedStatus = "skipped"
+ConflictStatus = "conflict"
+
+ReplyPartHeader = "header"
+ReplyPartRows = "rows"
+ReplyPartEnd = "end"
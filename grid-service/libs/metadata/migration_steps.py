@@ -113,6 +113,76 @@ def get_migration_steps(root_user_name, root_password):
                 "bool9 boolean, "
                 "PRIMARY KEY (uuid, partition)"
             ")",
+
+        # Indexes are built concurrently, outside of a transaction, not to lock tables of a running database
+
+        # References and columns of rows are looked up from the row
+        170: "CREATE INDEX CONCURRENTLY IF NOT EXISTS relationships_fromuuid_partition "
+                "ON relationships (fromUuid, partition)",
+
+        # Rows of a grid are scanned from the index only, with their revision
+        180: "CREATE INDEX CONCURRENTLY IF NOT EXISTS rows_griduuid_enabled "
+                "ON rows (gridUuid) INCLUDE (uuid, revision) "
+                "WHERE enabled = true",
+
+        # Users are authenticated by login id
+        190: "CREATE INDEX CONCURRENTLY IF NOT EXISTS texts_text0_partition0 "
+                "ON texts (text0) "
+                "WHERE partition = 0",
+
+        # Seed files imported, skipped at startup while unchanged
+        200: "CREATE TABLE seeds ("
+                "fileName text NOT NULL, "
+                "hash text NOT NULL, "
+                "migrationSequence integer NOT NULL, "
+                "seededOn timestamp with time zone NOT NULL DEFAULT now(), "
+                "PRIMARY KEY (fileName)"
+            ")",
+
+        # Revision of each grid, increased by every row inserted, updated or deleted, whoever changes it:
+        # grids in memory are checked against it
+        210: "CREATE TABLE gridRevisions ("
+                "gridUuid uuid NOT NULL, "
+                "revision bigint NOT NULL, "
+                "PRIMARY KEY (gridUuid)"
+            ")",
+
+        220: "CREATE OR REPLACE FUNCTION count_grid_revisions() RETURNS trigger AS $$ "
+                "BEGIN "
+                    "IF TG_OP = 'DELETE' THEN "
+                        "INSERT INTO gridRevisions (gridUuid, revision) "
+                        "SELECT gridUuid, count(*) FROM oldRows GROUP BY gridUuid "
+                        "ON CONFLICT (gridUuid) DO UPDATE SET revision = gridRevisions.revision + excluded.revision; "
+                    "ELSIF TG_OP = 'UPDATE' THEN "
+                        "INSERT INTO gridRevisions (gridUuid, revision) "
+                        "SELECT gridUuid, count(*) FROM (SELECT gridUuid FROM oldRows UNION ALL SELECT gridUuid FROM newRows) AS changed "
+                        "GROUP BY gridUuid "
+                        "ON CONFLICT (gridUuid) DO UPDATE SET revision = gridRevisions.revision + excluded.revision; "
+                    "ELSE "
+                        "INSERT INTO gridRevisions (gridUuid, revision) "
+                        "SELECT gridUuid, count(*) FROM newRows GROUP BY gridUuid "
+                        "ON CONFLICT (gridUuid) DO UPDATE SET revision = gridRevisions.revision + excluded.revision; "
+                    "END IF; "
+                    "RETURN NULL; "
+                "END "
+            "$$ LANGUAGE plpgsql",
+
+        230: "CREATE TRIGGER rows_insert_grid_revisions "
+                "AFTER INSERT ON rows "
+                "REFERENCING NEW TABLE AS newRows "
+                "FOR EACH STATEMENT EXECUTE FUNCTION count_grid_revisions()",
+        240: "CREATE TRIGGER rows_update_grid_revisions "
+                "AFTER UPDATE ON rows "
+                "REFERENCING OLD TABLE AS oldRows NEW TABLE AS newRows "
+                "FOR EACH STATEMENT EXECUTE FUNCTION count_grid_revisions()",
+        250: "CREATE TRIGGER rows_delete_grid_revisions "
+                "AFTER DELETE ON rows "
+                "REFERENCING OLD TABLE AS oldRows "
+                "FOR EACH STATEMENT EXECUTE FUNCTION count_grid_revisions()",
+
+        260: "INSERT INTO gridRevisions (gridUuid, revision) "
+                "SELECT gridUuid, count(*) FROM rows GROUP BY gridUuid "
+                "ON CONFLICT (gridUuid) DO NOTHING",
     }
 
 def get_deletion_steps():
@@ -124,5 +194,8 @@ def get_deletion_steps():
         5: "DROP TABLE ints",
         6: "DROP TABLE booleans",
         7: "DROP TABLE rows",
-        8: "DROP TABLE migrations"
+        8: "DROP TABLE migrations",
+        9: "DROP TABLE seeds",
+        10: "DROP TABLE gridRevisions",
+        11: "DROP FUNCTION count_grid_revisions"
     }
@@ -0,0 +1,56 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Metrics Manager for the clairgrid Grid Service.
+'''
+
+import jwt
+from .. import metadata
+from ..base_manager import BaseManager
+from ..authentication.jwt_decorator import validate_jwt
+from ..utils.decorators import instrument
+from ..utils.metrics_registry import metrics
+
+class MetricsManager(BaseManager):
+    """
+    Manages metrics requests: durations of commands, handlers and queue waits of the database,
+    and statistics of statements, restricted to the root user.
+    """
+    def __init__(self, db_manager, grid_manager = None):
+        BaseManager.__init__(self, db_manager)
+        self.grid_manager = grid_manager
+
+    @instrument
+    @validate_jwt
+    def handle_metrics(self, request):
+        dataSet = { "metrics": metrics.snapshot(db = self.db_manager.db_name) }
+        if self.grid_manager: dataSet["gridCache"] = self.grid_manager.grid_cache.stats()
+        return {
+            "status": metadata.SuccessStatus,
+            "dataSet": dataSet,
+            "userUuid": request.get('userUuid'),
+            "user": request.get('user')
+        }
+
+    def _is_root_user(self, request):
+        token = jwt.decode(request.get('jwt'), self.jwt_secret, algorithms=["HS512"])
+        return token.get('loginId') == self.db_manager.root_user_name
+
+    @instrument
+    @validate_jwt
+    def handle_top_statements(self, request):
+        if not self._is_root_user(request):
+            return {
+                "status": metadata.FailedStatus,
+                "message": "Statements are restricted to the root user",
+                "userUuid": request.get('userUuid'),
+                "user": request.get('user')
+            }
+        limit = request.get('limit') or 10
+        return {
+            "status": metadata.SuccessStatus,
+            "dataSet": { "statements": self.db_manager.statement_statistics.top(int(limit)) },
+            "userUuid": request.get('userUuid'),
+            "user": request.get('user')
+        }
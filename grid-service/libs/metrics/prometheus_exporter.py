@@ -0,0 +1,41 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Prometheus exporter for the clairgrid Grid Service.
+'''
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..utils.metrics_registry import metrics
+
+logger = logging.getLogger(__name__)
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+def start_metrics_server(port, address = "127.0.0.1"):
+    """
+    Serves metrics in the Prometheus text format on http://<address>:<port>/metrics, from a background thread.
+    Metrics are served on the loopback interface unless another address is given, such as 0.0.0.0 for all interfaces.
+
+    Returns:
+        ThreadingHTTPServer: The server, to be shut down when the service stops.
+    """
+    server = ThreadingHTTPServer((address, port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("📈 Serving metrics on %s port %s", address, port)
+    return server
@@ -5,6 +5,8 @@
 '''
 
 class BaseModel:
+    __slots__ = () # subclasses without slots keep their attributes in a dictionary
+
     def __init__(self, uuid, revision = 0):
         self.uuid = uuid
         self.revision = revision
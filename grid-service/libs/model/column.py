@@ -4,8 +4,6 @@
 
 '''
 
-from typing import LiteralString
-
 from ..metadata import SystemIds
 
 class Column():
@@ -31,7 +29,7 @@ class Column():
             self.dbJoinKey = "uuid"
         elif str(self.typeUuid) == SystemIds.ReferenceColumnType:
             self.dbTable = "relationships"
-            self.dbColumn = f"toUuid{self.columnIndex % 10}::text"
+            self.dbColumn = f"toUuid{self.columnIndex % 10}"
             self.dbJoinKey = "fromUuid"
         elif str(self.typeUuid) == SystemIds.BooleanColumnType:
             self.dbTable = "booleans"
@@ -42,41 +40,13 @@ class Column():
             self.dbColumn = f"text{self.columnIndex % 10}"
             self.dbJoinKey = "uuid"
 
-    def _set_db_reference_columns(self, referencedColumnIndex):
-        self.dbReferenceColumn = f"string_agg(DISTINCT {self.dbTable}_{self.partition}_{referencedColumnIndex}.text{self.columnIndex % 10}, '||||')"
-        self.dbReferenceJoinKey = "uuid"
-
-    def _set_db_reference_clauses(self, referencedColumnIndex):
-        self.dbSelectReferenceClause = f"{self.dbTable}_{self.partition}.{self.dbColumn}"
-        self.dbJoinReferenceClause = f"\n-- Join {self.dbTable}\n" + \
-                                f"LEFT OUTER JOIN {self.dbTable} {self.dbTable}_{self.partition}_{referencedColumnIndex}\n" + \
-                                f"ON {self.dbTable}_{self.partition}_{referencedColumnIndex}.{self.dbJoinKey} = ref_rows_{referencedColumnIndex}.uuid\n" + \
-                                f"AND {self.dbTable}_{self.partition}_{referencedColumnIndex}.partition = {self.partition}"            
-
     def _set_db_clauses(self):
         self.numberOfFields = 1
-        if str(self.typeUuid) == SystemIds.ReferenceColumnType and self.referenceGrid:
-            displayColumns = [column for column in self.referenceGrid.columns if column.dbTable == 'texts' and column.display]
-
-            for column in displayColumns:
-                column._set_db_reference_columns(self.columnIndex)
-                column._set_db_reference_clauses(self.columnIndex)
-
-            dbSelectReferenceClauses = [column.dbReferenceColumn for column in displayColumns]
-            dbSelectReferenceColumns = (',\n' if len(dbSelectReferenceClauses) > 0 else '') + ',\n'.join(dbSelectReferenceClauses)
-            dbJoinReferenceClauses = ''.join(list[LiteralString](dict.fromkeys([column.dbJoinReferenceClause for column in displayColumns])))
-
-            self.dbSelectClause = f"string_agg(DISTINCT {self.dbTable}_{self.partition}.{self.dbColumn}, '||||')" + dbSelectReferenceColumns
-            self.dbJoinClause = f"\n-- Join {self.dbTable} for reference grid {self.referenceGrid.name}\n" + \
-                                    f"LEFT OUTER JOIN {self.dbTable} {self.dbTable}_{self.columnIndex}\n" + \
-                                    f"ON {self.dbTable}_{self.columnIndex}.{self.dbJoinKey} = rows.uuid\n" + \
-                                    f"AND {self.dbTable}_{self.columnIndex}.partition = {self.partition}\n" + \
-                                    f"LEFT OUTER JOIN rows ref_rows_{self.columnIndex}\n" + \
-                                    f"ON ref_rows_{self.columnIndex}.gridUuid = '{self.referenceGridUuid}' -- {self.referenceGrid.name}\n" + \
-                                    f"AND ref_rows_{self.columnIndex}.uuid = {self.dbTable}_{self.columnIndex}.toUuid{self.columnIndex % 10}\n" + \
-                                    f"AND ref_rows_{self.columnIndex}.enabled = true" + dbJoinReferenceClauses
-
-            self.numberOfFields += len(displayColumns)
+        if str(self.typeUuid) == SystemIds.ReferenceColumnType:
+            # References are loaded in a second phase, from the relationships of the loaded rows
+            self.dbSelectClause = None
+            self.dbJoinClause = None
+            self.dbReferenceColumn = f"{self.dbTable}.{self.dbColumn}"
         else:
             self.dbSelectClause = f"{self.dbTable}_{self.partition}.{self.dbColumn}"
             self.dbJoinClause = f"\n-- Join {self.dbTable}\n" + \
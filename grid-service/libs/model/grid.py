@@ -5,6 +5,7 @@
 '''
 
 from .base import BaseModel
+from .load_plan import LoadPlan, DisplayPlan
 
 class Grid(BaseModel):
     def __init__(self, uuid, revision = 1, name = None, description = None):
@@ -12,6 +13,9 @@ class Grid(BaseModel):
         self.name = name
         self.description = description
         self.columns = []
+        self.loadPlan = None
+        self.displayPlan = None
+        self.displayIndexes = ()
 
     def __repr__(self):
         return f"Grid({self.uuid}, {self.name})"
@@ -22,6 +26,37 @@ class Grid(BaseModel):
                 return column
         return None
 
+    def get_display_columns(self):
+        """
+        Returns the display columns of the grid whose values make the display string of rows: text display columns.
+        """
+        return [column for column in self.columns if column.dbTable == 'texts' and column.display]
+
+    def get_display_indexes(self):
+        """
+        Returns the indexes of the display columns, as a tuple shared by the rows of the grid.
+        """
+        displayIndexes = tuple(column.index for column in self.get_display_columns())
+        if displayIndexes != getattr(self, 'displayIndexes', None):
+            self.displayIndexes = displayIndexes
+        return self.displayIndexes
+
+    def get_load_plan(self):
+        """
+        Returns the plan loading the rows of the grid, compiled again only when the columns changed.
+        """
+        if self.loadPlan is None or not self.loadPlan.matches(self):
+            self.loadPlan = LoadPlan(self)
+        return self.loadPlan
+
+    def get_display_plan(self):
+        """
+        Returns the plan loading the display values of rows referenced by other grids.
+        """
+        if self.displayPlan is None or not self.displayPlan.matches(self):
+            self.displayPlan = DisplayPlan(self)
+        return self.displayPlan
+
     def to_json(self):
         result = BaseModel.to_json(self)
         if self.name: result['name'] = self.name
@@ -0,0 +1,108 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+'''
+
+from typing import LiteralString
+
+from ..metadata import SystemIds
+
+class LoadPlan():
+    """
+    Parameterized statements loading the rows of a grid, compiled once for a given schema of the grid.
+    Rows are loaded in one scan, then references are loaded by batches of rows, one statement per partition
+    of relationships. Statements are executed as server-side prepared statements.
+    """
+    def __init__(self, grid):
+        self.schema = LoadPlan.get_schema(grid)
+        self._set_statement(grid)
+        self._set_reference_statements(grid)
+        self.params = {"gridUuid": str(grid.uuid)}
+
+    @staticmethod
+    def get_schema(grid):
+        """
+        Returns what the statements depend on: the columns of the grid.
+        """
+        return tuple((str(column.uuid),
+                      str(column.typeUuid),
+                      column.columnIndex,
+                      str(column.referenceGridUuid))
+                     for column in grid.columns)
+
+    def matches(self, grid):
+        return self.schema == LoadPlan.get_schema(grid)
+
+    def _set_statement(self, grid):
+        """
+        Sets the statement loading rows and the position of each column in its results,
+        None for reference columns.
+        """
+        self.positions = []
+        dbSelectClauses = []
+        for column in grid.columns:
+            if column.dbSelectClause:
+                self.positions.append(2 + len(dbSelectClauses))
+                dbSelectClauses.append(column.dbSelectClause)
+            else:
+                self.positions.append(None)
+        dbSelectColumns = (',\n' if len(dbSelectClauses) > 0 else '') + ',\n'.join(dbSelectClauses)
+        dbJoinClauses = ''.join(list[LiteralString](dict.fromkeys([column.dbJoinClause for column in grid.columns if column.dbJoinClause])))
+        self.statement = "-- Load rows\n" + \
+                            "SELECT rows.uuid, rows.revision" + dbSelectColumns + "\n" + \
+                            "FROM rows" + dbJoinClauses + "\n" + \
+                            "-- Filter by grid uuid and enabled\n" + \
+                            "WHERE rows.gridUuid = %(gridUuid)s\n" + \
+                            "AND rows.enabled = true"
+        self.rowsStatement = self.statement.replace("-- Load rows\n", "-- Load rows by uuid\n", 1) + "\n" + \
+                             "AND rows.uuid = ANY(%(rowUuids)s::uuid[])"
+
+    def _set_reference_statements(self, grid):
+        """
+        Sets, for each partition of relationships used by reference columns, the statement loading
+        the references of a batch of rows and the columns matching its results.
+        """
+        columnsByPartition = {}
+        for column in grid.columns:
+            if str(column.typeUuid) == SystemIds.ReferenceColumnType:
+                columnsByPartition.setdefault(column.partition, []).append(column)
+        self.referenceStatements = []
+        for partition, columns in columnsByPartition.items():
+            statement = "-- Load references\n" + \
+                            "SELECT relationships.fromUuid, " + ", ".join(column.dbReferenceColumn for column in columns) + "\n" + \
+                            "FROM relationships\n" + \
+                            "WHERE relationships.fromUuid = ANY(%(rowUuids)s::uuid[])\n" + \
+                            f"AND relationships.partition = {partition}\n" + \
+                            "ORDER BY relationships.uuid"
+            self.referenceStatements.append((statement, columns))
+
+    def __repr__(self):
+        return f"LoadPlan({len(self.schema)} columns, {len(self.referenceStatements)} reference statements)"
+
+class DisplayPlan():
+    """
+    Parameterized statement loading the display values of a batch of rows of a grid,
+    used to resolve references to the grid.
+    """
+    def __init__(self, grid):
+        self.displayColumns = grid.get_display_columns()
+        self.schema = DisplayPlan.get_schema(grid)
+        dbSelectColumns = ''.join(',\n' + column.dbSelectClause for column in self.displayColumns)
+        dbJoinClauses = ''.join(list[LiteralString](dict.fromkeys([column.dbJoinClause for column in self.displayColumns])))
+        self.statement = "-- Load display values\n" + \
+                            "SELECT rows.uuid" + dbSelectColumns + "\n" + \
+                            "FROM rows" + dbJoinClauses + "\n" + \
+                            "WHERE rows.gridUuid = %(gridUuid)s\n" + \
+                            "AND rows.uuid = ANY(%(rowUuids)s::uuid[])\n" + \
+                            "AND rows.enabled = true"
+
+    @staticmethod
+    def get_schema(grid):
+        return tuple(column.columnIndex for column in grid.get_display_columns())
+
+    def matches(self, grid):
+        return self.schema == DisplayPlan.get_schema(grid)
+
+    def __repr__(self):
+        return f"DisplayPlan({len(self.displayColumns)} display columns)"
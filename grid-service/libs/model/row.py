@@ -4,36 +4,97 @@
 
 '''
 
+import sys
+from uuid import UUID
 from .base import BaseModel
 
-class Row(BaseModel):
+INTERNED_STRING_MAX_LENGTH = 64 # short values repeated across rows are kept once in memory
+
+def _pack_uuid(uuid):
+    """
+    Returns a uuid as 16 bytes, or as given if it is not a uuid.
+    """
+    if isinstance(uuid, UUID): return uuid.bytes
+    try:
+        return UUID(uuid).bytes
+    except (ValueError, TypeError, AttributeError):
+        return uuid
+
+def _unpack_uuid(packed):
+    return str(UUID(bytes = packed)) if isinstance(packed, bytes) else packed
+
+def _intern(value):
+    if isinstance(value, str) and len(value) <= INTERNED_STRING_MAX_LENGTH: return sys.intern(value)
+    return value
+
+class CompactModel(BaseModel):
+    """
+    Model kept in memory in large numbers: attributes are slots, and the uuid is kept as 16 bytes.
+    """
+    __slots__ = ('_uuid',)
+
+    @property
+    def uuid(self):
+        return _unpack_uuid(self._uuid)
+
+    @uuid.setter
+    def uuid(self, uuid):
+        self._uuid = _pack_uuid(uuid)
+
+def get_display_string(values):
+    """
+    Returns the display string of a row from the values of its display columns, missing values being skipped.
+    """
+    return ' | '.join(str(value) for value in values if value is not None)
+
+class Row(CompactModel):
+    """
+    Row of a grid in memory. Reference cells are lists of reference rows, shared by the rows referencing
+    the same row, converted to JSON when the row is. The display string is computed from the values
+    of the display columns of the grid when needed, as display values of rows referencing it are.
+    """
+    __slots__ = ('revision', 'values', '_displayIndexes')
+
     def __init__(self, grid, uuid, revision = 0, values = None):
         BaseModel.__init__(self, uuid, revision)
-        self.values = values
+        self.values = [_intern(value) for value in values] if values else values
         self._set_display_string(grid)
 
     def _set_display_string(self, grid):
+        self._displayIndexes = grid.get_display_indexes()
+
+    @property
+    def displayString(self):
         if self.values:
-            self.displayString = ' | '.join([self.values[column.index] for column in grid.columns if column.display])
-        else:
-            self.displayString = ""
+            return get_display_string(self.values[index] for index in self._displayIndexes)
+        return ""
 
     def __repr__(self):
         return f"Row({self.uuid}, {self.displayString})"
 
     def to_json(self):
         result = BaseModel.to_json(self)
-        if self.values: result['values'] = self.values
-        if self.displayString: result['displayString'] = self.displayString
+        if self.values:
+            result['values'] = [[reference.to_json() for reference in value] if isinstance(value, list) else value
+                                for value in self.values]
+        displayString = self.displayString
+        if displayString: result['displayString'] = displayString
         return result
 
-class ReferenceRow(Row):
+class ReferenceRow(CompactModel):
+    """
+    Row referenced by rows of another grid, with its display string.
+    """
+    __slots__ = ('displayString',)
+    revision = 0
+
     def __init__(self, grid, uuid, values = None):
-        Row.__init__(self, grid, uuid, values = values)
+        self.uuid = uuid
+        self._set_display_string(values)
 
-    def _set_display_string(self, grid):
-        if self.values:
-            self.displayString = ' | '.join([str(value) for value in self.values])
+    def _set_display_string(self, values):
+        if values:
+            self.displayString = _intern(get_display_string(values))
         else:
             self.displayString = ""
 
@@ -5,26 +5,41 @@
     This file contains the Queue Listener for the clairgrid Grid Service.
 '''
 
+import functools
+import itertools
 import json
+import logging
 import os
+import threading
 import time
+from types import SimpleNamespace
+from datetime import datetime, timezone
 import pika
 from . import metadata
 from .utils.configuration_mixin import ConfigurationMixin
-from .utils.decorators import echo
+from .utils.decorators import instrument
 from .authentication.authentication_manager import AuthenticationManager
 from .grid_manager import GridManager
+from .metrics import MetricsManager
+from .utils.keyed_executor import KeyedExecutor
+from .utils.metrics_registry import metrics
 from .utils.report_exception import report_exception
+from .utils.truncated import Truncated
+
+logger = logging.getLogger(__name__)
 
 class QueueListener(ConfigurationMixin):
     """
     Listener for handling Grid Service requests via RabbitMQ.
     """
-    def __init__(self, db_manager, queueNamePrefix="grid_service"):
+    def __init__(self, db_manager, queueNamePrefix="grid_service", grid_manager=None):
         self.db_manager = db_manager
         self.authentication_manager = AuthenticationManager(db_manager)
-        self.grid_manager = GridManager(db_manager)
+        self.grid_manager = grid_manager or GridManager(db_manager)
+        self.metrics_manager = MetricsManager(db_manager, self.grid_manager)
         self.queue_name = f'{queueNamePrefix}_{self.db_manager.db_name.lower()}'
+        self.executor = None
+        self.ready = threading.Event() # set once warmed up, when requests are consumed
         self.load_configuration()
         self._init_command_handlers()
 
@@ -37,6 +52,9 @@ class QueueListener(ConfigurationMixin):
         self.rabbitmq_user = os.getenv("RABBITMQ_USER", "guest")
         self.rabbitmq_password_file = os.getenv("RABBITMQ_PASSWORD_FILE", "/run/secrets/rabbitmq-password")
         self.rabbitmq_password = self._read_password_file(self.rabbitmq_password_file, f"RABBITMQ_PASSWORD_{self.db_manager.db_name}")
+        self.prefetch_count = int(os.getenv("RABBITMQ_PREFETCH_COUNT", "1"))
+        self.worker_count = int(os.getenv("RABBITMQ_WORKER_COUNT", "1"))
+        self.reply_chunk_rows = max(1, int(os.getenv("RABBITMQ_REPLY_CHUNK_ROWS", "1000"))) # at least one row by chunk
 
     def _init_command_handlers(self):
         self.command_handlers = {
@@ -47,31 +65,80 @@ class QueueListener(ConfigurationMixin):
             metadata.ActionChange: self.grid_manager.handle_change,
             metadata.ActionLocate: self.grid_manager.handle_locate,
             metadata.ActionPrompt: self.grid_manager.handle_prompt,
+            metadata.ActionMetrics: self.metrics_manager.handle_metrics,
+            metadata.ActionTopStatements: self.metrics_manager.handle_top_statements,
         }
 
-    @echo
+    @instrument
     def _handle_nothing(self, request):
         return { "status": metadata.SuccessStatus }
 
-    @echo
+    @instrument
     def process_request(self, request):
         """
         Processes the parsed request using a dictionary of command handlers.
+        The time spent waiting in the queue and processing the command is recorded by command.
         """
         command = request.get('command')
         handler = self.command_handlers.get(command)        
         if handler:
-            return handler(request)
+            labels = {"command": command, "db": self.db_manager.db_name}
+            self._observe_queue_wait(request, labels)
+            start, error = time.perf_counter(), True
+            try:
+                reply = handler(request)
+                error = reply.get('status') == metadata.FailedStatus
+                return reply
+            finally:
+                metrics.observe("command", labels, time.perf_counter() - start, error)
         else:
             return { "status": metadata.FailedStatus, "message": "Unknown command" }
 
-    @echo
-    def on_request(self, ch, method, props, body):
+    def _observe_queue_wait(self, request, labels):
         """
-        Callback for handling incoming RabbitMQ messages.
+        Records the time elapsed since the request was initiated: transport and wait in the queue.
+        """
+        try:
+            initiatedOn = datetime.fromisoformat(request['requestInitiatedOn'].replace('Z', '+00:00'))
+            if initiatedOn.tzinfo is None: initiatedOn = initiatedOn.replace(tzinfo=timezone.utc)
+        except (KeyError, AttributeError, ValueError):
+            return
+        wait = (datetime.now(timezone.utc) - initiatedOn).total_seconds()
+        metrics.observe("queue_wait", labels, max(wait, 0.0))
+
+    def _get_request_key(self, request):
+        """
+        Returns the key used to order the processing of a request: changes on the same grid
+        are processed in order, other requests are processed concurrently under the grid locks.
+        """
+        if request.get('command') != metadata.ActionChange:
+            return None
+        gridUuid = request.get('gridUuid')
+        if not gridUuid:
+            changes = request.get('changes')
+            if changes: gridUuid = changes[0].get('gridUuid')
+        return gridUuid
+
+    def _parse_request(self, body):
+        """
+        Parses the body of an incoming message, returning the request or an error reply.
+        Requests are JSON objects, other JSON values are invalid requests.
         """
         try:
             request = json.loads(body)
+            if not isinstance(request, dict): raise ValueError(f"request is not an object but {type(request).__name__}")
+            return request, None
+        except Exception as e:
+            report_exception(e, "Error processing request")
+            reply = {"status": "error", "message": f"invalid request: {str(e)}"}
+            logger.debug("📤 reply %s", Truncated(reply))
+            return None, reply
+
+    def _build_reply(self, request):
+        """
+        Processes the request and builds the corresponding reply.
+        """
+        try:
             reply = {
                 "command": request['command'],
                 "requestInitiatedOn": request['requestInitiatedOn'],
@@ -83,34 +150,175 @@ class QueueListener(ConfigurationMixin):
             if request.get('commandText'): reply['commandText'] = request['commandText']
             if request.get('url'): reply['url'] = request['url']
             try:
-                print(f"📩 request {request}", flush=True)
+                logger.info("📩 request %s", Truncated(request))
                 reply = reply | self.process_request(request)
-                print(f"📤 reply {reply}", flush=True)
+                logger.debug("📤 reply %s", Truncated(reply))
             except Exception as e:
                 report_exception(e, f"Error processing request {request}")
                 reply = reply | {"status": "error", "can't process request, message": str(e)}
         except Exception as e:
             report_exception(e, "Error processing request")
             reply = {"status": "error", "message": f"invalid request: {str(e)}"}
-            print(f"📤 reply {reply}", flush=True)
+            logger.debug("📤 reply %s", Truncated(reply))
+        return reply
 
+    def _serialize_reply(self, props, reply):
         if props.reply_to and reply:
             reply["correlationId"] = props.correlation_id
-            try:
+            return json.dumps(reply)
+        return None
+
+    def _is_chunked_reply(self, request, reply):
+        """
+        Tells if the reply is sent in parts: only when requested, and only for replies with rows.
+        """
+        if not isinstance(request, dict) or not request.get('chunkedReply') or not reply: return False
+        dataSet = reply.get('dataSet')
+        return bool(dataSet) and dataSet.get('rows') is not None
+
+    def _serialize_reply_chunks(self, props, reply):
+        """
+        Yields the serialized parts of a reply: a header with the reply without its rows, chunks of rows,
+        then a terminal message. Parts carry the correlation id and their sequence number.
+        """
+        if not props.reply_to: return
+        dataSet = reply['dataSet']
+        rows = dataSet['rows']
+        countChunks = (len(rows) + self.reply_chunk_rows - 1) // self.reply_chunk_rows
+        part = {
+            "correlationId": props.correlation_id,
+            "command": reply.get('command'),
+            "requestUuid": reply.get('requestUuid'),
+            "contextUuid": reply.get('contextUuid'),
+            "gridUuid": dataSet.get('gridUuid')
+        }
+        yield json.dumps(reply | part | {
+            "dataSet": {key: value for key, value in dataSet.items() if key != 'rows'},
+            "replyPart": metadata.ReplyPartHeader,
+            "sequence": 0,
+            "countChunks": countChunks
+        })
+        for sequence in range(1, countChunks + 1):
+            start = (sequence - 1) * self.reply_chunk_rows
+            yield json.dumps(part | {
+                "replyPart": metadata.ReplyPartRows,
+                "sequence": sequence,
+                "rows": rows[start:start + self.reply_chunk_rows]
+            })
+        yield json.dumps(part | {
+            "replyPart": metadata.ReplyPartEnd,
+            "sequence": countChunks + 1,
+            "status": reply.get('status')
+        })
+
+    def _publish(self, ch, props, body):
+        """
+        Publishes a serialized reply; must run on the connection thread.
+        """
+        try:
+            ch.basic_publish(exchange='',
+                                routing_key=props.reply_to,
+                                properties=pika.BasicProperties(correlation_id=props.correlation_id),
+                                body=body)
+        except Exception as e:
+            report_exception(e, f"Error publishing reply to {props.reply_to}")
+
+    def _send_reply(self, ch, method, props, body):
+        """
+        Publishes the serialized reply and acknowledges the request; must run on the connection thread.
+        """
+        try:
+            if body is not None:
                 ch.basic_publish(exchange='',
                                     routing_key=props.reply_to,
                                     properties=pika.BasicProperties(correlation_id=props.correlation_id),
-                                    body=json.dumps(reply))
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-            except Exception as e:
-                report_exception(e, f"Error publishing reply to {props.reply_to}")
+                                    body=body)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+        except Exception as e:
+            report_exception(e, f"Error publishing reply to {props.reply_to}")
+
+    def _reply(self, ch, method, props, request, reply, schedule):
+        """
+        Serializes the reply and schedules its publication, in parts when requested,
+        then the acknowledgement of the request with the last part.
+        Each part is published as soon as serialized, so that the first rows are sent early.
+        """
+        if not self._is_chunked_reply(request, reply):
+            schedule(functools.partial(self._send_reply, ch, method, props, self._serialize_reply(props, reply)))
+            return
+        bodies = self._serialize_reply_chunks(props, reply)
+        previous = next(bodies, None)
+        for body in bodies:
+            schedule(functools.partial(self._publish, ch, props, previous))
+            previous = body
+        schedule(functools.partial(self._send_reply, ch, method, props, previous))
+
+    def _reply_error(self, ch, method, props, e, schedule):
+        """
+        Schedules an error reply and the acknowledgement of a request which reply failed,
+        so that the request is never left unacknowledged.
+        """
+        report_exception(e, "Error replying to request")
+        reply = {"status": "error", "message": f"can't reply to request: {str(e)}"}
+        schedule(functools.partial(self._send_reply, ch, method, props, self._serialize_reply(props, reply)))
+
+    def _process_request_in_worker(self, ch, method, props, request):
+        """
+        Processes a request on a worker thread, then hands the reply over to the connection thread.
+        """
+        schedule = self.connection.add_callback_threadsafe
+        try:
+            self._reply(ch, method, props, request, self._build_reply(request), schedule)
+        except Exception as e:
+            self._reply_error(ch, method, props, e, schedule)
+
+    @instrument
+    def on_request(self, ch, method, props, body):
+        """
+        Callback for handling incoming RabbitMQ messages.
+        When workers are configured, the request is processed on the worker pool.
+        """
+        request, reply = self._parse_request(body)
+        if request is not None and self.executor is not None:
+            self.executor.submit(self._get_request_key(request), self._process_request_in_worker, ch, method, props, request)
+            return
+        schedule = lambda callback: callback()
+        try:
+            if request is not None:
+                reply = self._build_reply(request)
+            self._reply(ch, method, props, request, reply, schedule)
+        except Exception as e:
+            self._reply_error(ch, method, props, e, schedule)
+
+    def warm_up(self, loaded):
+        """
+        Serializes replies of loads of warmed up grids, whole and in parts, often enough for the JIT compiler
+        to compile serialization before the first requests.
+        """
+        start = time.perf_counter()
+        props = SimpleNamespace(reply_to="warm-up", correlation_id="warm-up")
+        for iteration in range(self.grid_manager.warm_up_iterations):
+            for grid, rows in loaded:
+                reply = {
+                    "command": metadata.ActionLoad,
+                    "status": metadata.SuccessStatus,
+                    "dataSet": {
+                        "gridUuid": str(grid.uuid),
+                        "grid": grid.to_json(),
+                        "rows": [row.to_json() for row in itertools.islice(rows.values(), self.grid_manager.warm_up_rows)]
+                    }
+                }
+                self._serialize_reply(props, reply)
+                for body in self._serialize_reply_chunks(props, reply): pass
+        logger.info("🔥 Replies warmed up on queue %s in %.3f seconds", self.queue_name, time.perf_counter() - start)
 
-    @echo
-    def start(self):
+    @instrument
+    def start(self, loaded = None):
         """
-        Starts the RabbitMQ consumer.
+        Starts the RabbitMQ consumer, once replies of the grids warmed up are warmed up too.
         """
-        print(f"Connecting to queue {self.queue_name} at {self.rabbitmq_host}:{self.rabbitmq_port}...", flush=True)
+        if loaded: self.warm_up(loaded)
+        logger.info("Connecting to queue %s at %s:%s...", self.queue_name, self.rabbitmq_host, self.rabbitmq_port)
         
         credentials = pika.PlainCredentials(self.rabbitmq_user, self.rabbitmq_password)
         parameters = pika.ConnectionParameters(
@@ -124,21 +332,28 @@ class QueueListener(ConfigurationMixin):
             try:
                 self.connection = pika.BlockingConnection(parameters)
             except pika.exceptions.AMQPConnectionError:
-                print("⚠️ Queue not ready, retrying in 5 seconds...", flush=True)
+                logger.warning("⚠️ Queue not ready, retrying in 5 seconds...")
                 time.sleep(5)
 
         self.channel = self.connection.channel()
         self.channel.queue_declare(queue=self.queue_name)
-        self.channel.basic_qos(prefetch_count=1)
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
         self.channel.basic_consume(queue=self.queue_name, on_message_callback=self.on_request)
+        if self.worker_count > 1:
+            self.executor = KeyedExecutor(self.worker_count, thread_name_prefix=self.queue_name)
 
-        print(f"🔄 Awaiting requests on queue {self.queue_name}", flush=True)
+        logger.info("🔄 Awaiting requests on queue %s (prefetch %s, workers %s)", self.queue_name, self.prefetch_count, self.worker_count)
+        self.ready.set()
         try:
             self.channel.start_consuming()
         except KeyboardInterrupt:
             self.stop()
         finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
             if self.connection and self.connection.is_open:
+                self.connection.process_data_events(time_limit=0) # publish replies of the last processed requests
                 self.connection.close()
 
     def stop(self):
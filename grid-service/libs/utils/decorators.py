@@ -2,17 +2,62 @@
     clairgrid : data structuration, presentation and navigation.
     Copyright David Lambert 2025
 
-    This file contains the decorator for echoing function calls.
+    This file contains the decorator for instrumenting function calls.
 '''
 
 import functools
+import inspect
+import logging
+import time
+from .. import metadata
+from .metrics_registry import metrics
 
-def echo(func):
+def _get_labels(func, args):
     """
-    Decorator that prints the name of the function being called.
+    Returns the labels of a call: the function and the database of the manager it belongs to.
     """
+    owner = args[0] if args else None
+    db_name = getattr(owner, 'db_name', None) or getattr(getattr(owner, 'db_manager', None), 'db_name', None)
+    return {"handler": func.__name__, "db": db_name or ""}
+
+def _is_failed(result):
+    return isinstance(result, dict) and result.get('status') in (metadata.FailedStatus, "error")
+
+def instrument(func):
+    """
+    Decorator that logs the name of the function being called, at debug level, with the logger of its module,
+    and records its calls, errors and duration in the metrics registry.
+    Calls raising an exception or returning a failed status are counted as errors.
+    Generators are timed until they are exhausted.
+    """
+    logger = logging.getLogger(func.__module__)
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s()", func.__name__)
+            start, error = time.perf_counter(), False
+            try:
+                yield from func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                metrics.observe("handler", _get_labels(func, args), time.perf_counter() - start, error)
+        return generator_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        print(f"{func.__name__}()", end= " ",flush=True)
-        return func(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s()", func.__name__)
+        start, error = time.perf_counter(), False
+        try:
+            result = func(*args, **kwargs)
+            error = _is_failed(result)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.observe("handler", _get_labels(func, args), time.perf_counter() - start, error)
+    return wrapper
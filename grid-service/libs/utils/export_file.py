@@ -0,0 +1,63 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the export file helpers for the clairgrid Grid Service.
+'''
+
+import gzip
+import io
+
+Compressions = ["gzip", "zstd"]
+Extensions = {".gz": "gzip", ".zst": "zstd"}
+
+def get_compression(file_name):
+    """
+    Returns the compression matching the extension of a file name, or None.
+    """
+    for extension, compression in Extensions.items():
+        if file_name.endswith(extension): return compression
+    return None
+
+def get_format(file_name):
+    """
+    Returns the format of an export file, ndjson or json, from its name.
+    """
+    for extension in Extensions:
+        if file_name.endswith(extension): file_name = file_name[:-len(extension)]
+    return "ndjson" if file_name.endswith(".ndjson") else "json"
+
+def _get_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("zstd compression requires the zstandard package")
+    return zstandard
+
+def open_export_file(file_name, mode, compression = None):
+    """
+    Opens an export file as text, for reading ('r') or writing ('w'), compressed or not.
+    Compressed files made of several concatenated members or frames are read as one.
+    """
+    if compression is None:
+        return open(file_name, mode, encoding = 'utf-8')
+    if compression == "gzip":
+        return gzip.open(file_name, mode + 't', encoding = 'utf-8')
+    if compression == "zstd":
+        zstandard = _get_zstandard()
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(open(file_name, 'rb'), read_across_frames = True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(open(file_name, 'wb'))
+        return io.TextIOWrapper(stream, encoding = 'utf-8')
+    raise ValueError(f"Unknown compression {compression}")
+
+def compress(data, compression = None):
+    """
+    Returns text as bytes, compressed as a standalone member or frame which can be concatenated to others.
+    """
+    data = data.encode('utf-8')
+    if compression is None: return data
+    if compression == "gzip": return gzip.compress(data)
+    if compression == "zstd": return _get_zstandard().ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown compression {compression}")
@@ -0,0 +1,55 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Keyed Executor for the clairgrid Grid Service.
+'''
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .report_exception import report_exception
+
+class KeyedExecutor:
+    """
+    Thread pool running tasks concurrently, except for tasks sharing the same key,
+    which are executed one after the other in submission order.
+    """
+    def __init__(self, max_workers, thread_name_prefix = "worker"):
+        self._executor = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = thread_name_prefix)
+        self._lock = threading.Lock()
+        self._lanes = {} # dictionary of pending tasks by key, present while a task of that key is running
+
+    def submit(self, key, fn, *args):
+        """
+        Submits a task. Tasks without key run as soon as a worker is available.
+        """
+        if key is None:
+            self._executor.submit(self._run, fn, args)
+            return
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append((fn, args))
+                return
+            self._lanes[key] = deque()
+        self._executor.submit(self._run_lane, key, fn, args)
+
+    def _run(self, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            report_exception(e, "Error running task")
+
+    def _run_lane(self, key, fn, args):
+        while True:
+            self._run(fn, args)
+            with self._lock:
+                lane = self._lanes[key]
+                if not lane:
+                    del self._lanes[key]
+                    return
+                fn, args = lane.popleft()
+
+    def shutdown(self, wait = True):
+        self._executor.shutdown(wait = wait)
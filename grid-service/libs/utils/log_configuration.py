@@ -0,0 +1,32 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the logging configuration for the clairgrid Grid Service.
+'''
+
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+def configure_logging():
+    """
+    Sends log records of all loggers to a queue, written to the standard output by a background thread,
+    so that threads processing requests never wait for the output.
+    The level is set by LOG_LEVEL (INFO by default).
+
+    Returns:
+        logging.handlers.QueueListener: The started listener, to be stopped when the service stops.
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"))
+    logQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(logQueue)]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logging.getLogger("pika").setLevel(logging.WARNING)
+    listener = logging.handlers.QueueListener(logQueue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
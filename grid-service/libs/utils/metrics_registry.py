@@ -0,0 +1,139 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Metrics Registry for the clairgrid Grid Service.
+'''
+
+import bisect
+import threading
+
+class Histogram:
+    """
+    Distribution of durations in seconds, counted by bucket; quantiles are interpolated within buckets.
+    """
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(Histogram.buckets) + 1) # last bucket counts durations above all bounds
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(Histogram.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count: return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if index == len(Histogram.buckets): return Histogram.buckets[-1]
+                lower = Histogram.buckets[index - 1] if index > 0 else 0.0
+                return lower + (Histogram.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return Histogram.buckets[-1]
+
+class Series:
+    """
+    Calls, errors and durations of one instrumented operation, for one set of labels.
+    """
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.errors = 0
+        self.histogram = Histogram()
+
+    def to_json(self):
+        return {
+            "name": self.name,
+            "labels": dict(self.labels),
+            "calls": self.histogram.count,
+            "errors": self.errors,
+            "seconds": round(self.histogram.sum, 6),
+            "p50": self.histogram.quantile(0.50),
+            "p95": self.histogram.quantile(0.95),
+            "p99": self.histogram.quantile(0.99)
+        }
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of the durations of handlers, commands and queue waits, by labels,
+    and of gauges collected when metrics are read.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {} # series by (name, labels)
+        self._collectors = [] # (name, labels, function returning a dictionary of values)
+
+    def observe(self, name, labels, seconds, error = False):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = Series(name, key[1])
+            series.histogram.observe(seconds)
+            if error: series.errors += 1
+
+    def add_collector(self, name, labels, collect):
+        """
+        Registers a function returning values exposed as gauges, such as the statistics of a cache.
+        """
+        with self._lock:
+            self._collectors.append((name, tuple(sorted(labels.items())), collect))
+
+    def snapshot(self, db = None):
+        """
+        Returns the series, optionally restricted to a database, with their quantiles.
+        """
+        with self._lock:
+            return [series.to_json() for series in self._series.values() if db is None or dict(series.labels).get("db") == db]
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def to_prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            seriesByName = {}
+            for series in self._series.values():
+                seriesByName.setdefault(series.name, []).append(series)
+            for name, seriesList in sorted(seriesByName.items()):
+                lines.append(f"# TYPE clairgrid_{name}_seconds histogram")
+                for series in seriesList:
+                    cumulative = 0
+                    for bound, count in zip(Histogram.buckets, series.histogram.counts):
+                        cumulative += count
+                        lines.append(f"clairgrid_{name}_seconds_bucket{_format_labels(series.labels, le = repr(bound))} {cumulative}")
+                    lines.append(f"clairgrid_{name}_seconds_bucket{_format_labels(series.labels, le = '+Inf')} {series.histogram.count}")
+                    lines.append(f"clairgrid_{name}_seconds_sum{_format_labels(series.labels)} {series.histogram.sum}")
+                    lines.append(f"clairgrid_{name}_seconds_count{_format_labels(series.labels)} {series.histogram.count}")
+                lines.append(f"# TYPE clairgrid_{name}_errors_total counter")
+                for series in seriesList:
+                    lines.append(f"clairgrid_{name}_errors_total{_format_labels(series.labels)} {series.errors}")
+            collectors = list(self._collectors)
+        gauges = {} # lines by gauge name, grouping the gauges of all databases
+        for name, labels, collect in collectors:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(f"clairgrid_{name}_{key}", []).append(f"clairgrid_{name}_{key}{_format_labels(labels)} {value}")
+        for gauge, gaugeLines in gauges.items():
+            lines.append(f"# TYPE {gauge} gauge")
+            lines += gaugeLines
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items: return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = MetricsRegistry() # registry shared by all managers and listeners
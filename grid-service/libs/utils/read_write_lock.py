@@ -0,0 +1,88 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Read Write Lock for the clairgrid Grid Service.
+'''
+
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+    """
+    Lock shared by any number of readers or held by a single writer.
+    Waiting writers take precedence over new readers. Both locks are reentrant,
+    and the writer can also acquire the read lock; upgrading a read lock is not supported.
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = {} # number of read acquisitions by thread
+        self._writer = None
+        self._writerCount = 0
+        self._waitingWriters = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._waitingWriters:
+                    self._condition.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            count = self._readers[me] - 1
+            if count:
+                self._readers[me] = count
+            else:
+                del self._readers[me]
+                self._condition.notify_all()
+
+    def acquire_write(self, blocking = True, timeout = None):
+        """
+        Acquires the write lock, returns False without waiting if it is not free and blocking is False,
+        or after waiting timeout seconds if it is given and the lock is still not free.
+        """
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writerCount += 1
+                return True
+            if me in self._readers:
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            if not blocking and (self._writer is not None or self._readers):
+                return False
+            self._waitingWriters += 1
+            try:
+                if not self._condition.wait_for(lambda: self._writer is None and not self._readers, timeout):
+                    self._condition.notify_all() # readers held back by this writer
+                    return False
+            finally:
+                self._waitingWriters -= 1
+            self._writer = me
+            self._writerCount = 1
+            return True
+
+    def release_write(self):
+        with self._condition:
+            self._writerCount -= 1
+            if not self._writerCount:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
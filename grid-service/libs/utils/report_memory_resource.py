@@ -1,4 +1,8 @@
+import logging
 import resource
 
+logger = logging.getLogger(__name__)
+
 def report_memory_resource():
-    print(f"ℹ Memory resource: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1000} MB")
\ No newline at end of file
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("ℹ Memory resource: %s MB", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1000)
@@ -0,0 +1,107 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the Statement Statistics for the clairgrid Grid Service.
+'''
+
+import hashlib
+import re
+import threading
+import time
+
+class StatementStatistics:
+    """
+    Thread-safe statistics of the statements executed on a database, by fingerprint:
+    the statement with its literals replaced, so that executions differing only by values are grouped,
+    while statements of grids with different columns are kept apart.
+    """
+    maxStatementLength = 2000 # characters of the normalized statement kept with its statistics
+    maxFingerprints = 10000 # statement texts whose fingerprint is kept
+    explainInterval = 300 # minimum seconds between two captured plans of a statement
+
+    _comment = re.compile(r"--[^\n]*")
+    _string = re.compile(r"'(?:[^']|'')*'")
+    _number = re.compile(r"\b\d+(?:\.\d+)?\b")
+    _spaces = re.compile(r"\s+")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {} # statistics by fingerprint
+        self._fingerprints = {} # (fingerprint, normalized statement, label) by statement text
+
+    @staticmethod
+    def normalize(statement):
+        """
+        Returns the statement without comments, literals and extra spaces, and its label: its first comment.
+        """
+        label = StatementStatistics._comment.search(statement)
+        normalized = StatementStatistics._comment.sub(" ", statement)
+        normalized = StatementStatistics._string.sub("?", normalized)
+        normalized = StatementStatistics._number.sub("?", normalized)
+        normalized = StatementStatistics._spaces.sub(" ", normalized).strip()
+        return normalized, label.group(0)[2:].strip() if label else None
+
+    def get_fingerprint(self, statement):
+        with self._lock:
+            known = self._fingerprints.get(statement)
+        if known: return known
+        normalized, label = StatementStatistics.normalize(statement)
+        known = (hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized, label)
+        with self._lock:
+            if len(self._fingerprints) >= StatementStatistics.maxFingerprints: self._fingerprints = {}
+            self._fingerprints[statement] = known
+        return known
+
+    def record(self, statement, seconds, rows, size):
+        """
+        Records an execution of a statement, returning the fingerprint of the statement.
+        """
+        fingerprint, normalized, label = self.get_fingerprint(statement)
+        with self._lock:
+            entry = self._statements.get(fingerprint)
+            if entry is None:
+                entry = self._statements[fingerprint] = {
+                    "fingerprint": fingerprint,
+                    "label": label,
+                    "statement": normalized[:StatementStatistics.maxStatementLength],
+                    "calls": 0,
+                    "totalSeconds": 0.0,
+                    "maxSeconds": 0.0,
+                    "rows": 0,
+                    "bytes": 0,
+                    "slowCalls": 0,
+                    "plan": None,
+                    "explainedOn": None
+                }
+            entry["calls"] += 1
+            entry["totalSeconds"] += seconds
+            entry["maxSeconds"] = max(entry["maxSeconds"], seconds)
+            entry["rows"] += rows
+            entry["bytes"] += size
+        return fingerprint
+
+    def record_slow(self, fingerprint):
+        """
+        Counts a slow execution, returning True when the plan of the statement is due to be captured.
+        """
+        with self._lock:
+            entry = self._statements[fingerprint]
+            entry["slowCalls"] += 1
+            now = time.time()
+            if entry["explainedOn"] is not None and now - entry["explainedOn"] < StatementStatistics.explainInterval:
+                return False
+            entry["explainedOn"] = now
+            return True
+
+    def set_plan(self, fingerprint, plan):
+        with self._lock:
+            self._statements[fingerprint]["plan"] = plan
+
+    def top(self, limit = 10):
+        """
+        Returns the statements with the highest total execution time first.
+        """
+        with self._lock:
+            statements = sorted(self._statements.values(), key = lambda entry: entry["totalSeconds"], reverse = True)
+            return [dict(entry, meanSeconds = entry["totalSeconds"] / entry["calls"]) for entry in statements[:limit]]
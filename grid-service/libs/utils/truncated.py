@@ -0,0 +1,57 @@
+'''
+    clairgrid : data structuration, presentation and navigation.
+    Copyright David Lambert 2025
+
+    This file contains the lazy truncation of logged payloads for the clairgrid Grid Service.
+'''
+
+import os
+
+def _iter_repr(value, maxLength):
+    """
+    Yields the pieces of the representation of a value, as formatted by str() in containers: dictionaries,
+    lists and tuples are walked item by item, and long strings are cut, so that pieces are formatted
+    only while they are consumed.
+    """
+    if isinstance(value, dict):
+        yield "{"
+        for index, (key, item) in enumerate(value.items()):
+            if index: yield ", "
+            yield from _iter_repr(key, maxLength)
+            yield ": "
+            yield from _iter_repr(item, maxLength)
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        yield "[" if isinstance(value, list) else "("
+        for index, item in enumerate(value):
+            if index: yield ", "
+            yield from _iter_repr(item, maxLength)
+        if isinstance(value, tuple) and len(value) == 1: yield ","
+        yield "]" if isinstance(value, list) else ")"
+    elif isinstance(value, (str, bytes)) and len(value) > maxLength:
+        yield repr(value[:maxLength])
+    else:
+        yield repr(value)
+
+class Truncated:
+    """
+    Logging argument formatting a payload only when the record is emitted, cut to LOG_PAYLOAD_MAX_LENGTH characters.
+    Payloads are formatted up to that length only.
+    """
+    maxLength = int(os.getenv("LOG_PAYLOAD_MAX_LENGTH", "1000"))
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        if not isinstance(self.payload, (dict, list, tuple)):
+            text = str(self.payload)
+            if len(text) <= Truncated.maxLength: return text
+            return f"{text[:Truncated.maxLength]}... ({len(text)} characters)"
+        pieces, length = [], 0
+        for piece in _iter_repr(self.payload, Truncated.maxLength):
+            pieces.append(piece)
+            length += len(piece)
+            if length > Truncated.maxLength:
+                return f"{''.join(pieces)[:Truncated.maxLength]}... (truncated)"
+        return "".join(pieces)
@@ -5,14 +5,18 @@
     This file contains the script to purge the test database.
 '''
 
+import logging
 from libs.database_manager import DatabaseManager
+from libs.utils.log_configuration import configure_logging
 from libs.utils.report_exception import report_exception
 
+logger = logging.getLogger(__name__)
+
 def main():
     """
     Purges the test database if configured to do so.
     """
-    print("⚠️ Starting Purge Test Database Script...", flush=True)
+    logger.warning("⚠️ Starting Purge Test Database Script...")
     try:
         # Initialize DatabaseManager. This loads config, connects, and runs migrations.
         db_manager = DatabaseManager("clairgrid_test", seedData=True, purgeDatabase=True)
@@ -22,5 +26,7 @@ def main():
         report_exception(e, "Purge script failed")
 
 if __name__ == "__main__":
+    log_listener = configure_logging()
     main()
+    log_listener.stop()
 
@@ -0,0 +1,53 @@
+import json
+import pytest
+from libs.database_manager import DatabaseManager
+from libs.grid_manager import GridManager
+from libs.authentication.authentication_manager import AuthenticationManager
+from libs.metadata import SystemIds
+
+# Tables of the test database are small enough for the planner to prefer sequential scans,
+# which are disabled so that a remaining sequential scan means no index can serve the query.
+
+@pytest.fixture(scope="module")
+def statements():
+    """
+    Loads system grids and authenticates, returning the statements sent to the database.
+    """
+    db_manager = DatabaseManager("clairgrid_test")
+    captured = []
+    select_one, select_all = db_manager.select_one, db_manager.select_all
+
+    def capture_one(statement, params = None, **kwargs):
+        captured.append((statement, params))
+        return select_one(statement, params, **kwargs)
+
+    def capture_all(statement, params = None, **kwargs):
+        captured.append((statement, params))
+        return select_all(statement, params, **kwargs)
+
+    db_manager.select_one, db_manager.select_all = capture_one, capture_all
+    grid_manager = GridManager(db_manager)
+    for gridUuid in [SystemIds.Grids, SystemIds.Columns, SystemIds.Users]:
+        grid = grid_manager._load_grid(gridUuid)
+        grid_manager._load_rows(grid)
+    AuthenticationManager(db_manager).handle_authentication({"loginId": "nobody", "passwordHash": "nothing"})
+    yield db_manager, captured
+    db_manager.close()
+
+def _get_seq_scans(plan):
+    if plan.get("Node Type") == "Seq Scan": yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _get_seq_scans(child)
+
+def test_load_queries_use_indexes(statements):
+    db_manager, captured = statements
+    assert any(statement.lstrip().startswith("-- Load references") for statement, _ in captured)
+    with db_manager.conn.cursor() as cur:
+        with db_manager.conn.transaction():
+            cur.execute("SET LOCAL enable_seqscan = off")
+            for statement, params in captured:
+                cur.execute("EXPLAIN (FORMAT JSON) " + statement, params)
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str): plan = json.loads(plan)
+                seqScans = list(_get_seq_scans(plan[0]["Plan"]))
+                assert seqScans == [], f"Sequential scan of {seqScans} for {statement}"
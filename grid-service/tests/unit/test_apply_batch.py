@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from libs import metadata
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager import GridManager
+
+class TestApplyBatch(unittest.TestCase):
+
+    @patch("libs.base_manager.BaseManager._read_password_file", return_value = "secret")
+    def setUp(self, mock_read_pwd):
+        self.db_manager = MagicMock()
+        self.db_manager.db_name = "test_db"
+        self.grid_manager = GridManager(self.db_manager)
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid_manager.grid_cache.put_grid(self.grid)
+        self.grid_manager.grid_cache.put_rows("grid-uuid", {"row-1": Row(self.grid, "row-1", revision = 1, values = ["one"])})
+
+    def _apply(self, changes):
+        operations = []
+        reply = self.grid_manager._apply_batch({"changes": changes, "atomic": True}, operations, ["grid-uuid"])
+        return reply, operations
+
+    def test_batch_is_applied(self):
+        """Test that rows added by a batch can be changed by later changes of the batch."""
+        reply, operations = self._apply([
+            {"changeType": metadata.ChangeAdd, "gridUuid": "grid-uuid", "rowUuid": "row-2"},
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-2", "changeValue": "two"},
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-1", "changeValue": "uno"}
+        ])
+        self.assertEqual(reply["status"], metadata.SuccessStatus)
+        self.assertEqual([result["status"] for result in reply["results"]], [metadata.SuccessStatus] * 3)
+        rows = self.grid_manager.grid_cache.get_rows("grid-uuid")
+        self.assertEqual(rows["row-2"].values, ["two"])
+        self.assertEqual(rows["row-1"].values, ["uno"])
+        self.assertEqual(rows["row-1"].revision, 2)
+        self.assertEqual(len(operations), 5)
+
+    def test_invalid_batch_is_not_applied(self):
+        """Test that no change is applied when one change is invalid, and each change has its result."""
+        reply, operations = self._apply([
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-1", "changeValue": "uno"},
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-9", "rowUuid": "row-1", "changeValue": "x"},
+            {"changeType": metadata.ChangeLoad, "gridUuid": "grid-uuid"}
+        ])
+        self.assertEqual(reply["status"], metadata.FailedStatus)
+        self.assertEqual([result["status"] for result in reply["results"]],
+                         [metadata.SkippedStatus, metadata.FailedStatus, metadata.FailedStatus])
+        self.assertEqual(reply["results"][1]["message"], "No column provided for update")
+        self.assertEqual(self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"].values, ["one"])
+        self.assertEqual(operations, [])
+
+    def test_failure_while_applied_drops_grids(self):
+        """Test that grids changed are dropped from memory when a change fails once applied."""
+        with patch.object(GridManager, "_update_row", side_effect = Exception("boom")):
+            reply, operations = self._apply([
+                {"changeType": metadata.ChangeAdd, "gridUuid": "grid-uuid", "rowUuid": "row-2"},
+                {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-2", "changeValue": "two"}
+            ])
+        self.assertEqual(reply["status"], metadata.FailedStatus)
+        self.assertEqual(operations, [])
+        self.assertIsNone(self.grid_manager.grid_cache.get_grid("grid-uuid"))
+
+    def test_conflicting_batch_is_not_applied(self):
+        """Test that no change is applied when a row was changed since the revision a change expects."""
+        reply, operations = self._apply([
+            {"changeType": metadata.ChangeAdd, "gridUuid": "grid-uuid", "rowUuid": "row-2"},
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-1", "changeValue": "uno", "expectedRevision": 0}
+        ])
+        self.assertEqual(reply["status"], metadata.ConflictStatus)
+        self.assertEqual([result["status"] for result in reply["results"]], [metadata.SkippedStatus, metadata.ConflictStatus])
+        self.assertEqual(len(reply["conflicts"]), 1)
+        self.assertEqual(reply["conflicts"][0]["revision"], 1)
+        self.assertEqual(reply["conflicts"][0]["row"]["values"], ["one"])
+        self.assertEqual(operations, [])
+
+    def test_row_changed_several_times_by_batch(self):
+        """Test that changes of a batch are compared to the revision of rows when the batch started."""
+        reply, operations = self._apply([
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-1", "changeValue": "uno", "expectedRevision": 1},
+            {"changeType": metadata.ChangeUpdate, "gridUuid": "grid-uuid", "columnUuid": "col-1", "rowUuid": "row-1", "changeValue": "one", "expectedRevision": 1}
+        ])
+        self.assertEqual(reply["status"], metadata.SuccessStatus)
+        self.assertEqual(self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"].revision, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from libs.grid_manager.change_writer import ChangeWriter, get_statements, get_notify_statements, OperationInsertRow, OperationSetValue, \
+    OperationAddRelationship, OperationRemoveRelationship, OperationSetRevision, RevisionConflict
+
+class TestGetStatements(unittest.TestCase):
+
+    def test_values_are_grouped_and_coalesced(self):
+        """Test that values of a column are written by one upsert, with the last value of each cell."""
+        statements = get_statements([
+            (OperationSetValue, "texts", 0, "text1", "row-1", "a"),
+            (OperationSetValue, "texts", 0, "text1", "row-1", "ab"),
+            (OperationSetValue, "texts", 0, "text1", "row-2", "x"),
+            (OperationSetValue, "ints", 1, "int3", "row-1", 12)
+        ])
+        self.assertEqual(len(statements), 2)
+        statement, params = statements[0]
+        self.assertIn("INSERT INTO texts (uuid, partition, text1) VALUES (%s::uuid, 0, %s::text), (%s::uuid, 0, %s::text)", statement)
+        self.assertIn("ON CONFLICT (uuid, partition) DO UPDATE SET text1 = excluded.text1", statement)
+        self.assertEqual(params, ["row-1", "ab", "row-2", "x"])
+        self.assertIn("INSERT INTO ints (uuid, partition, int3) VALUES (%s::uuid, 1, %s::integer)", statements[1][0])
+
+    def test_statements_follow_foreign_keys(self):
+        """Test that rows are inserted first, relationships kept in order, and revisions written last."""
+        statements = get_statements([
+            (OperationSetRevision, "grid-1", "row-1", 1, 2),
+            (OperationAddRelationship, 0, "toUuid2", "row-1", "ref-1"),
+            (OperationRemoveRelationship, 0, "toUuid2", "row-1", "ref-1"),
+            (OperationInsertRow, "grid-1", "row-1", 1),
+            (OperationSetRevision, "grid-1", "row-1", 2, 3)
+        ])
+        self.assertTrue(statements[0][0].startswith("INSERT INTO rows"))
+        self.assertTrue(statements[1][0].startswith("INSERT INTO relationships"))
+        self.assertTrue(statements[2][0].startswith("UPDATE relationships SET toUuid2 = NULL"))
+        self.assertTrue(statements[3][0].startswith("DELETE FROM relationships"))
+        self.assertTrue(statements[4][0].startswith("UPDATE rows SET revision"))
+        self.assertIn("rows.revision = changes.previousRevision RETURNING rows.uuid", statements[4][0])
+        self.assertEqual(statements[4][1], ["row-1", 1, 3])
+
+    def test_notify_statements(self):
+        """Test that rows written are notified with their last revision, by payloads of bounded size."""
+        operations = [(OperationInsertRow, "grid-1", "row-0", 1), (OperationSetRevision, "grid-1", "row-0", 1, 2)]
+        operations += [(OperationSetRevision, "grid-2", f"row-{i}", 1, 2) for i in range(1, 100)]
+        statements = get_notify_statements(operations, "instance-1")
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(statements[0][0], "SELECT pg_notify(%s, %s)")
+        payload = json.loads(statements[0][1][1])
+        self.assertEqual(payload["instance"], "instance-1")
+        self.assertEqual(payload["rows"][0], ["grid-1", "row-0", 2])
+        self.assertTrue(all(len(params[1]) < 8000 for _, params in statements))
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            get_statements([("dropTable", "rows")])
+
+class TestChangeWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.db_manager = MagicMock()
+        self.db_manager.db_name = "test_db"
+        self.writer = ChangeWriter(self.db_manager, flushIntervalMilliseconds = 50)
+
+    def tearDown(self):
+        self.writer.stop()
+
+    def test_written_at_once_when_not_started(self):
+        ticket = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        self.assertTrue(ticket.wait(0))
+        self.assertIsNone(ticket.error)
+        self.db_manager.execute_all.assert_called_once()
+
+    def test_group_commit(self):
+        """Test that changes queued during a flush interval are written in one transaction."""
+        self.writer.start()
+        tickets = [self.writer.submit([(OperationSetValue, "texts", 0, "text0", "row-1", "a" * i)]) for i in range(1, 20)]
+        for ticket in tickets:
+            self.assertTrue(ticket.wait(5))
+        self.assertEqual(self.db_manager.execute_all.call_count, 1)
+        statements = self.db_manager.execute_all.call_args[0][0]
+        self.assertEqual(statements[0][1], ["row-1", "a" * 19])
+        self.assertEqual(self.writer.stats()["written"], 19)
+
+    def test_failed_batch_is_retried_then_given_up(self):
+        """Test that changes failing are retried with a backoff until the retry timeout."""
+        self.db_manager.execute_all.side_effect = Exception("database down")
+        self.writer.flushInterval = 0.001
+        self.writer.retryTimeout = 0.3
+        self.writer.start()
+        start = time.monotonic()
+        ticket = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        self.assertTrue(ticket.wait(5))
+        self.assertIsNotNone(ticket.error)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        # Retried after 0.05, 0.1 and 0.2 s, not at each flush
+        self.assertLessEqual(self.db_manager.execute_all.call_count, 5)
+
+    def test_outage_shorter_than_retry_timeout(self):
+        """Test that changes are written once the database is back, in order within a grid."""
+        written = []
+        def execute_all(statements, check):
+            if self.db_manager.execute_all.call_count <= 3: raise Exception("database down")
+            written.extend(params[0] for statement, params in statements if statement.startswith("UPDATE rows"))
+        self.db_manager.execute_all.side_effect = execute_all
+        self.writer.flushInterval = 0.001
+        self.writer.start()
+        first = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        time.sleep(0.02) # queued while the first changes are retried
+        second = self.writer.submit([(OperationSetRevision, "grid-1", "row-2", 1, 2)])
+        other = self.writer.submit([(OperationSetRevision, "grid-2", "row-3", 1, 2)])
+        for ticket in (first, second, other):
+            self.assertTrue(ticket.wait(5))
+            self.assertIsNone(ticket.error)
+        self.assertLess(written.index("row-1"), written.index("row-2"))
+
+    def test_changes_of_a_grid_wait_for_changes_failing(self):
+        """Test that changes of a grid do not overtake changes of the grid failing, and are given up with them."""
+        overtaking = []
+        def execute_all(statements, check):
+            rowUuids = [param for _, params in statements for param in params]
+            if "row-1" in rowUuids: raise Exception("invalid input syntax for type uuid")
+            if "row-2" in rowUuids: overtaking.append(statements)
+        self.db_manager.execute_all.side_effect = execute_all
+        self.writer.flushInterval = 0.05
+        self.writer.retryTimeout = 0.2
+        self.writer.start()
+        bad = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        later = self.writer.submit([(OperationSetRevision, "grid-1", "row-2", 1, 2)])
+        other = self.writer.submit([(OperationSetRevision, "grid-2", "row-3", 1, 2)])
+        for ticket in (bad, later, other):
+            self.assertTrue(ticket.wait(5))
+        self.assertIsNotNone(bad.error)
+        self.assertIsNotNone(later.error)
+        self.assertIsNone(other.error)
+        self.assertEqual(overtaking, [])
+
+    def test_failing_request_does_not_fail_others(self):
+        """Test that requests of a failed batch are written again one by one."""
+        def execute_all(statements, check):
+            if any("bad-row" in params for _, params in statements): raise Exception("invalid input syntax for type uuid")
+        self.db_manager.execute_all.side_effect = execute_all
+        self.writer.flushInterval = 0.001
+        self.writer.retryTimeout = 0.1
+        self.writer.start()
+        good = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        bad = self.writer.submit([(OperationSetRevision, "grid-2", "bad-row", 1, 2)])
+        self.assertTrue(good.wait(5))
+        self.assertTrue(bad.wait(5))
+        self.assertIsNone(good.error)
+        self.assertIsNotNone(bad.error)
+
+    def test_rows_written_are_notified(self):
+        self.writer.instanceUuid = "instance-1"
+        self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        statements = self.db_manager.execute_all.call_args[0][0]
+        self.assertEqual(statements[-1][0], "SELECT pg_notify(%s, %s)")
+
+    def test_revision_conflict_is_given_up(self):
+        """Test that changes of rows changed meanwhile in the database are rolled back and not written again."""
+        self.db_manager.execute_all.side_effect = lambda statements, check: check([None, [("grid-1", 1)], [("row-2",)], [("grid-1", 2)]])
+        given_up = []
+        self.writer.flushInterval = 0.001
+        self.writer.start()
+        ticket = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2), (OperationSetRevision, "grid-1", "row-2", 4, 5)], given_up.append)
+        self.assertTrue(ticket.wait(5))
+        self.assertIsInstance(ticket.error, RevisionConflict)
+        self.assertEqual(ticket.error.rowUuids, {"row-1"})
+        self.assertEqual(given_up, [ticket.error])
+        self.assertEqual(self.db_manager.execute_all.call_count, 1)
+
+    def test_revisions_of_grids_are_given_once_written(self):
+        """Test that the revisions of grids written, read before and after changes, are given once changes are written."""
+        stamps = []
+        self.writer.onStamps = stamps.append
+        self.db_manager.execute_all.side_effect = lambda statements, check: check([None, [("grid-1", 7)], [("row-1",)], [("grid-1", 8)]])
+        ticket = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        self.assertTrue(ticket.wait(0))
+        self.assertIsNone(ticket.error)
+        self.assertEqual(stamps, [{"grid-1": (7, 8)}])
+        statements = self.db_manager.execute_all.call_args[0][0]
+        self.assertIn("FOR UPDATE", statements[1][0])
+        self.assertTrue(statements[2][0].startswith("UPDATE rows SET revision"))
+
+    def test_idle_by_grid(self):
+        """Test that grids are idle once their changes are written, whatever the changes of other grids."""
+        self.writer.flushInterval = 60
+        self.writer.start()
+        ticket = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        self.assertFalse(self.writer.is_idle(["grid-1"]))
+        self.assertTrue(self.writer.is_idle(["grid-2"]))
+        self.writer.stop()
+        self.assertTrue(ticket.wait(0))
+        self.assertTrue(self.writer.is_idle(["grid-1"]))
+
+    def test_stop_writes_queued_changes(self):
+        written = threading.Event()
+        self.db_manager.execute_all.side_effect = lambda statements, check: written.set()
+        self.writer.flushInterval = 60
+        self.writer.start()
+        ticket = self.writer.submit([(OperationSetRevision, "grid-1", "row-1", 1, 2)])
+        self.writer.stop()
+        self.assertTrue(written.is_set())
+        self.assertTrue(ticket.wait(0))
+
+if __name__ == '__main__':
+    unittest.main()
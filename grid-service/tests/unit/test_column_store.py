@@ -0,0 +1,160 @@
+import unittest
+from types import SimpleNamespace
+from libs import metadata
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row, ReferenceRow
+from libs.grid_manager.column_store import ColumnStore
+from libs.grid_manager.grid_cache import GridCache
+from libs.grid_manager._query_rows import _query_rows
+from libs.grid_manager._get_window import _get_window
+
+class TestColumnStore(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid.columns.append(Column("col-2", 1, 1, order = "1", name = "Count", typeUuid = SystemIds.IntColumnType, columnIndex = 0))
+        self.grid.columns.append(Column("col-3", 2, 2, order = "2", name = "Active", typeUuid = SystemIds.BooleanColumnType, columnIndex = 0))
+        self.grid.columns.append(Column("col-4", 3, 3, order = "3", name = "Owner", typeUuid = SystemIds.ReferenceColumnType, columnIndex = 0))
+        self.grid.columns.append(Column("col-5", 4, 4, order = "4", name = "Password", typeUuid = SystemIds.PasswordColumnType, columnIndex = 1))
+        owners = [ReferenceRow(self.grid, "owner-1", ["Alice"]), ReferenceRow(self.grid, "owner-2", ["Bob"])]
+        self.rows = {}
+        for i in range(10):
+            values = [f"name {i}" if i != 5 else None, 10 - i if i != 3 else None, i % 2 == 0 if i != 7 else None, [owners[i % 2]], "hash"]
+            self.rows[f"row-{i}"] = Row(self.grid, f"row-{i}", values = values)
+        self.rows["row-10"] = Row(self.grid, "row-10", values = ["", 0, False, [], "hash"])
+        self.store = ColumnStore(self.grid, self.rows)
+
+    def _filter(self, columnUuid, operator, value = None):
+        mask = self.store.filter([{"columnUuid": columnUuid, "operator": operator, "value": value}])
+        return [self.store.uuids[position] for position in self.store.sort(mask)]
+
+    def test_int_filters(self):
+        """Test that int comparisons match rows with a value only."""
+        self.assertEqual(self._filter("col-2", metadata.FilterGreater, 7), ["row-0", "row-1", "row-2"])
+        self.assertEqual(self._filter("col-2", metadata.FilterLessOrEqual, 0), ["row-10"])
+        self.assertEqual(len(self._filter("col-2", metadata.FilterNotEqual, 5)), 9)
+        self.assertEqual(self._filter("col-2", metadata.FilterIsNull), ["row-3"])
+
+    def test_text_filters(self):
+        """Test that texts are compared, searched and matched exactly, across the boundaries of values."""
+        self.assertEqual(self._filter("col-1", metadata.FilterEqual, "name 1"), ["row-1"])
+        self.assertEqual(self._filter("col-1", metadata.FilterContains, "e 4"), ["row-4"])
+        self.assertEqual(self._filter("col-1", metadata.FilterContains, "1name"), [])
+        self.assertEqual(self._filter("col-1", metadata.FilterEqual, ""), ["row-10"])
+        self.assertEqual(self._filter("col-1", metadata.FilterGreaterOrEqual, "name 8"), ["row-8", "row-9"])
+        self.assertEqual(len(self._filter("col-1", metadata.FilterNotEqual, "name 1")), 9)
+        self.assertEqual(self._filter("col-4", metadata.FilterEqual, "Bob"), ["row-1", "row-3", "row-5", "row-7", "row-9"])
+
+    def test_text_values_are_coerced(self):
+        """Test that values of a text column which are not text are queried as their text."""
+        self.rows["row-2"].values[0] = 12
+        store = ColumnStore(self.grid, self.rows)
+        mask = store.filter([{"columnUuid": "col-1", "operator": metadata.FilterEqual, "value": "12"}])
+        self.assertEqual([store.uuids[position] for position in store.sort(mask)], ["row-2"])
+
+    def test_boolean_filters(self):
+        """Test that booleans match true or false values, rows without value being neither."""
+        self.assertEqual(self._filter("col-3", metadata.FilterEqual, True), ["row-0", "row-2", "row-4", "row-6", "row-8"])
+        self.assertEqual(self._filter("col-3", metadata.FilterNotEqual, True), ["row-1", "row-10", "row-3", "row-5", "row-9"])
+
+    def test_filters_are_combined(self):
+        mask = self.store.filter([{"columnUuid": "col-3", "operator": metadata.FilterEqual, "value": True},
+                                  {"columnUuid": "col-2", "operator": metadata.FilterLess, "value": 8}])
+        self.assertEqual([self.store.uuids[position] for position in self.store.sort(mask)], ["row-4", "row-6", "row-8"])
+
+    def test_sort(self):
+        """Test that rows are sorted by value, rows without value last, equal values by uuid."""
+        mask = self.store.filter(None)
+        uuids = [self.store.uuids[position] for position in self.store.sort(mask, "col-2")]
+        self.assertEqual(uuids[:2], ["row-10", "row-9"])
+        self.assertEqual(uuids[-1], "row-3")
+        uuids = [self.store.uuids[position] for position in self.store.sort(mask, "col-2", True)]
+        self.assertEqual(uuids[:2], ["row-0", "row-1"])
+        self.assertEqual(uuids[-1], "row-3")
+        uuids = [self.store.uuids[position] for position in self.store.sort(mask, "col-3")]
+        self.assertEqual(uuids, ["row-1", "row-10", "row-3", "row-5", "row-9", "row-0", "row-2", "row-4", "row-6", "row-8", "row-7"])
+
+    def test_aggregates(self):
+        mask = self.store.filter([{"columnUuid": "col-2", "operator": metadata.FilterGreaterOrEqual, "value": 5}])
+        results = self.store.aggregate(mask, [
+            {"function": metadata.AggregateCount},
+            {"function": metadata.AggregateSum, "columnUuid": "col-2"},
+            {"function": metadata.AggregateMin, "columnUuid": "col-2"},
+            {"function": metadata.AggregateMax, "columnUuid": "col-1"},
+            {"function": metadata.AggregateCount, "columnUuid": "col-1"}
+        ])
+        self.assertEqual([result["value"] for result in results], [5, 38, 5, "name 4", 4])
+
+    def test_invalid_queries(self):
+        """Test that unknown columns, operators, values and aggregates are rejected."""
+        with self.assertRaises(ValueError):
+            self.store.filter([{"columnUuid": "col-5", "operator": metadata.FilterEqual, "value": "hash"}])
+        with self.assertRaises(ValueError):
+            self.store.filter([{"columnUuid": "col-1", "operator": "like", "value": "name"}])
+        with self.assertRaises(ValueError):
+            self.store.filter([{"columnUuid": "col-2", "operator": metadata.FilterEqual, "value": "1"}])
+        with self.assertRaises(ValueError):
+            self.store.filter([{"columnUuid": "col-2", "operator": metadata.FilterContains, "value": 1}])
+        with self.assertRaises(ValueError):
+            self.store.aggregate(self.store.filter(None), [{"function": metadata.AggregateSum, "columnUuid": "col-1"}])
+
+class TestQueryRows(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Count", typeUuid = SystemIds.IntColumnType, columnIndex = 0))
+        self.rows = {f"row-{i:02}": Row(self.grid, f"row-{i:02}", values = [i]) for i in range(20)}
+        self.cache = GridCache(10 * 1024 * 1024)
+        self.cache.put_grid(self.grid)
+        self.cache.put_rows(self.grid.uuid, self.rows)
+        self.manager = SimpleNamespace(grid_cache = self.cache)
+        self.filters = [{"columnUuid": "col-1", "operator": metadata.FilterGreaterOrEqual, "value": 10}]
+
+    def test_windows_cover_matching_rows(self):
+        """Test that following cursors returns every matching row once, in order."""
+        uuids, cursor = [], None
+        while True:
+            window, count, _, cursor = _query_rows(self.manager, self.grid, self.rows, self.filters, "col-1", True, None, 3, cursor)
+            self.assertEqual(count, 10)
+            uuids += [row.uuid for row in window]
+            if not cursor: break
+        self.assertEqual(uuids, [f"row-{i:02}" for i in range(19, 9, -1)])
+
+    def test_store_is_invalidated(self):
+        """Test that the store is kept until rows of the grid change."""
+        _query_rows(self.manager, self.grid, self.rows, self.filters)
+        self.assertIsNotNone(self.cache.get_column_store(self.grid.uuid))
+        self.cache.invalidate_sorted_indexes(self.grid.uuid)
+        self.assertIsNone(self.cache.get_column_store(self.grid.uuid))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            _query_rows(self.manager, self.grid, self.rows, self.filters, None, False, None, 2, "not a cursor")
+        with self.assertRaises(ValueError):
+            _query_rows(self.manager, self.grid, self.rows, self.filters, "unknown-column")
+
+    def test_cursor_of_another_sort_is_rejected(self):
+        """Test that cursors are not mixed between sorts, or between queries and windows."""
+        _, _, _, cursor = _query_rows(self.manager, self.grid, self.rows, self.filters, "col-1", True, None, 3)
+        with self.assertRaises(ValueError):
+            _query_rows(self.manager, self.grid, self.rows, self.filters, "col-1", False, None, 3, cursor)
+        with self.assertRaises(ValueError):
+            _get_window(self.manager, self.grid, self.rows, 3, cursor, "col-1")
+        _, cursor = _get_window(self.manager, self.grid, self.rows, 3, None, "col-1")
+        with self.assertRaises(ValueError):
+            _query_rows(self.manager, self.grid, self.rows, self.filters, "col-1", False, None, 3, cursor)
+
+    def test_int_values_are_coerced(self):
+        """Test that int values changed in memory as text are queried as ints, and others as missing."""
+        self.rows["row-05"].values[0] = "5"
+        self.rows["row-06"].values[0] = "six"
+        self.cache.invalidate_sorted_indexes(self.grid.uuid)
+        filters = [{"columnUuid": "col-1", "operator": metadata.FilterLess, "value": 7}]
+        window, _, _, _ = _query_rows(self.manager, self.grid, self.rows, filters, "col-1")
+        self.assertEqual([row.uuid for row in window], [f"row-{i:02}" for i in range(6)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,15 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import MagicMock, patch, call, mock_open
 import psycopg
+from uuid import UUID
 from libs.database_manager import DatabaseManager
+from libs.metadata import SystemIds
+from libs.metadata.migration_steps import get_migration_steps
 
 class TestDatabaseManager(unittest.TestCase):
 
@@ -140,3 +148,315 @@ class TestDatabaseManager(unittest.TestCase):
             # We can check if conn.transaction() was called
             self.assertTrue(self.db_manager.conn.transaction.called)
 
+    def test_concurrent_index_step_runs_outside_transaction(self):
+        """Test that an index built concurrently is not wrapped in a transaction, and an invalid leftover is dropped."""
+        self.db_manager.conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_cur.fetchone.return_value = (1,)
+        self.db_manager.conn.cursor.return_value.__enter__.return_value = mock_cur
+        statement = "CREATE INDEX CONCURRENTLY IF NOT EXISTS rows_griduuid_enabled ON rows (gridUuid)"
+
+        self.db_manager._execute_migration_step(180, statement)
+
+        self.db_manager.conn.transaction.assert_not_called()
+        execute_calls = [args[0][0] for args in mock_cur.execute.call_args_list]
+        self.assertIn("DROP INDEX CONCURRENTLY IF EXISTS rows_griduuid_enabled", execute_calls)
+        self.assertLess(execute_calls.index("DROP INDEX CONCURRENTLY IF EXISTS rows_griduuid_enabled"), execute_calls.index(statement))
+        mock_cur.execute.assert_called_with("INSERT INTO migrations (sequence, statement) VALUES (%s, %s)", (180, statement))
+
+    def test_index_migration_steps_are_concurrent(self):
+        """Test that indexes added to existing tables are built concurrently, after the tables are created."""
+        steps = get_migration_steps("root", "password")
+        indexSteps = {sequence: statement for sequence, statement in steps.items() if "INDEX" in statement}
+        self.assertTrue(indexSteps)
+        for sequence, statement in indexSteps.items():
+            self.assertTrue(statement.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS"))
+            self.assertGreater(sequence, 160)
+
+
+    def _mock_pool(self, mock_pool_class):
+        mock_pool = mock_pool_class.return_value
+        mock_conn = mock_pool.connection.return_value.__enter__.return_value
+        mock_cur = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cur.pgresult = None
+        return mock_pool, mock_cur
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_select_one_borrows_from_pool(self, mock_pool_class):
+        """Test that select_one borrows a pooled connection, opening the pool once."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.fetchone.return_value = (1,)
+
+        self.assertEqual(self.db_manager.select_one("SELECT   1"), (1,))
+        self.assertEqual(self.db_manager.select_one("SELECT 1"), (1,))
+
+        mock_pool_class.assert_called_once()
+        self.assertEqual(mock_pool.connection.call_count, 2)
+        mock_cur.execute.assert_called_with("SELECT 1", None, prepare=None)
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_select_one_retries_on_lost_connection(self, mock_pool_class):
+        """Test that a statement is executed again once on a new connection when the connection is lost."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.execute.side_effect = [psycopg.OperationalError("server closed the connection"), None]
+        mock_cur.fetchone.return_value = (1,)
+
+        self.assertEqual(self.db_manager.select_one("SELECT 1"), (1,))
+        self.assertEqual(mock_pool.connection.call_count, 2)
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_select_all_does_not_retry_on_error(self, mock_pool_class):
+        """Test that errors other than lost connections are raised immediately."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.execute.side_effect = psycopg.ProgrammingError("syntax error")
+
+        with self.assertRaises(psycopg.ProgrammingError):
+            list(self.db_manager.select_all("SELECT"))
+        self.assertEqual(mock_pool.connection.call_count, 1)
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_select_all_gives_back_the_connection(self, mock_pool_class):
+        """Test that rows are fetched before the connection is given back, not while the caller iterates."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.fetchall.return_value = [(1,), (2,)]
+
+        rows = self.db_manager.select_all("SELECT 1")
+
+        self.assertEqual(rows, [(1,), (2,)])
+        mock_pool.connection.return_value.__exit__.assert_called_once()
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_select_stream_uses_server_side_cursor(self, mock_pool_class):
+        """Test that select_stream fetches results through a named cursor in a transaction."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_conn = mock_pool.connection.return_value.__enter__.return_value
+        mock_cur.fetchmany.side_effect = [[(1,), (2,)], []]
+
+        self.assertEqual(list(self.db_manager.select_stream("SELECT 1", itersize=50)), [(1,), (2,)])
+
+        mock_conn.transaction.assert_called_once()
+        mock_conn.cursor.assert_called_once_with(name="clairgrid_stream")
+        self.assertEqual(mock_cur.itersize, 50)
+        mock_cur.execute.assert_called_once_with("SELECT 1", None)
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_statement_statistics(self, mock_pool_class):
+        """Test that statements are timed by fingerprint, with the rows and bytes they return."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.pgresult = MagicMock(ntuples=2, nfields=1)
+        mock_cur.pgresult.get_length.return_value = 8
+        mock_cur.fetchall.return_value = [(1,), (2,)]
+
+        list(self.db_manager.select_all("-- Load things\nSELECT uuid FROM rows WHERE revision = 1"))
+        self.db_manager.select_one("-- Load things\nSELECT uuid FROM rows WHERE revision = 2")
+
+        top = self.db_manager.statement_statistics.top()
+        self.assertEqual(len(top), 1)
+        self.assertEqual(top[0]["label"], "Load things")
+        self.assertEqual(top[0]["statement"], "SELECT uuid FROM rows WHERE revision = ?")
+        self.assertEqual((top[0]["calls"], top[0]["rows"], top[0]["bytes"]), (2, 4, 32))
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_slow_statement_is_explained(self, mock_pool_class):
+        """Test that the plan of a slow statement is captured once when enabled."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.fetchone.return_value = (1,)
+        mock_cur.__iter__.return_value = iter([("Seq Scan on rows",)])
+        self.db_manager.slow_query_threshold_milliseconds = 0
+        self.db_manager.slow_query_explain = True
+
+        self.db_manager.select_one("SELECT 1")
+
+        mock_cur.execute.assert_called_with("EXPLAIN (ANALYZE, BUFFERS) SELECT 1", None)
+        self.assertEqual(self.db_manager.statement_statistics.top()[0]["plan"], "Seq Scan on rows")
+        self.assertEqual(self.db_manager.statement_statistics.top()[0]["slowCalls"], 1)
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_slow_statement_is_logged_without_params(self, mock_pool_class):
+        """Test that slow statements are logged by fingerprint, params being secret, and not explained if told so."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.fetchone.return_value = None
+        self.db_manager.slow_query_threshold_milliseconds = 0
+        self.db_manager.slow_query_explain = True
+
+        with self.assertLogs("libs.database_manager", level="WARNING") as logs:
+            self.db_manager.select_one("SELECT 1 WHERE %s = %s", ("login", "secret"), explain=False)
+
+        self.assertFalse(any("secret" in line for line in logs.output))
+        self.assertEqual(mock_cur.execute.call_count, 1)
+
+    @patch("libs.database_manager.ConnectionPool")
+    def test_slow_write_is_not_explained(self, mock_pool_class):
+        """Test that slow statements written in a transaction are recorded, but not executed again to be explained."""
+        mock_pool, mock_cur = self._mock_pool(mock_pool_class)
+        mock_cur.description = None
+        mock_cur.rowcount = 1
+        self.db_manager.slow_query_threshold_milliseconds = 0
+        self.db_manager.slow_query_explain = True
+
+        self.db_manager.execute_all([("INSERT INTO rows (uuid) VALUES (%s)", ["row-1"])])
+
+        self.assertEqual([call.args[0] for call in mock_cur.execute.call_args_list], ["INSERT INTO rows (uuid) VALUES (%s)"])
+        self.assertEqual(self.db_manager.statement_statistics.top()[0]["slowCalls"], 1)
+
+    def test_import_groups_resolve_metadata_by_column(self):
+        """Test that imported rows are grouped by columns, with system names resolved into system ids."""
+        groups = DatabaseManager._get_import_groups([
+            {"uuid_metadata": "Grids", "griduuid_metadata": "Grids", "enabled": True, "revision": 1},
+            {"uuid": "00000000-0000-0000-0000-000000000001", "griduuid_metadata": "Grids", "enabled": True, "revision": 2},
+            {"uuid_metadata": "Columns", "griduuid_metadata": "Grids", "enabled": False, "revision": 1},
+        ])
+        self.assertEqual(groups, {
+            ("uuid", "griduuid", "enabled", "revision"): [
+                (SystemIds.Grids, SystemIds.Grids, True, 1),
+                (SystemIds.Columns, SystemIds.Grids, False, 1),
+                ("00000000-0000-0000-0000-000000000001", SystemIds.Grids, True, 2)
+            ]
+        })
+
+    @patch("libs.utils.export_file.open", new_callable=mock_open,
+           read_data='{"texts": [{"uuid": "00000000-0000-0000-0000-000000000001", "partition": 0, "text0": "a"}]}')
+    def test_import_database_copies_into_staging_table(self, mock_file):
+        """Test that rows are copied into a staging table and merged with a single statement."""
+        self.db_manager.conn = MagicMock()
+        mock_cur = MagicMock()
+        self.db_manager.conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_copy = mock_cur.copy.return_value.__enter__.return_value
+
+        self.db_manager.import_database("export.json")
+
+        mock_cur.copy.assert_called_once_with("COPY import_staging (uuid, partition, text0) FROM STDIN")
+        mock_copy.write_row.assert_called_once_with(("00000000-0000-0000-0000-000000000001", 0, "a"))
+        execute_calls = [args[0][0] for args in mock_cur.execute.call_args_list]
+        merges = [statement for statement in execute_calls if "INSERT INTO texts" in statement]
+        self.assertEqual(len(merges), 1)
+        self.assertIn("ON CONFLICT (uuid, partition)", merges[0])
+        self.assertIn("DO UPDATE SET text0 = EXCLUDED.text0", merges[0])
+        self.db_manager.conn.transaction.assert_called_once()
+
+    def _mock_export(self):
+        self.db_manager.conn = MagicMock()
+        mock_cur = MagicMock()
+        self.db_manager.conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_cur.description = [("uuid",), ("griduuid",), ("enabled",), ("revision",)]
+        rowUuid = UUID("00000000-0000-0000-0000-000000000001")
+        mock_cur.fetchmany.side_effect = [[(rowUuid, UUID(SystemIds.Grids), True, 1), (UUID(SystemIds.Columns), UUID(SystemIds.Grids), True, None)], []] + [[]] * 4
+        return mock_cur
+
+    def test_export_database_streams_json(self):
+        """Test that tables are read through named cursors and written as one JSON document."""
+        mock_cur = self._mock_export()
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "export.json")
+            self.db_manager.export_database(file_name)
+            with open(file_name) as f:
+                text = f.read()
+        exported = json.loads(text)
+
+        self.assertEqual(text, json.dumps(exported, indent=4)) # laid out as a document dumped with an indent of 4
+        self.assertEqual(list(exported.keys()), DatabaseManager.ExportTables)
+        self.assertEqual(exported["rows"], [
+            {"uuid": "00000000-0000-0000-0000-000000000001", "griduuid_metadata": "Grids", "enabled": True, "revision": 1},
+            {"uuid_metadata": "Columns", "griduuid_metadata": "Grids", "enabled": True}
+        ])
+        self.assertEqual(exported["booleans"], [])
+        self.db_manager.conn.cursor.assert_any_call(name="clairgrid_export_rows")
+        mock_cur.fetchall.assert_not_called()
+
+    def test_export_database_ndjson_gzip_round_trip(self):
+        """Test that a compressed NDJSON export is imported back."""
+        self._mock_export()
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "export.ndjson.gz")
+            self.db_manager.export_database(file_name)
+            with gzip.open(file_name, 'rt') as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+            self.db_manager.conn = MagicMock()
+            mock_cur = MagicMock()
+            self.db_manager.conn.cursor.return_value.__enter__.return_value = mock_cur
+            mock_copy = mock_cur.copy.return_value.__enter__.return_value
+            self.db_manager.import_database(file_name)
+
+        self.assertEqual(mock_copy.write_row.call_args_list, [
+            call(("00000000-0000-0000-0000-000000000001", SystemIds.Grids, True, 1)),
+            call((SystemIds.Columns, SystemIds.Grids, True))
+        ])
+
+    @patch("libs.database_manager.psycopg.connect")
+    def test_export_database_parallel_concatenates_parts(self, mock_psycopg_connect):
+        """Test that tables exported over separate connections, from the same snapshot, make one compressed document."""
+        self.db_manager.conn = MagicMock()
+        self.db_manager.conn.cursor.return_value.__enter__.return_value.fetchone.return_value = ("00000003-1",)
+        mock_conn = mock_psycopg_connect.return_value.__enter__.return_value
+        mock_cur = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cur.description = [("uuid",), ("partition",)]
+        mock_cur.fetchmany.side_effect = lambda size: [] if mock_cur.fetchmany.call_count % 2 == 0 else [(UUID(SystemIds.Grids), 0)]
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "export.json.gz")
+            self.db_manager.export_database(file_name, parallel=True)
+            with gzip.open(file_name, 'rt') as f:
+                exported = json.load(f)
+            self.assertEqual(os.listdir(directory), ["export.json.gz"])
+
+        self.assertEqual(list(exported.keys()), DatabaseManager.ExportTables)
+        mock_conn.execute.assert_any_call("SET TRANSACTION SNAPSHOT '00000003-1'")
+
+    def _mock_seed(self, directory, recorded):
+        file_name = os.path.join(directory, "seed_data.yml")
+        with open(file_name, 'w') as f:
+            f.write('{"rows": []}')
+        self.db_manager.conn = MagicMock()
+        mock_cur = MagicMock()
+        self.db_manager.conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_cur.fetchone.return_value = recorded
+        return file_name, mock_cur
+
+    @patch("libs.database_manager.DatabaseManager._get_latest_migration_sequence", return_value=200)
+    @patch("libs.database_manager.DatabaseManager.import_database")
+    def test_seed_database_skips_unchanged_seed(self, mock_import, mock_sequence):
+        """Test that a seed file already imported since the latest migration is not imported again."""
+        with tempfile.TemporaryDirectory() as directory:
+            fileHash = hashlib.sha256(b'{"rows": []}').hexdigest()
+            file_name, mock_cur = self._mock_seed(directory, (fileHash, 200))
+            self.db_manager.seed_database(file_name)
+        mock_import.assert_not_called()
+
+    @patch("libs.database_manager.DatabaseManager._get_latest_migration_sequence", return_value=200)
+    @patch("libs.database_manager.DatabaseManager.import_database")
+    def test_seed_database_imports_changed_seed(self, mock_import, mock_sequence):
+        """Test that a seed file is imported and recorded when changed or seeded before the latest migration."""
+        fileHash = hashlib.sha256(b'{"rows": []}').hexdigest()
+        for recorded in [None, ("changed", 200), (fileHash, 190)]:
+            mock_import.reset_mock()
+            with tempfile.TemporaryDirectory() as directory:
+                file_name, mock_cur = self._mock_seed(directory, recorded)
+                self.db_manager.seed_database(file_name)
+            mock_import.assert_called_once_with(file_name)
+            self.assertEqual(mock_cur.execute.call_args[0][1], (file_name, fileHash, 200))
+
+    @patch("libs.database_manager.psycopg.connect")
+    def test_listen_calls_back_with_notifications(self, mock_connect):
+        """Test that notifications are passed to the callback, and None once the connection is opened again."""
+        payloads = []
+        conn = mock_connect.return_value.__enter__.return_value
+        def notifies(timeout):
+            if len(payloads) >= 3: self.db_manager._listenStop.set()
+            yield MagicMock(payload="changes")
+        conn.notifies.side_effect = notifies
+        conn.execute.side_effect = [psycopg.OperationalError("connection lost"), None]
+        self.db_manager.listen_reconnect_milliseconds = 1
+        self.db_manager._listen("grid_changes", payloads.append)
+        self.assertEqual(payloads[0], None)
+        self.assertEqual(payloads[1:], ["changes"] * (len(payloads) - 1))
+
+    def test_close_pool(self):
+        """Test that closing the manager closes the connection pool."""
+        mock_pool = MagicMock()
+        self.db_manager.pool = mock_pool
+        self.db_manager.conn = None
+
+        self.db_manager.close()
+
+        mock_pool.close.assert_called_once()
+        self.assertIsNone(self.db_manager.pool)
@@ -0,0 +1,31 @@
+import gzip
+import os
+import tempfile
+import unittest
+from libs.utils.export_file import compress, get_compression, get_format, open_export_file
+
+class TestExportFile(unittest.TestCase):
+
+    def test_format_and_compression_from_file_name(self):
+        self.assertEqual(get_format("export.json"), "json")
+        self.assertEqual(get_format("export.ndjson.zst"), "ndjson")
+        self.assertEqual(get_compression("export.ndjson.gz"), "gzip")
+        self.assertEqual(get_compression("export.json.zst"), "zstd")
+        self.assertIsNone(get_compression("export.json"))
+
+    def test_concatenated_gzip_members_are_read_as_one(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "export.json.gz")
+            with open(file_name, 'wb') as f:
+                f.write(compress("{\n", "gzip"))
+                f.write(gzip.compress(b'    "rows": []'))
+                f.write(compress("\n}\n", "gzip"))
+            with open_export_file(file_name, 'r', "gzip") as f:
+                self.assertEqual(f.read(), '{\n    "rows": []\n}\n')
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            compress("{}", "lz4")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from types import SimpleNamespace
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager.grid_cache import GridCache
+from libs.grid_manager._get_window import _get_window
+
+class TestGetWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid.columns.append(Column("col-2", 1, 1, order = "1", name = "Count", typeUuid = SystemIds.IntColumnType, columnIndex = 0))
+        self.rows = {f"row-{i}": Row(self.grid, f"row-{i}", values = [f"name {i}", 10 - i if i != 3 else None]) for i in range(10)}
+        self.cache = GridCache(10 * 1024 * 1024)
+        self.cache.put_grid(self.grid)
+        self.cache.put_rows(self.grid.uuid, self.rows)
+        self.manager = SimpleNamespace(grid_cache = self.cache)
+
+    def _get_all(self, limit, sortColumnUuid = None):
+        uuids, cursor = [], None
+        while True:
+            window, cursor = _get_window(self.manager, self.grid, self.rows, limit, cursor, sortColumnUuid)
+            uuids += [row.uuid for row in window]
+            if not cursor: return uuids
+
+    def test_windows_cover_all_rows(self):
+        """Test that following cursors returns every row once, in order."""
+        self.assertEqual(self._get_all(3), sorted(self.rows.keys()))
+
+    def test_sort_column(self):
+        """Test that rows are sorted by the sort column, rows without value last."""
+        uuids = self._get_all(4, "col-2")
+        self.assertEqual(uuids[0], "row-9")
+        self.assertEqual(uuids[-1], "row-3")
+
+    def test_last_window_has_no_cursor(self):
+        """Test that no cursor is returned once all rows are returned."""
+        window, cursor = _get_window(self.manager, self.grid, self.rows, 10)
+        self.assertEqual(len(window), 10)
+        self.assertIsNone(cursor)
+
+    def test_index_is_invalidated(self):
+        """Test that sorted rows are kept until rows of the grid change."""
+        _get_window(self.manager, self.grid, self.rows, 2, None, "col-2")
+        self.assertIsNotNone(self.cache.get_sorted_index(self.grid.uuid, "col-2"))
+        self.cache.invalidate_sorted_indexes(self.grid.uuid)
+        self.assertIsNone(self.cache.get_sorted_index(self.grid.uuid, "col-2"))
+
+    def test_invalid_cursor(self):
+        """Test that an invalid cursor or sort column is rejected."""
+        with self.assertRaises(ValueError):
+            _get_window(self.manager, self.grid, self.rows, 2, "not a cursor")
+        with self.assertRaises(ValueError):
+            _get_window(self.manager, self.grid, self.rows, 2, None, "unknown-column")
+        _, cursor = _get_window(self.manager, self.grid, self.rows, 2)
+        with self.assertRaises(ValueError):
+            _get_window(self.manager, self.grid, self.rows, 2, cursor, "col-2")
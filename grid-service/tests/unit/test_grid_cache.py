@@ -0,0 +1,84 @@
+import threading
+import unittest
+from unittest.mock import patch
+from libs.metadata import SystemIds
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager.grid_cache import GridCache
+
+class TestGridCache(unittest.TestCase):
+
+    def _put(self, cache, gridUuid, numberOfRows = 10):
+        grid = Grid(gridUuid, name = gridUuid)
+        cache.put_grid(grid)
+        cache.put_rows(gridUuid, {f"{gridUuid}-{i}": Row(grid, f"{gridUuid}-{i}", values = [f"value {i}"]) for i in range(numberOfRows)})
+        return grid
+
+    def test_hits_and_misses(self):
+        """Test that lookups are counted."""
+        cache = GridCache(10 * 1024 * 1024)
+        grid = self._put(cache, "a")
+        self.assertIs(cache.get_grid("a"), grid)
+        self.assertIsNone(cache.get_grid("b"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["rows"]), (1, 1, 10))
+
+    def test_least_recently_used_grid_is_evicted(self):
+        """Test that the least recently used grid is evicted when the budget is exceeded."""
+        cache = GridCache(10 * 1024 * 1024)
+        self._put(cache, "a", 100)
+        self._put(cache, "b", 100)
+        cache.get_grid("a")
+        cache.memoryBudget = cache.size - 1
+        self._put(cache, "c", 10)
+        self.assertIsNotNone(cache.get_grid("a"))
+        self.assertIsNone(cache.get_grid("b"))
+        self.assertIsNotNone(cache.get_grid("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_system_grids_are_pinned(self):
+        """Test that system grids are never evicted."""
+        cache = GridCache(0)
+        self._put(cache, SystemIds.Grids)
+        self._put(cache, "a")
+        self._put(cache, "b")
+        self.assertIsNotNone(cache.get_grid(SystemIds.Grids))
+        self.assertIsNone(cache.get_grid("a"))
+        self.assertIsNotNone(cache.get_grid("b"))
+
+    def test_size_is_tracked(self):
+        """Test that the estimated size follows rows being added and grids being removed."""
+        cache = GridCache(10 * 1024 * 1024)
+        grid = self._put(cache, "a")
+        size = cache.size
+        cache.add_row("a", Row(grid, "new", values = ["new value"]))
+        self.assertGreater(cache.size, size)
+        self.assertIn("new", cache.get_rows("a"))
+        cache.remove("a")
+        self.assertEqual(cache.size, 0)
+
+    def test_locks_are_kept_while_in_use(self):
+        """Test that locks of grids are kept while held or waited for only, and stay exclusive meanwhile."""
+        cache = GridCache(10 * 1024 * 1024)
+        acquired = []
+        with cache.lock("a").write():
+            thread = threading.Thread(target = lambda: acquired.append(cache.lock("a").acquire_write(blocking = False)))
+            thread.start()
+            thread.join()
+            self.assertEqual(acquired, [False])
+            with cache.lock("a").read(): # the writer can read
+                self.assertIn("a", cache._gridLocks)
+        self.assertEqual(cache._gridLocks, {})
+        with cache.load_lock("a"):
+            self.assertIn("a", cache._loadLocks)
+        self.assertEqual(cache._loadLocks, {})
+
+    def test_accesses_are_capped(self):
+        """Test that the grids accessed the least are forgotten once too many grids are counted."""
+        cache = GridCache(10 * 1024 * 1024)
+        with patch("libs.grid_manager.grid_cache.ACCESSES_MAX_GRIDS", 10):
+            for _ in range(3): cache.get("hot")
+            for index in range(10): cache.get(f"grid-{index}")
+        accesses = cache.get_accesses()
+        self.assertLessEqual(len(accesses), 10)
+        self.assertEqual(accesses["hot"], 3)
@@ -0,0 +1,128 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager import GridManager
+from libs.grid_manager.grid_snapshot import GridSnapshot
+
+class TestGridSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.directory.name, "snapshot.bin")
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.rows = {uuid: Row(self.grid, uuid, revision = 1, values = [f"name {uuid}"]) for uuid in ("row-1", "row-2")}
+        self.stamps = {"grid-uuid": (2, 2), SystemIds.Grids: (10, 10), SystemIds.Columns: (20, 20)}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, records):
+        snapshot = GridSnapshot(self.fileName)
+        snapshot.write(records)
+        snapshot = GridSnapshot(self.fileName)
+        self.assertTrue(snapshot.open())
+        return snapshot
+
+    def test_round_trip(self):
+        """Test that grids are read back lazily, once, with their stamps."""
+        snapshot = self._write([("grid-uuid", self.stamps, pickle.dumps((self.grid, self.rows)))])
+        self.assertIn("grid-uuid", snapshot)
+        self.assertEqual(snapshot.get_stamps("grid-uuid"), self.stamps)
+        grid, rows = snapshot.read("grid-uuid")
+        self.assertEqual(grid.name, "Grid")
+        self.assertEqual([row.to_json() for row in rows.values()], [row.to_json() for row in self.rows.values()])
+        self.assertEqual(snapshot.read("grid-uuid"), (None, None))
+        snapshot.close()
+
+    def test_unread_grids_are_kept(self):
+        """Test that grids of the previous snapshot not read yet are written again."""
+        snapshot = self._write([("grid-1", {}, b"one"), ("grid-2", {}, b"two")])
+        snapshot.discard("grid-1")
+        snapshot.write([("grid-3", {}, b"three")])
+        snapshot.close()
+        snapshot = GridSnapshot(self.fileName)
+        self.assertTrue(snapshot.open())
+        self.assertNotIn("grid-1", snapshot)
+        self.assertIn("grid-2", snapshot)
+        self.assertIn("grid-3", snapshot)
+        snapshot.close()
+
+    def test_missing_or_invalid_file(self):
+        self.assertFalse(GridSnapshot(self.fileName).open())
+        with open(self.fileName, 'wb') as f:
+            f.write(b"garbage")
+        self.assertFalse(GridSnapshot(self.fileName).open())
+
+class TestLoadSnapshot(unittest.TestCase):
+
+    @patch("libs.base_manager.BaseManager._read_password_file", return_value = "secret")
+    def setUp(self, mock_read_pwd):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_manager = MagicMock()
+        self.db_manager.db_name = "test_db"
+        self.grid_manager = GridManager(self.db_manager)
+        self.grid_manager.grid_snapshot = GridSnapshot(os.path.join(self.directory.name, "snapshot.bin"))
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        for gridUuid, stamp in ((SystemIds.Grids, 5), (SystemIds.Columns, 0)):
+            self.grid_manager.grid_cache.put_grid(Grid(gridUuid, name = gridUuid))
+            self.grid_manager.grid_cache.put_rows(gridUuid, {})
+            self.grid_manager.grid_cache.put_validation(gridUuid, stamp)
+        self.grid_manager.grid_cache.put_grid(self.grid)
+        self.grid_manager.grid_cache.put_rows("grid-uuid", {"row-1": Row(self.grid, "row-1", revision = 3, values = ["name"])})
+        self.grid_manager.grid_cache.put_validation("grid-uuid", 3)
+        self.db_manager.select_all.return_value = [("grid-uuid", 3), (SystemIds.Grids, 5)]
+
+    def _write_snapshot(self):
+        self.grid_manager.write_snapshot()
+        self.grid_manager.grid_cache.remove("grid-uuid")
+        self.grid_manager.grid_snapshot.open()
+
+    def tearDown(self):
+        self.grid_manager.grid_snapshot.close()
+        self.directory.cleanup()
+
+    def test_unchanged_grid_is_restored(self):
+        """Test that a grid whose rows did not change is put in memory from the snapshot."""
+        self._write_snapshot()
+        grid, rows = self.grid_manager._load_snapshot("grid-uuid")
+        self.assertEqual(grid.name, "Grid")
+        self.assertEqual(list(rows.keys()), ["row-1"])
+        self.assertIsNotNone(self.grid_manager.grid_cache.get_rows("grid-uuid"))
+
+    def test_stale_grid_is_discarded(self):
+        """Test that a grid whose rows changed since the snapshot is left to be loaded from the database."""
+        self._write_snapshot()
+        self.db_manager.select_all.return_value = [("grid-uuid", 4), (SystemIds.Grids, 5)]
+        self.assertEqual(self.grid_manager._load_snapshot("grid-uuid"), (None, None))
+        self.assertNotIn("grid-uuid", self.grid_manager.grid_snapshot)
+        self.assertIsNone(self.grid_manager.grid_cache.get_rows("grid-uuid"))
+
+    def test_grid_changed_in_the_database_is_stamped_as_validated(self):
+        """Test that rows are stamped as validated in memory, not as in the database when the snapshot is written."""
+        self.db_manager.select_all.return_value = [("grid-uuid", 4), (SystemIds.Grids, 5)] # changed by another instance
+        self._write_snapshot()
+        self.assertEqual(self.grid_manager.grid_snapshot.get_stamps("grid-uuid")["grid-uuid"], 3)
+        self.assertEqual(self.grid_manager._load_snapshot("grid-uuid"), (None, None))
+
+    def test_grid_not_validated_or_being_written_is_not_written(self):
+        """Test that grids whose rows are not validated, or ahead of the database, are left out of the snapshot."""
+        self.grid_manager.change_writer._unwrittenGrids["grid-uuid"] = 1
+        self._write_snapshot()
+        self.assertNotIn("grid-uuid", self.grid_manager.grid_snapshot)
+        self.grid_manager.change_writer._unwrittenGrids.clear()
+        self.grid_manager.grid_snapshot.close()
+        self.grid_manager.grid_cache.put_grid(self.grid)
+        self.grid_manager.grid_cache.put_rows("grid-uuid", {})
+        self._write_snapshot()
+        self.assertNotIn("grid-uuid", self.grid_manager.grid_snapshot)
+
+if __name__ == '__main__':
+    unittest.main()
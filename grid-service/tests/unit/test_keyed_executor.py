@@ -0,0 +1,32 @@
+import threading
+import time
+import unittest
+from libs.utils.keyed_executor import KeyedExecutor
+
+class TestKeyedExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = KeyedExecutor(4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_same_key_runs_in_order(self):
+        """Test that tasks sharing a key are executed sequentially in submission order."""
+        results = []
+        def task(i):
+            time.sleep(0.001 * (10 - i))
+            results.append(i)
+        for i in range(10):
+            self.executor.submit("grid", task, i)
+        self.executor.shutdown()
+        self.assertEqual(results, list(range(10)))
+
+    def test_different_keys_run_concurrently(self):
+        """Test that a blocked task does not hold back tasks of other keys."""
+        release = threading.Event()
+        done = threading.Event()
+        self.executor.submit("slow", release.wait, 5)
+        self.executor.submit("fast", done.set)
+        self.assertTrue(done.wait(2))
+        release.set()
@@ -0,0 +1,60 @@
+import unittest
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+
+class TestLoadPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.referenceGrid = Grid("ref-grid-uuid", name = "Reference")
+        self.referenceGrid.columns.append(Column("ref-col-uuid", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0))
+        self.grid.columns.append(Column("col-2", 1, 1, order = "1", name = "Ref", typeUuid = SystemIds.ReferenceColumnType,
+                                        referenceGridUuid = "ref-grid-uuid", referenceGrid = self.referenceGrid, columnIndex = 1))
+
+    def test_statement_is_parameterized(self):
+        """Test that grid uuids are passed as bind variables, not inlined in the statement."""
+        plan = self.grid.get_load_plan()
+        self.assertNotIn("grid-uuid", plan.statement)
+        self.assertNotIn("Reference", plan.statement)
+        self.assertEqual(plan.params, {"gridUuid": "grid-uuid"})
+
+    def test_references_are_loaded_apart(self):
+        """Test that references are not aggregated in the row statement but loaded by partition of relationships."""
+        plan = self.grid.get_load_plan()
+        self.assertNotIn("GROUP BY", plan.statement)
+        self.assertNotIn("relationships", plan.statement)
+        self.assertEqual(plan.positions, [2, None])
+        self.assertEqual(len(plan.referenceStatements), 1)
+        statement, columns = plan.referenceStatements[0]
+        self.assertIn("relationships.toUuid1", statement)
+        self.assertIn("ANY(%(rowUuids)s::uuid[])", statement)
+        self.assertEqual([column.uuid for column in columns], ["col-2"])
+
+    def test_display_plan(self):
+        """Test that the display plan selects the display columns of a batch of rows."""
+        plan = self.referenceGrid.get_display_plan()
+        self.assertIn("texts_0.text0", plan.statement)
+        self.assertIn("rows.uuid = ANY(%(rowUuids)s::uuid[])", plan.statement)
+        self.assertNotIn("ref-grid-uuid", plan.statement)
+
+    def test_plan_is_reused(self):
+        """Test that the plan is compiled once while the columns do not change."""
+        self.assertIs(self.grid.get_load_plan(), self.grid.get_load_plan())
+
+    def test_plan_is_invalidated_when_columns_change(self):
+        """Test that adding a column compiles a new plan."""
+        plan = self.grid.get_load_plan()
+        self.grid.columns.append(Column("col-3", 2, 3, order = "2", name = "Count", typeUuid = SystemIds.IntColumnType, columnIndex = 0))
+        newPlan = self.grid.get_load_plan()
+        self.assertIsNot(plan, newPlan)
+        self.assertIn("ints_0.int0", newPlan.statement)
+
+    def test_same_shape_shares_statement(self):
+        """Test that grids with the same shape share the statement text, hence the prepared plan."""
+        otherGrid = Grid("other-grid-uuid", name = "Other")
+        otherGrid.columns.append(Column("col-9", 0, 0, order = "0", name = "Title", typeUuid = SystemIds.TextColumnType, columnIndex = 0))
+        otherGrid.columns.append(Column("col-8", 1, 1, order = "1", name = "Link", typeUuid = SystemIds.ReferenceColumnType,
+                                        referenceGridUuid = "ref-grid-uuid", referenceGrid = self.referenceGrid, columnIndex = 1))
+        self.assertEqual(otherGrid.get_load_plan().statement, self.grid.get_load_plan().statement)
@@ -0,0 +1,60 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager.grid_cache import GridCache
+from libs.grid_manager._load_references import _load_references
+from libs.grid_manager._load_rows import _iter_rows
+
+class TestLoadReferences(unittest.TestCase):
+
+    def setUp(self):
+        self.referenceGrid = Grid("ref-grid-uuid", name = "Reference")
+        self.referenceGrid.columns.append(Column("ref-col-uuid", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0))
+        self.grid.columns.append(Column("col-2", 1, 1, order = "1", name = "Ref", typeUuid = SystemIds.ReferenceColumnType,
+                                        referenceGridUuid = "ref-grid-uuid", referenceGrid = self.referenceGrid, columnIndex = 1))
+        self.cache = GridCache(10 * 1024 * 1024)
+        self.cache.put_grid(self.referenceGrid)
+        self.db_manager = MagicMock()
+        self.manager = SimpleNamespace(db_manager = self.db_manager, grid_cache = self.cache)
+
+    def _select_all(self, statement, params = None, prepare = None):
+        if "Load references" in statement:
+            return iter([("row-1", "ref-1"), ("row-1", "ref-2"), ("row-2", "ref-1"), ("row-2", "ref-disabled")])
+        return iter([(rowUuid, f"name {rowUuid}") for rowUuid in params["rowUuids"] if rowUuid != "ref-disabled"])
+
+    def test_references_are_resolved_once(self):
+        """Test that relationships and display values are loaded by batch, not per row."""
+        self.db_manager.select_all.side_effect = self._select_all
+        rows = {uuid: Row(self.grid, uuid, values = [uuid, []]) for uuid in ("row-1", "row-2")}
+        _load_references(self.manager, self.grid, self.grid.get_load_plan(), rows)
+        self.assertEqual(self.db_manager.select_all.call_count, 2)
+        self.assertEqual(rows["row-1"].to_json()["values"][1], [{"uuid": "ref-1", "displayString": "name ref-1"}, {"uuid": "ref-2", "displayString": "name ref-2"}])
+        self.assertEqual(rows["row-2"].to_json()["values"][1], [{"uuid": "ref-1", "displayString": "name ref-1"}])
+        self.assertIs(rows["row-1"].values[1][0], rows["row-2"].values[1][0])
+
+    def test_display_values_are_cached(self):
+        """Test that display values of referenced rows are kept for later loads."""
+        self.db_manager.select_all.side_effect = self._select_all
+        rows = {"row-1": Row(self.grid, "row-1", values = ["row-1", []])}
+        _load_references(self.manager, self.grid, self.grid.get_load_plan(), rows)
+        rows = {"row-1": Row(self.grid, "row-1", values = ["row-1", []])}
+        _load_references(self.manager, self.grid, self.grid.get_load_plan(), rows)
+        self.assertEqual(self.db_manager.select_all.call_count, 3)
+
+    def test_rows_are_streamed_by_chunks(self):
+        """Test that in streaming mode rows come from a server-side cursor, by chunks with their references."""
+        self.db_manager.streaming = True
+        self.db_manager.streaming_itersize = 2
+        self.db_manager.select_stream.return_value = iter([(f"row-{i}", 1, f"name {i}") for i in range(5)])
+        self.db_manager.select_all.side_effect = self._select_all
+        self.manager._load_references = lambda grid, plan, rows, referenceRows = None: _load_references(self.manager, grid, plan, rows, referenceRows)
+        chunks = list(_iter_rows(self.manager, self.grid))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0]["row-1"].to_json()["values"][1], [{"uuid": "ref-1", "displayString": "name ref-1"}, {"uuid": "ref-2", "displayString": "name ref-2"}])
+        self.db_manager.select_stream.assert_called_once()
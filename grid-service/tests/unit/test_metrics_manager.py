@@ -0,0 +1,35 @@
+import unittest
+import datetime
+from unittest.mock import MagicMock, patch
+import jwt
+from libs.metrics import MetricsManager
+from libs.utils.statement_statistics import StatementStatistics
+
+class TestMetricsManager(unittest.TestCase):
+
+    @patch("libs.base_manager.BaseManager._read_password_file")
+    def setUp(self, mock_read_pwd):
+        mock_read_pwd.return_value = "secret"
+        self.mock_db_manager = MagicMock()
+        self.mock_db_manager.db_name = "test_db"
+        self.mock_db_manager.root_user_name = "root"
+        self.mock_db_manager.statement_statistics = StatementStatistics()
+        self.manager = MetricsManager(self.mock_db_manager)
+
+    def _token(self, login_id):
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+        return jwt.encode({"loginId": login_id, "expires": expires.isoformat()}, "secret", algorithm="HS512")
+
+    def test_top_statements(self):
+        """Test that statements are returned by total time, to the root user only."""
+        self.mock_db_manager.statement_statistics.record("SELECT 1", 0.1, 1, 8)
+        self.mock_db_manager.statement_statistics.record("SELECT 'a'", 0.5, 1, 8)
+        self.mock_db_manager.statement_statistics.record("SELECT * FROM rows", 0.2, 1, 8)
+
+        reply = self.manager.handle_top_statements({"jwt": self._token("root"), "limit": 2})
+        self.assertEqual(reply["status"], "success")
+        self.assertEqual([item["statement"] for item in reply["dataSet"]["statements"]], ["SELECT ?", "SELECT * FROM rows"])
+        self.assertEqual(reply["dataSet"]["statements"][0]["calls"], 2)
+
+        reply = self.manager.handle_top_statements({"jwt": self._token("someone")})
+        self.assertEqual(reply["status"], "failed")
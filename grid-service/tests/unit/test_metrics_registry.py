@@ -0,0 +1,63 @@
+import unittest
+import urllib.request
+from libs.metrics.prometheus_exporter import start_metrics_server
+from libs.utils.decorators import instrument
+from libs.utils.metrics_registry import Histogram, MetricsRegistry, metrics
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_quantiles(self):
+        """Test that quantiles are interpolated within buckets."""
+        histogram = Histogram()
+        for _ in range(99): histogram.observe(0.002)
+        histogram.observe(20)
+        self.assertTrue(0.001 <= histogram.quantile(0.5) <= 0.0025)
+        self.assertTrue(0.001 <= histogram.quantile(0.95) <= 0.0025)
+        self.assertEqual(histogram.quantile(1.0), 30.0)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_prometheus_format(self):
+        """Test that series and gauges are exposed in the Prometheus text format."""
+        registry = MetricsRegistry()
+        registry.observe("command", {"command": "load", "db": "db1"}, 0.003)
+        registry.observe("command", {"command": "load", "db": "db1"}, 0.2, error = True)
+        registry.add_collector("grid_cache", {"db": "db1"}, lambda: {"hits": 3, "name": "ignored"})
+        text = registry.to_prometheus()
+        self.assertIn('clairgrid_command_seconds_bucket{command="load",db="db1",le="+Inf"} 2', text)
+        self.assertIn('clairgrid_command_seconds_count{command="load",db="db1"} 2', text)
+        self.assertIn('clairgrid_command_errors_total{command="load",db="db1"} 1', text)
+        self.assertIn('clairgrid_grid_cache_hits{db="db1"} 3', text)
+        self.assertNotIn("ignored", text)
+
+    def test_instrument(self):
+        """Test that instrumented functions and generators are counted by handler and database, with their errors."""
+        class Manager:
+            db_name = "db2"
+            @instrument
+            def handle(self, fail):
+                if fail: raise ValueError("failed")
+                return {"status": "success"}
+            @instrument
+            def rows(self):
+                yield 1
+                yield 2
+        metrics.reset()
+        manager = Manager()
+        manager.handle(False)
+        with self.assertRaises(ValueError):
+            manager.handle(True)
+        self.assertEqual(list(manager.rows()), [1, 2])
+        series = {item["labels"]["handler"]: item for item in metrics.snapshot(db = "db2")}
+        self.assertEqual((series["handle"]["calls"], series["handle"]["errors"]), (2, 1))
+        self.assertEqual(series["rows"]["calls"], 1)
+
+    def test_metrics_server(self):
+        """Test that metrics are served over HTTP."""
+        metrics.observe("command", {"command": "load", "db": "db3"}, 0.01)
+        server = start_metrics_server(0)
+        self.assertEqual(server.server_address[0], "127.0.0.1") # loopback interface only by default
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                self.assertIn('command="load",db="db3"', response.read().decode())
+        finally:
+            server.shutdown()
@@ -0,0 +1,88 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager import GridManager
+
+class TestNotifications(unittest.TestCase):
+
+    @patch("libs.base_manager.BaseManager._read_password_file", return_value = "secret")
+    def setUp(self, mock_read_pwd):
+        self.db_manager = MagicMock()
+        self.db_manager.db_name = "test_db"
+        self.db_manager.select_all.side_effect = self._select_all
+        self.grid_manager = GridManager(self.db_manager)
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid_manager.grid_cache.put_grid(self.grid)
+        self.grid_manager.grid_cache.put_rows("grid-uuid", {
+            "row-1": Row(self.grid, "row-1", revision = 1, values = ["one"]),
+            "row-2": Row(self.grid, "row-2", revision = 2, values = ["two"])
+        })
+        self.grid_manager.grid_cache.put_validation("grid-uuid", 7)
+        self.database = {"row-1": (1, "one"), "row-2": (3, "deux")}
+        self.statements = []
+
+    def _select_all(self, statement, params, prepare = False):
+        self.statements.append(statement)
+        if "Revisions of rows" in statement:
+            return [(rowUuid, row[0]) for rowUuid, row in self.database.items()]
+        if "Load rows by uuid" in statement:
+            return [(rowUuid, *self.database[rowUuid]) for rowUuid in params["rowUuids"] if rowUuid in self.database]
+        return []
+
+    def _notify(self, rows, instance = "other-instance"):
+        self.grid_manager._on_notification(json.dumps({"instance": instance, "rows": rows}))
+
+    def test_rows_of_other_instances_are_patched(self):
+        """Test that only rows older in memory than the revision notified are loaded again."""
+        row1 = self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"]
+        self._notify([["grid-uuid", "row-1", 1], ["grid-uuid", "row-2", 3]])
+        rows = self.grid_manager.grid_cache.get_rows("grid-uuid")
+        self.assertIs(rows["row-1"], row1)
+        self.assertEqual(rows["row-2"].values, ["deux"])
+        self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[2], 7)
+
+    def test_rows_added_and_disabled_are_patched(self):
+        self.database["row-3"] = (1, "three")
+        del self.database["row-1"]
+        self._notify([["grid-uuid", "row-1", 2], ["grid-uuid", "row-3", 1]])
+        self.assertEqual(sorted(self.grid_manager.grid_cache.get_rows("grid-uuid").keys()), ["row-2", "row-3"])
+
+    def test_own_notifications_are_ignored(self):
+        self._notify([["grid-uuid", "row-2", 3]], instance = self.grid_manager.instance_uuid)
+        self.assertEqual(self.statements, [])
+        self.assertEqual(self.grid_manager.grid_cache.get_rows("grid-uuid")["row-2"].values, ["two"])
+
+    def test_missed_notifications_expire_validations(self):
+        self._notify([]) # nothing to patch
+        self.grid_manager._on_notification(None)
+        self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[3], 0)
+
+    def test_missed_notifications_drop_grids_not_validated(self):
+        """Test that grids in memory are dropped when notifications are missed and grids are not validated."""
+        self.grid_manager.validation_interval_milliseconds = 0
+        users = Grid(SystemIds.Users, name = "Users")
+        users.columns = self.grid.columns
+        self.grid_manager.grid_cache.put_grid(users)
+        self.grid_manager.grid_cache.put_rows(SystemIds.Users, {"row-1": Row(users, "row-1", revision = 1, values = ["one"])})
+        self.database = {"row-1": (2, "uno")}
+        self.grid_manager._on_notification(None)
+        self.assertIsNone(self.grid_manager.grid_cache.get_rows("grid-uuid"))
+        self.assertEqual(self.grid_manager.grid_cache.get_rows(SystemIds.Users)["row-1"].values, ["uno"])
+
+    def test_changed_columns_drop_grids(self):
+        """Test that grids are loaded again when columns are changed by another instance."""
+        columns = Grid(SystemIds.Columns, name = "Columns")
+        self.grid_manager.grid_cache.put_grid(columns)
+        self.grid_manager.grid_cache.put_rows(SystemIds.Columns, {"column-1": Row(columns, "column-1", revision = 1, values = [])})
+        self.database["column-1"] = (2,)
+        self._notify([[SystemIds.Columns, "column-1", 2]])
+        self.assertIsNone(self.grid_manager.grid_cache.get_grid("grid-uuid"))
+        self.assertIsNotNone(self.grid_manager.grid_cache.get_grid(SystemIds.Columns))
+
+if __name__ == '__main__':
+    unittest.main()
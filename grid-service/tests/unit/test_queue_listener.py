@@ -3,14 +3,16 @@ import json
 from unittest.mock import MagicMock, patch, ANY
 import pika
 from libs.queue_listener import QueueListener
+from libs.utils.metrics_registry import metrics
 
 class TestQueueListener(unittest.TestCase):
 
+    @patch("libs.queue_listener.MetricsManager")
     @patch("libs.queue_listener.GridManager")
     @patch("libs.queue_listener.AuthenticationManager")
     @patch("libs.queue_listener.os.getenv")
     @patch("libs.queue_listener.QueueListener._read_password_file")
-    def setUp(self, mock_read_pwd, mock_getenv, mock_auth_manager, mock_grid_manager):
+    def setUp(self, mock_read_pwd, mock_getenv, mock_auth_manager, mock_grid_manager, mock_metrics_manager):
         mock_getenv.side_effect = lambda key, default=None: {
             "RABBITMQ_HOST": "localhost",
             "RABBITMQ_PORT": "5672",
@@ -30,6 +32,14 @@ class TestQueueListener(unittest.TestCase):
         self.assertEqual(self.listener.rabbitmq_host, "localhost")
         self.assertEqual(self.listener.queue_name, "grid_service_test_db")
 
+    @patch("libs.queue_listener.os.getenv")
+    def test_reply_chunk_rows_at_least_one(self, mock_getenv):
+        """Test that replies are not chunked by less than one row."""
+        mock_getenv.side_effect = lambda key, default=None: "0" if key == "RABBITMQ_REPLY_CHUNK_ROWS" else default
+        with patch.object(QueueListener, "_read_password_file", return_value = "guest_pass"):
+            self.listener.load_configuration()
+        self.assertEqual(self.listener.reply_chunk_rows, 1)
+
     def test_on_request_success(self):
         """Test on_request handling a valid message."""
         # Setup mocks
@@ -139,3 +149,151 @@ class TestQueueListener(unittest.TestCase):
             on_message_callback=self.listener.on_request
         )
 
+
+    def test_on_request_not_an_object(self):
+        """Test that a JSON body which is not an object gets an error reply, inline or on the worker pool."""
+        for executor in (None, MagicMock()):
+            mock_ch = MagicMock()
+            mock_props = MagicMock()
+            mock_props.reply_to = "reply_queue"
+            mock_props.correlation_id = "123"
+            self.listener.executor = executor
+            self.listener.on_request(mock_ch, MagicMock(), mock_props, b'[1]')
+            if executor is not None: executor.submit.assert_not_called()
+            response = json.loads(mock_ch.basic_publish.call_args.kwargs['body'])
+            self.assertEqual(response['status'], 'error')
+            self.assertEqual(response['message'], "invalid request: request is not an object but list")
+            mock_ch.basic_ack.assert_called_once()
+
+    def test_on_request_reply_failure(self):
+        """Test that a request which reply can't be serialized gets an error reply, inline or on the worker pool."""
+        body = json.dumps({
+            "command": "heartbeat",
+            "requestInitiatedOn": "2025-12-10T10:00:00Z",
+            "requestUuid": "11",
+            "contextUuid": "1234567890",
+            "from": "test",
+            "dbName": "tests"
+        }).encode('utf-8')
+        self.listener.process_request = MagicMock(return_value={"status": "success", "value": object()})
+        self.listener.connection = MagicMock()
+        self.listener.connection.add_callback_threadsafe.side_effect = lambda callback: callback()
+        for executor in (None, MagicMock()):
+            mock_ch = MagicMock()
+            mock_props = MagicMock()
+            mock_props.reply_to = "reply_queue"
+            mock_props.correlation_id = "123"
+            self.listener.executor = executor
+            if executor is not None: executor.submit.side_effect = lambda key, fn, *args: fn(*args)
+            self.listener.on_request(mock_ch, MagicMock(), mock_props, body)
+            response = json.loads(mock_ch.basic_publish.call_args.kwargs['body'])
+            self.assertEqual(response['status'], 'error')
+            self.assertEqual(response['correlationId'], "123")
+            mock_ch.basic_ack.assert_called_once()
+
+    def test_get_request_key(self):
+        """Test that only changes are ordered, by grid."""
+        self.assertIsNone(self.listener._get_request_key({"command": "load", "gridUuid": "g1"}))
+        self.assertEqual(self.listener._get_request_key({"command": "change", "gridUuid": "g1"}), "g1")
+        self.assertEqual(self.listener._get_request_key({"command": "change", "changes": [{"gridUuid": "g2"}]}), "g2")
+        self.assertIsNone(self.listener._get_request_key({"command": "authentication"}))
+
+    def test_on_request_with_workers(self):
+        """Test that requests are processed on the worker pool and replies published on the connection thread."""
+        mock_ch = MagicMock()
+        mock_method = MagicMock()
+        mock_props = MagicMock()
+        mock_props.reply_to = "reply_queue"
+        mock_props.correlation_id = "123"
+        self.listener.connection = MagicMock()
+        self.listener.executor = MagicMock()
+        self.listener.executor.submit.side_effect = lambda key, fn, *args: fn(*args)
+
+        body = json.dumps({
+            "command": "heartbeat",
+            "requestInitiatedOn": "2025-12-10T10:00:00Z",
+            "requestUuid": "11",
+            "contextUuid": "1234567890",
+            "from": "test",
+            "dbName": "tests"
+        }).encode('utf-8')
+
+        self.listener.on_request(mock_ch, mock_method, mock_props, body)
+
+        self.listener.executor.submit.assert_called_once()
+        self.assertIsNone(self.listener.executor.submit.call_args[0][0])
+        mock_ch.basic_publish.assert_not_called()
+
+        # Run the callback as the connection thread would
+        callback = self.listener.connection.add_callback_threadsafe.call_args[0][0]
+        callback()
+        args, kwargs = mock_ch.basic_publish.call_args
+        self.assertEqual(json.loads(kwargs['body'])['status'], 'success')
+        mock_ch.basic_ack.assert_called_once_with(delivery_tag=mock_method.delivery_tag)
+
+    def test_is_chunked_reply_not_an_object(self):
+        """Test that a request which is not an object never gets a chunked reply."""
+        reply = {"status": "success", "dataSet": {"rows": []}}
+        self.assertTrue(self.listener._is_chunked_reply({"chunkedReply": True}, reply))
+        for request in (None, 1, [1], "chunkedReply"):
+            self.assertFalse(self.listener._is_chunked_reply(request, reply))
+
+    def test_on_request_chunked_reply(self):
+        """Test that a reply with rows is sent in parts when requested, the request being acknowledged with the last part."""
+        mock_ch = MagicMock()
+        mock_method = MagicMock()
+        mock_props = MagicMock()
+        mock_props.reply_to = "reply_queue"
+        mock_props.correlation_id = "123"
+        self.listener.reply_chunk_rows = 2
+        self.listener.grid_manager.handle_load.return_value = {
+            "status": "success",
+            "dataSet": {"gridUuid": "g1", "countRows": 5, "rows": [{"uuid": str(i)} for i in range(5)]}
+        }
+        self.listener._init_command_handlers()
+
+        body = json.dumps({
+            "command": "load",
+            "requestInitiatedOn": "2025-12-10T10:00:00Z",
+            "requestUuid": "11",
+            "contextUuid": "1234567890",
+            "from": "test",
+            "dbName": "tests",
+            "gridUuid": "g1",
+            "chunkedReply": True
+        }).encode('utf-8')
+
+        self.listener.on_request(mock_ch, mock_method, mock_props, body)
+
+        parts = [json.loads(call.kwargs['body']) for call in mock_ch.basic_publish.call_args_list]
+        self.assertEqual([part['replyPart'] for part in parts], ["header", "rows", "rows", "rows", "end"])
+        self.assertEqual([part['sequence'] for part in parts], [0, 1, 2, 3, 4])
+        self.assertTrue(all(part['correlationId'] == "123" for part in parts))
+        self.assertNotIn('rows', parts[0]['dataSet'])
+        self.assertEqual(parts[0]['countChunks'], 3)
+        self.assertEqual(sum(len(part['rows']) for part in parts[1:4]), 5)
+        mock_ch.basic_ack.assert_called_once_with(delivery_tag=mock_method.delivery_tag)
+
+    def test_command_metrics(self):
+        """Test that the processing time of commands and the wait in the queue are recorded."""
+        metrics.reset()
+        self.listener.process_request({"command": "heartbeat", "requestInitiatedOn": "2025-12-10T10:00:00.000Z"})
+        series = {item["name"]: item for item in metrics.snapshot(db = "TEST_DB")}
+        self.assertEqual(series["command"]["labels"], {"command": "heartbeat", "db": "TEST_DB"})
+        self.assertEqual(series["command"]["calls"], 1)
+        self.assertEqual(series["command"]["errors"], 0)
+        self.assertEqual(series["queue_wait"]["calls"], 1)
+
+    def test_warm_up_serializes_replies(self):
+        """Test that replies of warmed up grids are serialized, whole and in parts, before requests are consumed."""
+        self.listener.grid_manager.warm_up_iterations = 3
+        self.listener.grid_manager.warm_up_rows = 10
+        self.listener.reply_chunk_rows = 1
+        grid, row = MagicMock(), MagicMock()
+        grid.to_json.return_value = {"uuid": "grid-uuid"}
+        row.to_json.return_value = {"uuid": "row-uuid"}
+        with patch.object(self.listener, "_serialize_reply", wraps=self.listener._serialize_reply) as mock_serialize:
+            self.listener.warm_up([(grid, {"row-1": row, "row-2": row})])
+        self.assertEqual(mock_serialize.call_count, 3)
+        self.assertEqual(row.to_json.call_count, 6)
+        self.assertFalse(self.listener.ready.is_set())
@@ -0,0 +1,58 @@
+import threading
+import unittest
+from libs.utils.read_write_lock import ReadWriteLock
+
+class TestReadWriteLock(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = ReadWriteLock()
+
+    def _in_thread(self, target):
+        done = threading.Event()
+        def run():
+            target()
+            done.set()
+        threading.Thread(target=run, daemon=True).start()
+        return done
+
+    def test_readers_share_the_lock(self):
+        """Test that several threads can read at the same time."""
+        with self.lock.read():
+            self.assertTrue(self._in_thread(lambda: self.lock.read().__enter__()).wait(1))
+
+    def test_writer_excludes_readers(self):
+        """Test that readers wait for the writer to release the lock."""
+        with self.lock.write():
+            done = self._in_thread(lambda: self.lock.read().__enter__())
+            self.assertFalse(done.wait(0.1))
+        self.assertTrue(done.wait(1))
+
+    def test_writer_waits_for_readers(self):
+        """Test that a writer waits for readers to release the lock."""
+        with self.lock.read():
+            done = self._in_thread(lambda: self.lock.write().__enter__())
+            self.assertFalse(done.wait(0.1))
+        self.assertTrue(done.wait(1))
+
+    def test_writer_gives_up_after_timeout(self):
+        """Test that a writer waiting with a timeout gives up, and lets readers in again."""
+        with self.lock.read():
+            self.assertFalse(self._in_thread(lambda: self.assertFalse(self.lock.acquire_write(timeout = 0.05))).wait(0.01))
+            self.assertTrue(self._in_thread(lambda: self.lock.read().__enter__()).wait(1))
+        self.assertTrue(self.lock.acquire_write(timeout = 0.05))
+        self.lock.release_write()
+
+    def test_writer_can_read(self):
+        """Test that the writer can acquire the read lock, as when a change reloads its grid."""
+        with self.lock.write():
+            with self.lock.read():
+                with self.lock.write():
+                    pass
+        with self.lock.write():
+            pass
+
+    def test_upgrade_is_refused(self):
+        """Test that upgrading a read lock raises instead of deadlocking."""
+        with self.lock.read():
+            with self.assertRaises(RuntimeError):
+                self.lock.acquire_write()
@@ -0,0 +1,57 @@
+import unittest
+import uuid
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row, ReferenceRow
+
+class TestRow(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid.columns.append(Column("col-2", 1, 1, order = "1", name = "Count", typeUuid = SystemIds.IntColumnType, columnIndex = 1))
+        self.grid.columns.append(Column("col-3", 2, 2, order = "2", name = "Ref", typeUuid = SystemIds.ReferenceColumnType, columnIndex = 2))
+
+    def test_json_is_unchanged(self):
+        """Test that rows are converted to JSON as plain values, references with their display string."""
+        rowUuid = uuid.uuid4()
+        reference = ReferenceRow(None, uuid = "ref-1", values = ["Reference", 2])
+        row = Row(self.grid, rowUuid, revision = 3, values = ["name", 5, [reference]])
+        self.assertEqual(row.to_json(), {
+            "uuid": str(rowUuid),
+            "revision": 3,
+            "values": ["name", 5, [{"uuid": "ref-1", "displayString": "Reference | 2"}]],
+            "displayString": "name"
+        })
+        self.assertEqual(Row(self.grid, "row-2").to_json(), {"uuid": "row-2"})
+
+    def test_rows_are_compact(self):
+        """Test that rows have no attribute dictionary, keep uuids as bytes and share display indexes."""
+        rowUuid = uuid.uuid4()
+        row = Row(self.grid, str(rowUuid), values = ["".join(["na", "me"]), 5, []])
+        other = Row(self.grid, uuid.uuid4(), values = ["".join(["nam", "e"]), 6, []])
+        self.assertFalse(hasattr(row, "__dict__"))
+        self.assertFalse(hasattr(ReferenceRow(None, "ref-1"), "__dict__"))
+        self.assertEqual(row._uuid, rowUuid.bytes)
+        self.assertEqual(row.uuid, str(rowUuid))
+        self.assertIs(row.values[0], other.values[0])
+        self.assertIs(row._displayIndexes, other._displayIndexes)
+
+    def test_display_string_of_text_display_columns(self):
+        """Test that display strings are made of text display columns with a value, as display values of references."""
+        self.grid.columns.append(Column("col-4", 3, 3, order = "3", name = "Code", typeUuid = SystemIds.TextColumnType, columnIndex = 3, display = True))
+        self.grid.columns[1].display = True
+        self.assertEqual(Row(self.grid, "row-1", values = ["name", 5, [], "A"]).displayString, "name | A")
+        self.assertEqual(Row(self.grid, "row-2", values = [None, 5, [], "A"]).displayString, "A")
+
+    def test_display_string_of_references_skips_missing_values(self):
+        self.assertEqual(ReferenceRow(None, "ref-1", values = ["Reference", None, 2]).displayString, "Reference | 2")
+
+    def test_display_string_follows_values(self):
+        row = Row(self.grid, "row-1", values = ["name", 5, []])
+        row.values[0] = "new name"
+        self.assertEqual(row.displayString, "new name")
+
+if __name__ == '__main__':
+    unittest.main()
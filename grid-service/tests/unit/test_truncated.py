@@ -0,0 +1,39 @@
+import unittest
+from libs.utils.truncated import Truncated
+
+class TestTruncated(unittest.TestCase):
+
+    def test_short_payload(self):
+        """Test that short payloads are logged entirely."""
+        self.assertEqual(str(Truncated({"a": 1})), "{'a': 1}")
+
+    def test_long_payload(self):
+        """Test that long payloads are cut, with their length."""
+        text = str(Truncated("x" * (Truncated.maxLength + 10)))
+        self.assertTrue(text.startswith("x" * Truncated.maxLength + "..."))
+        self.assertIn(f"({Truncated.maxLength + 10} characters)", text)
+
+    def test_lazy_formatting(self):
+        """Test that the payload is not formatted until the record is emitted."""
+        class Payload:
+            formatted = False
+            def __str__(self):
+                Payload.formatted = True
+                return "payload"
+        truncated = Truncated(Payload())
+        self.assertFalse(Payload.formatted)
+        str(truncated)
+        self.assertTrue(Payload.formatted)
+
+    def test_container_formatted_up_to_length(self):
+        """Test that containers are formatted as str() does, and only up to the maximum length."""
+        payload = {"a": [1, "two", (3,)], "b": {"c": None, "d": b"e"}}
+        self.assertEqual(str(Truncated(payload)), str(payload))
+        class Item:
+            formatted = False
+            def __repr__(self):
+                Item.formatted = True
+                return "item"
+        text = str(Truncated(["x" * Truncated.maxLength, Item()]))
+        self.assertTrue(text.endswith("... (truncated)"))
+        self.assertFalse(Item.formatted)
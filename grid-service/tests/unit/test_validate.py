@@ -0,0 +1,157 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager import GridManager
+
+class TestValidateGrid(unittest.TestCase):
+
+    @patch("libs.base_manager.BaseManager._read_password_file", return_value = "secret")
+    def setUp(self, mock_read_pwd):
+        self.db_manager = MagicMock()
+        self.db_manager.db_name = "test_db"
+        self.db_manager.select_all.side_effect = self._select_all
+        self.grid_manager = GridManager(self.db_manager)
+        self.grid = Grid("grid-uuid", name = "Grid")
+        self.grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+        self.grid_manager.grid_cache.put_grid(self.grid)
+        self.grid_manager.grid_cache.put_rows("grid-uuid", {
+            "row-1": Row(self.grid, "row-1", revision = 1, values = ["one"]),
+            "row-2": Row(self.grid, "row-2", revision = 2, values = ["two"]),
+            "row-3": Row(self.grid, "row-3", revision = 1, values = ["three"])
+        })
+        self.grid_manager.grid_cache.put_validation("grid-uuid", 7)
+        self.gridRevision = 7
+        self.revisions = {"row-1": 1, "row-2": 2, "row-3": 1}
+        self.values = {"row-1": "one", "row-2": "two", "row-3": "three"}
+        self.statements = []
+
+    def _select_all(self, statement, params, prepare = False):
+        self.statements.append(statement)
+        if "Stamp grids" in statement:
+            return [("grid-uuid", self.gridRevision)]
+        if "Revisions of rows" in statement:
+            return list(self.revisions.items())
+        if "Load rows by uuid" in statement:
+            return [(rowUuid, self.revisions[rowUuid], self.values[rowUuid]) for rowUuid in params["rowUuids"]]
+        return []
+
+    def _expire(self):
+        self.grid_manager.grid_cache._entries["grid-uuid"].validatedOn = time.monotonic() - 60
+
+    def test_unchanged_grid_is_validated_by_its_stamp(self):
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[2], 7)
+
+    def test_validated_at_most_once_per_interval(self):
+        self.grid_manager._validate_grid("grid-uuid")
+        self.assertEqual(self.statements, [])
+
+    def test_only_changed_rows_are_refreshed(self):
+        """Test that rows changed, added or removed by another instance are refreshed, and others kept."""
+        row1 = self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"]
+        self.revisions.update({"row-2": 3, "row-4": 1})
+        del self.revisions["row-3"]
+        self.values.update({"row-2": "deux", "row-4": "four"})
+        self.gridRevision = 10
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        rows = self.grid_manager.grid_cache.get_rows("grid-uuid")
+        self.assertEqual(sorted(rows.keys()), ["row-1", "row-2", "row-4"])
+        self.assertIs(rows["row-1"], row1)
+        self.assertEqual(rows["row-2"].values, ["deux"])
+        self.assertEqual(rows["row-2"].revision, 3)
+        self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[2], 10)
+
+    def test_disabled_and_inserted_rows_are_refreshed(self):
+        """Test that a row disabled and a row inserted with the same revision, leaving the number and the sum
+        of revisions of rows unchanged, are refreshed."""
+        del self.revisions["row-3"]
+        self.revisions["row-4"] = 1
+        self.values["row-4"] = "four"
+        self.gridRevision = 9
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        rows = self.grid_manager.grid_cache.get_rows("grid-uuid")
+        self.assertEqual(sorted(rows.keys()), ["row-1", "row-2", "row-4"])
+
+    def test_not_refreshed_while_changes_are_written(self):
+        """Test that rows in memory ahead of the database are not taken as stale."""
+        self.grid_manager.change_writer._unwrittenGrids["grid-uuid"] = 1
+        self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"].revision = 2
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        self.assertFalse(any("Revisions of rows" in statement for statement in self.statements))
+        self.assertEqual(self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"].revision, 2)
+
+    def test_refreshed_while_changes_of_other_grids_are_written(self):
+        self.grid_manager.change_writer._unwritten = 1
+        self.grid_manager.change_writer._unwrittenGrids["other-grid-uuid"] = 1
+        self.revisions["row-2"] = 3
+        self.values["row-2"] = "deux"
+        self.gridRevision = 8
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        self.assertEqual(self.grid_manager.grid_cache.get_rows("grid-uuid")["row-2"].values, ["deux"])
+
+    def test_locked_grid_is_validated_later(self):
+        """Test that a locked grid is not waited for until its validation is overdue, then waited for one interval."""
+        self.gridRevision = 8
+        validatedOn = time.monotonic() - 2
+        self.grid_manager.grid_cache._entries["grid-uuid"].validatedOn = validatedOn
+        lock = self.grid_manager.grid_cache.lock("grid-uuid")
+        locked = threading.Event()
+        release = threading.Event()
+        def hold():
+            with lock.read():
+                locked.set()
+                release.wait(5)
+        threading.Thread(target = hold, daemon = True).start()
+        locked.wait(1)
+        try:
+            start = time.monotonic()
+            self.grid_manager._validate_grid("grid-uuid")
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[3], validatedOn)
+            self.grid_manager.validation_interval_milliseconds = 100
+            with self.assertLogs("libs.grid_manager._validate", level = "INFO") as logs:
+                self.grid_manager._validate_grid("grid-uuid")
+            self.assertGreaterEqual(time.monotonic() - start, 0.1)
+            self.assertIn("grid-uuid is locked", logs.output[0])
+            threading.Timer(0.02, release.set).start()
+            self.grid_manager._validate_grid("grid-uuid")
+            self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[2], 8)
+        finally:
+            release.set()
+
+    def test_own_changes_update_the_stamp(self):
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        self.grid_manager._on_stamps({"grid-uuid": (7, 8)})
+        self.gridRevision = 8
+        self.revisions["row-1"] = 2
+        self.grid_manager.grid_cache.get_rows("grid-uuid")["row-1"].revision = 2
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        self.assertFalse(any("Revisions of rows" in statement for statement in self.statements))
+
+    def test_changes_of_others_before_own_changes_are_refreshed(self):
+        """Test that the stamp is not advanced by own changes when the grid was changed by others before them."""
+        self.grid_manager._on_stamps({"grid-uuid": (8, 9)})
+        self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[2], 7)
+        self.gridRevision = 9
+        self.revisions["row-2"] = 3
+        self.values["row-2"] = "deux"
+        self._expire()
+        self.grid_manager._validate_grid("grid-uuid")
+        self.assertEqual(self.grid_manager.grid_cache.get_rows("grid-uuid")["row-2"].values, ["deux"])
+        self.assertEqual(self.grid_manager.grid_cache.get_validation("grid-uuid")[2], 9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest.mock import MagicMock, patch
+from libs.metadata import SystemIds
+from libs.model.column import Column
+from libs.model.grid import Grid
+from libs.model.row import Row
+from libs.grid_manager import GridManager
+from libs.grid_manager.grid_cache import GridCache
+
+class TestWarmUp(unittest.TestCase):
+
+    @patch("libs.base_manager.BaseManager._read_password_file", return_value = "secret")
+    def setUp(self, mock_read_pwd):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_manager = MagicMock()
+        self.db_manager.db_name = "test_db"
+        self.grid_manager = GridManager(self.db_manager)
+        self.grid_manager.access_log_file = os.path.join(self.directory.name, "access_log.json")
+        self.grid_manager.hot_grids = ["hot-grid"]
+        self.grid_manager.warm_up_iterations = 2
+        for gridUuid in list(GridCache.pinnedGridUuids) + ["hot-grid", "used-grid"]:
+            grid = Grid(gridUuid, name = gridUuid)
+            grid.columns.append(Column("col-1", 0, 0, order = "0", name = "Name", typeUuid = SystemIds.TextColumnType, columnIndex = 0, display = True))
+            self.grid_manager.grid_cache.put_grid(grid)
+            self.grid_manager.grid_cache.put_rows(gridUuid, {"row-1": Row(grid, "row-1", values = ["name"])})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_warm_up_loads_system_hot_and_used_grids(self):
+        """Test that system grids, hot grids and grids accessed the most are loaded, and loads run again."""
+        self.grid_manager._access_log = Counter({"used-grid": 5, "other-grid": 1})
+        self.grid_manager.warm_up_top_grids = 1
+        rows = {str(grid.uuid): self.grid_manager.grid_cache.get_rows(grid.uuid) for grid, _ in self.grid_manager.grid_cache.get_loaded()}
+        with patch.object(GridManager, "_iter_rows", return_value = iter([{}])) as mock_iter_rows:
+            loaded = self.grid_manager.warm_up()
+        self.assertEqual([str(grid.uuid) for grid, rows in loaded], list(GridCache.pinnedGridUuids) + ["hot-grid", "used-grid"])
+        self.assertEqual(mock_iter_rows.call_count, 2)
+        for gridUuid, gridRows in rows.items():
+            self.assertIs(self.grid_manager.grid_cache.get_rows(gridUuid), gridRows) # rows in memory are not replaced
+
+    def test_access_log_counts_accesses_across_starts(self):
+        """Test that accesses recorded before the start are added to accesses since."""
+        self.grid_manager._access_log = Counter({"used-grid": 5})
+        self.grid_manager.grid_cache.get("hot-grid")
+        self.grid_manager.grid_cache.get("used-grid")
+        self.grid_manager.write_access_log()
+        with open(self.grid_manager.access_log_file) as f:
+            self.assertEqual(json.load(f), {"used-grid": 6, "hot-grid": 1})
+        self.assertEqual(self.grid_manager._read_access_log(), Counter({"used-grid": 6, "hot-grid": 1}))
+
+if __name__ == '__main__':
+    unittest.main()
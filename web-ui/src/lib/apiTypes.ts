@@ -18,9 +18,29 @@ export interface RequestType {
   gridUuid?: string
   rowUuid?: string
   columnUuid?: string
+  limit?: number
+  cursor?: string
+  sortColumnUuid?: string
+  descending?: boolean
+  filters?: FilterType[]
+  aggregates?: AggregateType[]
+  chunkedReply?: boolean
   timeOut?: boolean
   dateTime?: string
   changes?: ChangeType[]
+  atomic?: boolean
+}
+
+export interface FilterType {
+  columnUuid: string
+  operator: string
+  value?: any
+}
+
+export interface AggregateType {
+  function: string
+  columnUuid?: string
+  value?: any
 }
 
 export interface ChangeType {
@@ -29,6 +49,22 @@ export interface ChangeType {
   rowUuid?: string
   columnUuid?: string
   changeValue?: any
+  expectedRevision?: number
+}
+
+export interface ChangeResultType {
+  index: number
+  status: string
+  message?: string
+}
+
+export interface ConflictType {
+  gridUuid: string
+  rowUuid: string
+  columnUuid?: string
+  expectedRevision?: number
+  revision?: number
+  row?: RowType
 }
 
 export interface ReplyType {
@@ -53,6 +89,13 @@ export interface ReplyType {
   dateTime?: string
   sameContext?: boolean
   dataSet?: DataSetType
+  replyPart?: string
+  sequence?: number
+  countChunks?: number
+  rows?: RowType[]
+  results?: ChangeResultType[]
+  revisions?: { [rowUuid: string]: number }
+  conflicts?: ConflictType[]
 }
 
 export interface DataSetType {
@@ -61,6 +104,12 @@ export interface DataSetType {
   grid: GridType
   countRows: number
   rows: RowType[]
+  limit?: number
+  nextCursor?: string
+  sortColumnUuid?: string
+  descending?: boolean
+  countFilteredRows?: number
+  aggregates?: AggregateType[]
   rowsAdded?: RowType[]
   rowsEdited?: RowType[]
   rowsDeleted?: RowType[]
@@ -90,6 +139,7 @@ export interface ColumnType {
 
 export interface RowType {
 	uuid: string
+  revision?: number
   values: any[]
   displayString?: string
 }
@@ -97,7 +97,8 @@ export class Context extends ContextBase {
                 gridUuid: set.grid.uuid,
                 rowUuid: row.uuid,
                 columnUuid: column.uuid,
-                changeValue: rowClone.values[column.index]
+                changeValue: rowClone.values[column.index],
+                expectedRevision: row.revision
               }
           ]
         }
@@ -548,9 +549,31 @@ export class Context extends ContextBase {
         } else if(reply.command == metadata.ActionLocate) {
           this.locateGrid(reply.gridUuid, reply.columnUuid, reply.rowUuid)
         }
+        if(reply.command == metadata.ActionChange && reply.revisions) this.setRevisions(reply.revisions)
+      } else if(reply.status == metadata.ConflictStatus && reply.conflicts) {
+        for(const conflict of reply.conflicts) {
+          console.log(`Row ${conflict.rowUuid} changed meanwhile, revision ${conflict.revision}`)
+          if(conflict.row) this.replaceRow(conflict.gridUuid, conflict.row)
+        }
       }
     }    
   }
 
+  setRevisions = (revisions: { [rowUuid: string]: number }) => {
+    for(const set of this.dataSets) {
+      for(const row of set.rows ?? []) {
+        if(revisions[row.uuid] !== undefined) row.revision = revisions[row.uuid]
+      }
+    }
+  }
+
+  replaceRow = (gridUuid: string, row: RowType) => {
+    for(const set of this.dataSets) {
+      if(set.grid?.uuid !== gridUuid || !set.rows) continue
+      const rowIndex = set.rows.findIndex((r) => r.uuid === row.uuid)
+      if(rowIndex >= 0) set.rows[rowIndex] = row
+    }
+  }
+
   startStreaming = async () => this.listenStream.startStreaming()
 }
@@ -8,6 +8,8 @@ export const ActionLoad = "load"
 export const ActionChange = "change"
 export const ActionLocate = "locate"
 export const ActionPrompt = "prompt"
+export const ActionMetrics = "metrics"
+export const ActionTopStatements = "topStatements"
 
 export const ChangeAdd = "add"
 export const ChangeUpdate = "update"
@@ -15,8 +17,29 @@ export const ChangeAddRelationship = "addRelationship"
 export const ChangeRemoveRelationship = "removeRelationship"
 export const ChangeLoad = "load"
 
+export const FilterEqual = "eq"
+export const FilterNotEqual = "ne"
+export const FilterLess = "lt"
+export const FilterLessOrEqual = "le"
+export const FilterGreater = "gt"
+export const FilterGreaterOrEqual = "ge"
+export const FilterContains = "contains"
+export const FilterIsNull = "isNull"
+export const FilterIsNotNull = "isNotNull"
+
+export const AggregateCount = "count"
+export const AggregateSum = "sum"
+export const AggregateMin = "min"
+export const AggregateMax = "max"
+
 export const SuccessStatus = "success"
 export const FailedStatus  = "failed"
+export const SkippedStatus = "skipped"
+export const ConflictStatus = "conflict"
+
+export const ReplyPartHeader = "header"
+export const ReplyPartRows = "rows"
+export const ReplyPartEnd = "end"
 
 export const StopString = "*[STOP]*"
 